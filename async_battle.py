@@ -0,0 +1,206 @@
+# async_battle.py
+import asyncio
+from utils.clock import clock
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import max_failed_plays, elixir_poll_interval
+from core.navigator import LOBBY
+from utils.event_log import log
+
+class AsyncBattleEngine:
+    """
+    基于 asyncio 的对战引擎，与同步的 Robot 配合使用。
+
+    截图、模板匹配、ADB 输入分别在独立的任务中运行，任务之间通过队列传递数据：
+    - 截图任务不断截取最新画面，放入只保留最新一帧的队列；
+    - 匹配任务在线程池中检测对战结束按钮，检测到后设置结束事件；
+    - 出牌任务按对战模式的间隔把出牌请求放入输入队列，间隔等待可被结束事件立即打断；
+    - 输入任务依次执行出牌操作。
+    battle_mode 和 max_cards 的含义与 Robot.battle_loop 相同。
+    """
+
+    def __init__(self, robot, capture_interval=1.0, workers=3):
+        """
+        Args:
+            robot (Robot): 同步机器人实例，截图、匹配、点击均复用其实现
+            capture_interval (float): 两次截图之间的最小间隔（秒）
+            workers (int): 运行阻塞操作的线程数
+        """
+        self.robot = robot
+        self.capture_interval = capture_interval
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="async-battle")
+
+    async def _run(self, func, *args, **kwargs):
+        """在线程池中执行阻塞函数"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, lambda: func(*args, **kwargs))
+
+    async def _capture_task(self, frames, end_event):
+        while not end_event.is_set():
+            started = clock.time()
+            if await self._run(self.robot.capture_screen):
+                frame = self.robot.frame
+                # 只保留最新的一帧，匹配任务来不及处理的旧帧直接丢弃
+                if frames.full():
+                    frames.get_nowait()
+                frames.put_nowait((started, frame))
+            elapsed = clock.time() - started
+            await clock.async_sleep(self.capture_interval - elapsed)
+
+    async def _match_task(self, frames, end_event, state, check_end_after):
+        templates = self.robot.battle_end_templates()
+        while not end_event.is_set():
+            captured_at, frame = await frames.get()
+            # 释放的卡牌数达到 check_end_after 之前不检查结束
+            if state["cards_played"] < check_end_after:
+                continue
+            results = await self._run(self.robot.match_templates, templates, frame=frame)
+            if results is None:
+                continue
+            match = results.first_found(templates)
+            if match is not None:
+                state["end_match"] = match
+                state["end_latency"] = clock.time() - captured_at
+                end_event.set()
+
+    async def _deploy_task(self, inputs, end_event, state):
+        # 释放失败不计入 max_cards，单独限制次数
+        failures = 0
+        while state["cards_played"] < self.robot.max_cards:
+            if end_event.is_set():
+                return
+            done = asyncio.get_running_loop().create_future()
+            await inputs.put((state["cards_played"], done))
+            # 等待这张卡牌释放完成后再计算间隔
+            if await done:
+                delay = self.robot.next_card_delay()
+            else:
+                failures += 1
+                if failures >= max_failed_plays:
+                    log.warning("async.battle", f"本场对战释放卡牌失败 {failures} 次，对战循环结束")
+                    return
+                # 没有可用卡牌时短暂等待圣水恢复，避免连续空转
+                delay = 1
+            await self._wait_card_ready(end_event, delay)
+        log.info("async.battle", f"已释放 {self.robot.max_cards} 张卡牌，对战循环结束")
+        state["max_cards_reached"] = True
+
+    async def _wait_card_ready(self, end_event, timeout):
+        """
+        等待圣水足够释放下一张卡牌（与 Robot.wait_for_card_ready 的判断相同，在线程池中执行），
+        timeout 为等待上限；无法读取圣水时退回固定等待，对战结束时立即返回
+        """
+        robot = self.robot
+        if robot.elixir_reader is None or robot.capture_mode == "png":
+            await clock.async_wait(end_event, timeout)
+            return
+        started = clock.time()
+        deadline = started + timeout
+        while not end_event.is_set():
+            # 截图任务刚截取的画面直接复用
+            if await self._run(robot.card_ready, elixir_poll_interval):
+                break
+            remaining = deadline - clock.time()
+            if remaining <= 0:
+                break
+            await clock.async_wait(end_event, min(elixir_poll_interval, remaining))
+        robot.wait_stats["elixir"].append(clock.time() - started)
+
+    async def _input_task(self, inputs, end_event, state):
+        while True:
+            i, done = await inputs.get()
+            if end_event.is_set():
+                done.set_result(False)
+                continue
+            log.info("async.battle", f"释放第 {i+1} 张卡牌")
+            success = await self._run(self.robot.play_random_card)
+            if success:
+                state["cards_played"] = i + 1
+                self.robot.cards_played_in_battle = i + 1
+            else:
+                log.warning("async.battle", "释放卡牌失败")
+            done.set_result(success)
+
+    async def battle_loop(self, check_end_after=5):
+        """
+        异步对战主循环
+
+        Args:
+            check_end_after (int): 在释放多少张卡牌后开始检查对战结束
+
+        Returns:
+            bool: 对战是否成功完成
+        """
+        log.info("async.battle", "开始异步对战循环...")
+        self.robot.cards_played_in_battle = 0
+        self.robot.battle_end_detected = False
+        end_event = asyncio.Event()
+        frames = asyncio.Queue(maxsize=1)
+        inputs = asyncio.Queue()
+        state = {"cards_played": 0, "end_match": None, "end_latency": None, "max_cards_reached": False}
+
+        deploy = asyncio.create_task(self._deploy_task(inputs, end_event, state))
+        workers = [
+            asyncio.create_task(self._capture_task(frames, end_event)),
+            asyncio.create_task(self._match_task(frames, end_event, state, check_end_after)),
+            asyncio.create_task(self._input_task(inputs, end_event, state)),
+        ]
+        ender = asyncio.create_task(end_event.wait())
+        try:
+            await asyncio.wait([deploy, ender], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            end_event.set()
+            for task in workers + [deploy, ender]:
+                task.cancel()
+            await asyncio.gather(*workers, deploy, ender, return_exceptions=True)
+            self.robot.mark_phase("battle")
+
+        match = state["end_match"]
+        self.robot.battle_end_detected = match is not None
+        if match is not None:
+            log.info("async.battle", f"检测到结束按钮 {match.template}，对战已结束（检测延迟 {state['end_latency']:.2f} 秒）")
+            await self._run(self.robot.click_box, match.box)
+        return True
+
+    async def auto_battle(self, check_end_after=5):
+        """
+        异步自动对战流程：进入对战的步骤沿用 Robot 的实现，对战循环使用异步引擎
+
+        Returns:
+            bool: 是否成功完成整个对战流程
+        """
+        log.info("async.flow", "开始自动对战流程...")
+        if not await self._run(self.robot.click_template, "modle/Combat.png"):
+            log.warning("async.flow", "无法点击对战按钮")
+            return False
+        log.info("async.flow", "已点击对战按钮")
+
+        if self.robot.battle_mode == "double":
+            log.info("async.flow", "双人模式：正在寻找快速匹配按钮...")
+            if not await self._run(self.robot.click_template, "modle/Quick_matching.png"):
+                log.warning("async.flow", "无法找到或点击快速匹配按钮")
+                return False
+            log.info("async.flow", "已点击快速匹配按钮")
+            await self._run(self.robot.wait_for, "quick_matching",
+                            self.robot.template_gone("modle/Quick_matching.png"), 2)
+
+        if not await self._run(self.robot.wait_for_battle_start):
+            log.warning("async.flow", "等待对战开始失败")
+            return False
+
+        await self.battle_loop(check_end_after)
+        log.info("async.flow", "对战已结束，准备开始新的对战...")
+        await self._run(self.robot.wait_for, "after_battle", self.robot.screen_in_state(LOBBY), 3)
+        return True
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+def run_auto_battle(robot, check_end_after=5):
+    """
+    同步入口：使用异步引擎完成一次自动对战
+    """
+    engine = AsyncBattleEngine(robot)
+    try:
+        return asyncio.run(engine.auto_battle(check_end_after))
+    finally:
+        engine.close()
@@ -0,0 +1,253 @@
+# benchmark.py
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import cv2
+import numpy as np
+from config.settings import DEVICE_PROFILES
+from image_matcher import match_images
+from utils.event_log import log
+from utils.image_utils import find_template_position
+
+# 缩放范围："tight" 为按分辨率换算出的模板实际比例上下 10%
+SCALE_RANGES = {
+    "default": (0.75, 2.0),
+    "wide": (0.5, 3.0),
+    "tight": None,
+}
+
+FUNCTIONS = ["find_template_position", "match_images"]
+
+# find_template_position 的匹配模式，"auto" 为 TEMPLATE_MATCH_MODES 中的配置
+BENCH_MATCH_MODES = ["auto", "color", "gray", "edge", "hybrid"]
+
+# 参考真值：模板按原始分辨率从 540P 截图中截取，原尺寸下置信度不低于该值视为截图中存在该模板
+TRUTH_THRESHOLD = 0.9
+
+def profile_frame(base, size):
+    """
+    把 540P 截图等比缩放到设备分辨率，宽高比不同时上下补黑边
+
+    Args:
+        base (numpy.ndarray): 540x960 的截图
+        size (tuple): DEVICE_PROFILES 中的分辨率
+
+    Returns:
+        tuple: (图像, 缩放比例, y方向偏移)
+    """
+    width, height = min(size), max(size)
+    scale = width / base.shape[1]
+    resized = cv2.resize(base, (width, int(round(base.shape[0] * scale))), interpolation=cv2.INTER_AREA)
+    pad = max(0, height - resized.shape[0])
+    frame = cv2.copyMakeBorder(resized, pad // 2, pad - pad // 2, 0, 0, cv2.BORDER_CONSTANT, value=0)
+    return frame[:height], scale, pad // 2
+
+def reference_boxes(base, templates):
+    """
+    用原尺寸的 matchTemplate 计算参考真值，与被测的搜索实现无关
+
+    Returns:
+        dict: {模板路径: (x, y, w, h) 或 None}
+    """
+    truth = {}
+    for path in templates:
+        template = cv2.imread(path)
+        result = cv2.matchTemplate(base, template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (x, y) = cv2.minMaxLoc(result)
+        h, w = template.shape[:2]
+        truth[path] = (x, y, w, h) if score >= TRUTH_THRESHOLD else None
+    return truth
+
+def _iou(first, second):
+    ax, ay, aw, ah = first
+    bx, by, bw, bh = second
+    w = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    h = max(0, min(ay + ah, by + bh) - max(ay, by))
+    union = aw * ah + bw * bh - w * h
+    return w * h / union if union else 0.0
+
+def _call(function, frame, template, min_scale, max_scale, threshold, match_mode="auto"):
+    """调用被测函数，统一返回 (x, y, w, h) 或 None"""
+    if function == "find_template_position":
+        return find_template_position(frame, template, threshold=threshold, min_scale=min_scale,
+                                      max_scale=max_scale, search_mode="pyramid", match_mode=match_mode)
+    result = match_images(frame, template, threshold=threshold, min_scale=min_scale, max_scale=max_scale)
+    if not result.get("success"):
+        return None
+    return result["position"] + result["size"]
+
+def _percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000) if samples else 0.0
+
+def run_benchmarks(screen="screen.png", templates=None, profiles=None, scale_ranges=None,
+                   functions=None, repeats=3, threshold=0.75, match_modes=None):
+    """
+    对模板匹配函数进行基准测试
+
+    Args:
+        screen (str): 540P 基准截图
+        templates (list): 模板路径列表，默认为 modle/ 下全部模板
+        profiles (list): DEVICE_PROFILES 的名称列表，默认为全部
+        scale_ranges (list): SCALE_RANGES 的名称列表，默认为全部
+        functions (list): 被测函数名称列表，默认为 FUNCTIONS
+        repeats (int): 每个用例的计时次数（另有一次预热和一次内存统计）
+        threshold (float): 匹配阈值
+        match_modes (list): find_template_position 的匹配模式列表，默认只测 "auto"；
+            其他模式的结果名称为 "find_template_position[模式]"
+
+    Returns:
+        dict: 基准结果，包含 cases（每个用例）和 groups（按函数和分辨率汇总）
+    """
+    base = cv2.imread(screen)
+    if base is None:
+        raise FileNotFoundError(f"无法读取基准截图: {screen}")
+    templates = templates or sorted(glob.glob("modle/*.png"))
+    profiles = profiles or [profile["name"] for profile in DEVICE_PROFILES.values()]
+    scale_ranges = scale_ranges or list(SCALE_RANGES)
+    functions = functions or FUNCTIONS
+    match_modes = match_modes or ["auto"]
+    variants = [(function, mode) for function in functions
+                for mode in (match_modes if function == "find_template_position" else ["auto"])]
+    truth = reference_boxes(base, templates)
+    # 被测函数的日志只保留警告和错误
+    log.set_level("WARNING")
+
+    cases, groups = {}, {}
+    for profile in DEVICE_PROFILES.values():
+        if profile["name"] not in profiles:
+            continue
+        frame, scale, pad_y = profile_frame(base, profile["size"])
+        for function, match_mode in variants:
+            name = function if match_mode == "auto" else f"{function}[{match_mode}]"
+            group_samples, group_correct = [], []
+            for range_name in scale_ranges:
+                min_scale, max_scale = SCALE_RANGES[range_name] or (scale * 0.9, scale * 1.1)
+                for template in templates:
+                    expected = truth[template]
+                    if expected is not None:
+                        x, y, w, h = expected
+                        expected = (x * scale, y * scale + pad_y, w * scale, h * scale)
+                    args = (function, frame, template, min_scale, max_scale, threshold, match_mode)
+                    samples = []
+                    _call(*args)  # 预热：加载模板并建立缓存
+                    for _ in range(repeats):
+                        started = time.perf_counter()
+                        box = _call(*args)
+                        samples.append(time.perf_counter() - started)
+                    tracemalloc.start()
+                    _call(*args)
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                    if expected is None:
+                        correct = box is None
+                    else:
+                        correct = box is not None and _iou(box, expected) >= 0.5
+                    key = f"{name}|{profile['name']}|{range_name}|{os.path.basename(template)}"
+                    cases[key] = {
+                        "p50_ms": _percentile_ms(samples, 50),
+                        "p95_ms": _percentile_ms(samples, 95),
+                        "peak_kb": peak / 1024,
+                        "expected_hit": expected is not None,
+                        "correct": correct,
+                    }
+                    group_samples.extend(samples)
+                    group_correct.append(correct)
+                    print(f"{key}: p50 {cases[key]['p50_ms']:.1f} ms，峰值内存 {cases[key]['peak_kb']:.0f} KB，"
+                          f"{'正确' if correct else '错误'}")
+            if group_correct:
+                groups[f"{name}|{profile['name']}"] = {
+                    "p50_ms": _percentile_ms(group_samples, 50),
+                    "p95_ms": _percentile_ms(group_samples, 95),
+                    "accuracy": sum(group_correct) / len(group_correct),
+                    "cases": len(group_correct),
+                }
+    return {
+        "meta": {
+            "screen": screen,
+            "repeats": repeats,
+            "threshold": threshold,
+            "python": sys.version.split()[0],
+            "opencv": cv2.__version__,
+            "machine": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "cases": cases,
+        "groups": groups,
+    }
+
+def compare(result, baseline, latency_tolerance=0.25, accuracy_tolerance=0.0, min_delta_ms=2.0):
+    """
+    与基准结果比较
+
+    Args:
+        result (dict): 本次结果
+        baseline (dict): 保存的基准结果
+        latency_tolerance (float): 允许的 p50/p95 延迟增加比例
+        accuracy_tolerance (float): 允许的准确率下降
+        min_delta_ms (float): 延迟增加不超过该值（毫秒）时不视为退化，避免计时噪声
+
+    Returns:
+        list: 退化说明，空列表表示没有退化
+    """
+    regressions = []
+    for key, current in result["groups"].items():
+        previous = baseline.get("groups", {}).get(key)
+        if previous is None:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            limit = previous[metric] * (1 + latency_tolerance)
+            if current[metric] > limit and current[metric] - previous[metric] > min_delta_ms:
+                regressions.append(f"{key} {metric}: {previous[metric]:.1f} -> {current[metric]:.1f} ms")
+        if current["accuracy"] < previous["accuracy"] - accuracy_tolerance:
+            regressions.append(f"{key} 准确率: {previous['accuracy']:.1%} -> {current['accuracy']:.1%}")
+    for key, current in result["cases"].items():
+        previous = baseline.get("cases", {}).get(key)
+        if previous is not None and previous["correct"] and not current["correct"]:
+            regressions.append(f"{key}: 匹配结果由正确变为错误")
+    return regressions
+
+def print_summary(result):
+    print(f"\n{'='*50}")
+    for key, group in result["groups"].items():
+        print(f"{key}: p50 {group['p50_ms']:.1f} ms，p95 {group['p95_ms']:.1f} ms，"
+              f"准确率 {group['accuracy']:.1%}（{group['cases']} 个用例）")
+    print(f"{'='*50}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="模板匹配基准测试")
+    parser.add_argument("--screen", default="screen.png", help="540P 基准截图")
+    parser.add_argument("--profiles", nargs="*", help="分辨率名称，如 540P 720P 1080P，默认全部")
+    parser.add_argument("--ranges", nargs="*", choices=list(SCALE_RANGES), help="缩放范围，默认全部")
+    parser.add_argument("--functions", nargs="*", choices=FUNCTIONS, help="被测函数，默认全部")
+    parser.add_argument("--match-modes", nargs="*", choices=BENCH_MATCH_MODES,
+                        help="find_template_position 的匹配模式，默认只测 auto")
+    parser.add_argument("--templates", nargs="*", help="模板路径，默认为 modle/ 下全部模板")
+    parser.add_argument("--repeats", type=int, default=3, help="每个用例的计时次数")
+    parser.add_argument("--save", help="把结果保存为基准 JSON 文件")
+    parser.add_argument("--baseline", help="与该基准 JSON 文件比较，出现退化时返回非零退出码")
+    parser.add_argument("--latency-tolerance", type=float, default=0.25, help="允许的延迟增加比例")
+    parser.add_argument("--accuracy-tolerance", type=float, default=0.0, help="允许的准确率下降")
+    args = parser.parse_args()
+
+    result = run_benchmarks(args.screen, args.templates, args.profiles, args.ranges, args.functions, args.repeats,
+                            match_modes=args.match_modes)
+    print_summary(result)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"基准结果已保存到: {args.save}")
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.latency_tolerance, args.accuracy_tolerance)
+        if regressions:
+            print("检测到性能退化:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("与基准相比没有退化")
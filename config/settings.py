@@ -8,4 +8,144 @@ DEVICE_PROFILES = {
     0: {'name': '1080P', 'size': (1080, 2400)},
     1: {'name': '720P',  'size': (720, 1280)},
     2: {'name': '540P',  'size': (960, 540)}
-}
\ No newline at end of file
+}
+
+# ADB长连接配置
+adb_persistent_shell = True  # 是否通过常驻的 adb shell 会话执行 shell 命令
+adb_session_pool_size = 2  # 每个设备保持的 adb shell 会话数量
+adb_command_timeout = 10  # 单条命令等待返回的超时时间（秒）
+
+
+# 视频流截图（capture_mode="stream"）：设备端 screenrecord 持续输出 H.264，后台解码并只保留最新一帧
+stream_bit_rate = 8000000  # 码率（bit/s）
+# screenrecord 的输出分辨率 (宽, 高)，应与单次截图一致；None 为设备默认，部分设备会缩小，
+# 此时视频流的帧会缩放回单次截图的尺寸再使用
+stream_size = None
+stream_max_frame_age = 1.0  # 最新一帧超过该时间（秒）未更新时改用单次截图（画面静止时 screenrecord 不输出新帧）
+stream_restart_limit = 3  # 连续多少次启动都没有解码出画面时放弃视频流，之后一直使用单次截图
+stream_file_fps = 30  # 用录制文件代替设备时的播放帧率
+
+
+# 模板搜索区域，使用归一化坐标 (x1, y1, x2, y2)，取值 0~1，适配不同分辨率
+# 未列出的模板或值为 None 时搜索整个屏幕
+TEMPLATE_REGIONS = {
+    'Battle_Interface.png':  (0.0, 0.82, 1.0, 1.0),   # 底部导航栏
+    'Battle_Interface2.png': (0.0, 0.82, 1.0, 1.0),
+    'Battle_Interface3.png': (0.0, 0.82, 1.0, 1.0),
+    'Combat.png':            (0.2, 0.65, 0.8, 0.9),   # 主界面对战按钮
+    'confirm.png':           (0.0, 0.65, 1.0, 1.0),   # 对战结束确认按钮
+    'exit.png':              (0.0, 0.65, 1.0, 1.0),   # 双人对战退出按钮
+    'Quick_matching.png':    None,                    # 弹窗位置不固定
+    'Return_to_game.png':    None,
+    'Reward.png':            None,
+    'close.png':             None,
+    'confirm2.png':          (0.0, 0.65, 1.0, 1.0),   # 双人对战结束确认按钮
+}
+
+
+# 模板匹配模式：
+#   "color"  三通道彩色匹配，最准确，耗时约为灰度匹配的3倍
+#   "gray"   灰度匹配，适合形状和文字明显的按钮
+#   "edge"   灰度图上的 Canny 边缘匹配，不受颜色和亮度变化影响
+#   "hybrid" 先灰度搜索，再只在最佳位置用彩色模板确认，以彩色置信度为准
+default_match_mode = "hybrid"
+TEMPLATE_MATCH_MODES = {  # 按模板文件名单独指定，未列出的模板使用 default_match_mode
+    'Combat.png':            'gray',
+    'Quick_matching.png':    'gray',
+    'Return_to_game.png':    'gray',
+}
+canny_thresholds = (50, 150)  # edge 模式的 Canny 低/高阈值
+
+# 多模板匹配使用的线程数（OpenCV匹配时会释放GIL），1 表示串行
+match_workers = 4
+
+
+# 缩放比例锁定：记录每个模板在当前设备上的最佳缩放比例，之后只搜索该比例及相邻比例
+scale_lock_path = "scale_lock.json"
+scale_lock_fallback_margin = 0.15  # 锁定比例的置信度低于阈值但在此范围内时，重新进行完整的多尺度搜索
+scale_lock_flush_interval = 5.0  # 比例变化后由后台线程每隔该时间（秒）写入文件，退出时再写入一次；0 表示立即写入
+
+
+# 完整多尺度搜索的并行配置
+scale_sweep_workers = 4  # 并行搜索各尺度使用的线程数，1 表示串行
+scale_accept_threshold = 0.95  # 某个尺度的置信度达到该值时立即采用，取消其余尺度的搜索
+
+
+# 画面变化检测：截图缩小为网格后比较各块的平均亮度，相关区域没有变化时复用上一次的匹配结果
+frame_fingerprint_grid = (32, 18)  # 网格大小 (行, 列)
+frame_diff_tolerance = 3.0  # 块平均亮度的最大差值（0~255），不超过该值视为未变化
+
+
+# 屏幕状态恢复：已在主界面却仍无法开始对战时（如对战按钮一直识别失败），每次恢复前等待的时间递增，
+# 连续达到上限次数后放弃，避免无限循环
+max_lobby_recoveries = 3
+lobby_recovery_backoff = 2.0  # 第 n 次连续恢复前等待 n 倍该时间（秒）
+
+
+# 多设备运行：supervisor.py 默认启动的设备列表
+device_names = [device_name]
+
+
+# 后台对战结束检测的间隔（秒），0 表示不启用，改为每次出牌前检查
+battle_end_watch_interval = 1.0
+
+
+# 圣水条读取：圣水条区域（归一化坐标）及出牌前等待的圣水量
+ELIXIR_BAR_REGION = (0.26, 0.966, 0.963, 0.984)
+ELIXIR_SEGMENTS = 10
+# 没有识别出下一张卡牌（或其费用未知）时出牌前等待的圣水量：每种模式的出牌节奏阈值，不是卡牌费用
+ELIXIR_REQUIRED = {"single": 4, "double": 4, "defense": 3}
+elixir_poll_interval = 0.25  # 等待圣水时的检查间隔（秒）
+
+# 手牌识别：四个卡槽区域（归一化坐标，与 Robot.card_positions 对应）
+HAND_SLOT_REGIONS = [
+    (0.235, 0.835, 0.390, 0.945),
+    (0.420, 0.835, 0.575, 0.945),
+    (0.605, 0.835, 0.760, 0.945),
+    (0.795, 0.835, 0.950, 0.945),
+]
+card_template_dir = "modle/cards"  # 卡牌图片目录，文件名即卡牌名称（python -m utils.hand 截取当前卡槽）
+card_signature_path = "card_signatures.npz"  # 卡牌特征矩阵缓存文件
+card_signature_size = (12, 16)  # 特征缩略图大小 (宽, 高)
+card_match_distance = 0.35  # 特征距离不超过该值才认为识别成功
+card_min_saturation = 40  # 卡槽平均饱和度低于该值视为灰色（圣水不足或空槽）
+# 卡牌的圣水费用，键为卡牌图片的文件名；识别出下一张卡牌时等待圣水达到该卡牌的费用
+CARD_COSTS = {"ice_spirit": 1, "goblin_gang": 3, "hog_rider": 4, "electro_spirit": 1}
+hand_frame_max_age = 0.5  # 识别手牌时复用最近截图的最长时间（秒），超过时重新截图
+
+# 出牌输入方式："tap" 为点击卡牌后点击释放位置，"drag" 为一次拖动；两种方式都只需一次 adb 往返
+card_play_mode = "tap"
+card_select_delay = 0.5  # tap 方式下点击卡牌与点击释放位置之间的间隔（秒，在设备端等待）
+card_drag_duration = 150  # drag 方式的拖动时长（毫秒）
+max_failed_plays = 20  # 每场对战释放失败（没有可用卡牌或输入失败）的次数上限，不计入 max_cards，达到后结束对战循环
+
+# 运行统计指标：各环节耗时直方图和计数器，定期导出为 JSONL 和 Prometheus 文本格式
+metrics_enabled = True
+metrics_export_interval = 60  # 导出间隔（秒），0 表示不自动导出
+metrics_jsonl_path = "metrics/{device}.jsonl"  # {device} 替换为设备名
+metrics_prometheus_path = "metrics/{device}.prom"
+metrics_window = 512  # 计算 p50/p95 时保留的最近样本数
+
+# 日志：事件先写入内存环形缓冲区，由后台线程批量输出，控制流程不会因终端或磁盘写入而阻塞
+log_level = "INFO"  # 低于该级别的事件直接丢弃：DEBUG / INFO / WARNING / ERROR
+log_buffer_size = 10000  # 缓冲区最多保留的事件数，写满时丢弃最旧的事件
+log_flush_interval = 0.2  # 后台线程输出间隔（秒）
+log_console = True  # 是否输出到控制台
+log_file = None  # JSONL 日志文件路径，如 "logs/{pid}.jsonl"，None 表示不写文件
+# 按事件名称采样输出的比例（0~1），未列出的事件全部输出
+LOG_SAMPLING = {
+    "adb.exec": 1.0,
+}
+
+# 模板包：python -m utils.template_bundle 把 modle/ 编译为一个文件，各进程通过内存映射共享
+template_bundle_path = "templates.bundle"
+TEMPLATE_BUNDLE_SCALES = [(0.75, 2.0, 20)]  # 预先生成的 (最小缩放, 最大缩放, 尺度数量)，与 Robot 的默认参数一致
+
+
+# 对战历史：每场对战的记录保存在 SQLite 数据库中，启动时据此安排对战结束检测和各类等待
+battle_history_path = "battle_history.db"
+history_window = 200  # 只使用最近多少场对战（或多少次等待）的数据
+history_min_samples = 5  # 样本少于该值时不使用历史数据
+history_check_end_quantile = 0.1  # 按历史上检测到结束时已释放卡牌数的该分位数开始检查结束
+history_wait_quantile = 0.1  # 等待时先等到历史等待用时的该分位数再开始检查
+history_margin = 0.8  # 分位数再乘以该系数，避免第一次检查即满足的样本（实际可能更早）使检查点逐渐推迟
@@ -1,2 +1,6 @@
 # core/__init__.py
-from .adb_manager import *
\ No newline at end of file
+from .adb_manager import *
+from .navigator import *
+from .battle_watcher import *
+from .fake_device import *
+from .stream_capture import *
\ No newline at end of file
@@ -1,26 +1,353 @@
 # core/adb_manager.py
+import atexit
+import queue
 import subprocess
+import struct
+import threading
 import time
 import os
-from config.settings import adb_path, device_name
+import uuid
+import cv2
+import numpy as np
+from config.settings import (adb_path, device_name, adb_persistent_shell,
+                             adb_session_pool_size, adb_command_timeout)
+from utils.metrics import metrics
+from utils.event_log import log
 
-def adb_command(command):
+# screencap 原始输出的像素格式（对应 Android PixelFormat）
+RAW_PIXEL_FORMATS = {
+    1: cv2.COLOR_RGBA2BGR,  # RGBA_8888
+    2: cv2.COLOR_RGBA2BGR,  # RGBX_8888
+    5: cv2.COLOR_BGRA2BGR,  # BGRA_8888
+}
+
+class AdbShellSession:
+    """
+    常驻的 adb shell 会话。
+
+    命令写入 shell 进程的标准输入，每条命令后追加一条输出结束标记的 echo，
+    读取到标记即认为该命令执行完毕，标记后面附带命令的退出码。
+    """
+
+    def __init__(self, serial=device_name):
+        self.serial = serial
+        self.process = None
+        self._lines = None
+        self._start()
+
+    def _start(self):
+        self.process = subprocess.Popen(
+            [adb_path, "-s", self.serial, "shell"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            bufsize=0
+        )
+        self._lines = queue.Queue()
+        reader = threading.Thread(target=self._read_output, args=(self.process, self._lines), daemon=True)
+        reader.start()
+
+    @staticmethod
+    def _read_output(process, lines):
+        """后台线程：逐行读取 shell 输出，读到 EOF 时放入 None"""
+        for line in iter(process.stdout.readline, b""):
+            lines.put(line)
+        lines.put(None)
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def reconnect(self):
+        """关闭旧进程并重新建立会话"""
+        log.info("adb.session", f"重新建立 adb shell 会话: {self.serial}")
+        self.close()
+        self._start()
+
+    def close(self):
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        self.process = None
+
+    def run(self, command, timeout=adb_command_timeout):
+        """
+        在会话中执行一条 shell 命令
+
+        Args:
+            command (str): 设备端 shell 命令
+            timeout (float): 等待结束标记的超时时间（秒）
+
+        Returns:
+            subprocess.CompletedProcess: 与 subprocess.run 相同结构的结果，stderr 合并在 stdout 中
+        """
+        if not self.is_alive():
+            self.reconnect()
+
+        token = uuid.uuid4().hex
+        marker = f"__ADB_END_{token}__"
+        # 标记中间插入空引号，回显的命令行里不会出现完整标记，只有 echo 的输出才会匹配
+        payload = f"{command} 2>&1; echo __ADB_END_''{token}__ $?\n"
+        try:
+            self.process.stdin.write(payload.encode("utf-8"))
+            self.process.stdin.flush()
+        except OSError as e:
+            self.close()
+            raise ConnectionError(f"adb shell 会话写入失败: {e}")
+
+        output = []
+        deadline = time.time() + timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                # 超时后会话中可能残留未读完的输出，直接丢弃整个会话
+                self.close()
+                raise TimeoutError(f"adb shell 命令超时: {command}")
+            try:
+                line = self._lines.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            if line is None:
+                self.close()
+                raise ConnectionError("adb shell 会话已断开")
+
+            text = line.decode("utf-8", errors="replace").rstrip("\r\n")
+            if marker in text:
+                before, _, code = text.partition(marker)
+                if before:
+                    output.append(before)
+                stdout = "\n".join(output) + ("\n" if output else "")
+                return subprocess.CompletedProcess(command, int(code.strip() or 0), stdout, "")
+            output.append(text)
+
+
+class AdbSessionPool:
+    """
+    同一设备的 adb shell 会话池，按需创建会话，最多保持 size 个。
+    """
+
+    def __init__(self, serial=device_name, size=adb_session_pool_size):
+        self.serial = serial
+        self.size = max(1, size)
+        self._idle = queue.LifoQueue()
+        self._sessions = []
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._sessions) < self.size:
+                session = AdbShellSession(self.serial)
+                self._sessions.append(session)
+                return session
+        return self._idle.get()
+
+    def run(self, command, timeout=adb_command_timeout):
+        session = self._acquire()
+        try:
+            return session.run(command, timeout)
+        finally:
+            self._idle.put(session)
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions:
+                session.close()
+
+
+_attached_devices = {}
+
+def attach_device(serial, device):
+    """
+    把本地模拟设备（如 FakeDevice）挂到指定设备名上，之后对该设备的 adb 命令和截图都交给它处理。
+    """
+    _attached_devices[serial] = device
+
+def detach_device(serial):
+    """
+    取消挂载的本地模拟设备
+    """
+    return _attached_devices.pop(serial, None)
+
+
+_session_pools = {}
+_session_pools_lock = threading.Lock()
+
+def get_session_pool(serial=device_name):
+    """
+    获取指定设备的会话池，不存在时创建。
+    """
+    with _session_pools_lock:
+        pool = _session_pools.get(serial)
+        if pool is None:
+            pool = AdbSessionPool(serial)
+            _session_pools[serial] = pool
+        return pool
+
+@atexit.register
+def close_sessions():
+    """
+    关闭所有常驻的 adb shell 会话。
+    """
+    with _session_pools_lock:
+        for pool in _session_pools.values():
+            pool.close()
+        _session_pools.clear()
+
+def adb_command(command, serial=None, timeout=adb_command_timeout):
     """
     执行ADB命令。
+    shell 命令默认通过常驻会话执行，会话异常时退回到单次调用 adb。
+    serial 为目标设备，默认为配置中的 device_name；timeout 为常驻会话中等待命令结束的时间。
     """
-    full_command = f"{adb_path} -s {device_name} {command}"
-    print(f"Executing: {full_command}")
+    serial = serial or device_name
+    full_command = f"{adb_path} -s {serial} {command}"
+    log.debug("adb.exec", f"Executing: {full_command}")
+    # 按命令类型统计耗时，如 shell:input、shell:screencap、pull
+    words = command.split(maxsplit=2)
+    kind = ":".join(words[:2]) if words[:1] == ["shell"] else words[0]
+    with metrics.timer("adb_command", command=kind):
+        return _adb_command(command, serial, timeout, full_command)
+
+def _adb_command(command, serial, timeout, full_command):
+    device = _attached_devices.get(serial)
+    if device is not None:
+        return device.run(command)
+    if command.startswith("shell "):
+        shell_command = command[len("shell "):]
+        if adb_persistent_shell:
+            try:
+                result = get_session_pool(serial).run(shell_command, timeout)
+                result.args = full_command
+                if result.returncode != 0:
+                    log.warning("adb.exec", f"ADB command failed: {result.stdout}")
+                return result
+            except (ConnectionError, TimeoutError, OSError) as e:
+                log.warning("adb.session", f"adb shell 会话不可用，改为单次执行: {e}")
+        # 设备端命令整体作为一个参数传给 adb，其中的 ; 等符号由设备端 shell 解析而不是本机 shell
+        result = subprocess.run([adb_path, "-s", serial, "shell", shell_command],
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            log.warning("adb.exec", f"ADB command failed: {result.stderr}")
+        return result
     result = subprocess.run(full_command, shell=True, capture_output=True, text=True)
     if result.returncode != 0:
-        print(f"ADB command failed: {result.stderr}")
+        log.warning("adb.exec", f"ADB command failed: {result.stderr}")
     return result
 
-def capture_screen():
+class InputScript:
+    """
+    输入脚本：把一组点击、滑动和等待编译成一条设备端 shell 命令，一次 adb 往返执行完毕。
+
+    等待在设备端执行（sleep），不再需要每次点击之间都经过 adb 往返。
+    """
+
+    def __init__(self):
+        self.steps = []
+        self.duration = 0.0  # 脚本中等待的总时间（秒）
+
+    def __len__(self):
+        return len(self.steps)
+
+    def tap(self, x, y):
+        self.steps.append(f"input tap {int(x)} {int(y)}")
+        return self
+
+    def swipe(self, x1, y1, x2, y2, duration_ms=150):
+        """
+        从 (x1, y1) 拖动到 (x2, y2)，duration_ms 为拖动时长（毫秒）
+        """
+        self.steps.append(f"input swipe {int(x1)} {int(y1)} {int(x2)} {int(y2)} {int(duration_ms)}")
+        self.duration += duration_ms / 1000
+        return self
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self.steps.append(f"sleep {seconds:g}")
+            self.duration += seconds
+        return self
+
+    def to_shell(self):
+        """
+        生成设备端 shell 命令
+        """
+        return "; ".join(self.steps)
+
+    def run(self, serial=None):
+        """
+        在设备上执行脚本
+
+        Returns:
+            subprocess.CompletedProcess: 执行结果，脚本为空时返回 None
+        """
+        if not self.steps:
+            return None
+        return adb_command(f"shell {self.to_shell()}", serial, timeout=adb_command_timeout + self.duration)
+
+@metrics.timed("capture_screen")
+def capture_screen(serial=None, output_path="screen.png"):
     """
-    截取设备屏幕并保存为screen.png。
+    截取设备屏幕并保存为screen.png（或 output_path）。
     """
-    adb_command("shell screencap -p /sdcard/screen.png")
-    adb_command("pull /sdcard/screen.png .")
+    adb_command("shell screencap -p /sdcard/screen.png", serial)
+    adb_command(f"pull /sdcard/screen.png {output_path}", serial)
+
+def decode_raw_screencap(data):
+    """
+    解析 screencap 的原始输出（不带 -p 参数）。
+
+    数据头为 width、height、format 三个小端 uint32，Android 9 及以上还会多一个 colorspace 字段，
+    因此头部长度通过总长度减去像素数据长度得到。
+
+    Args:
+        data (bytes): screencap 原始输出
+
+    Returns:
+        numpy.ndarray: BGR 格式的图像数组
+    """
+    if len(data) < 12:
+        raise ValueError(f"screencap 输出过短: {len(data)} 字节")
+
+    width, height, pixel_format = struct.unpack_from("<III", data, 0)
+    pixel_bytes = width * height * 4
+    header_size = len(data) - pixel_bytes
+    if header_size not in (12, 16):
+        raise ValueError(f"无法解析 screencap 数据: {width}x{height}, 共 {len(data)} 字节")
+
+    if pixel_format not in RAW_PIXEL_FORMATS:
+        raise ValueError(f"不支持的像素格式: {pixel_format}")
+
+    # 直接在原始缓冲区上建立视图，颜色转换时才产生一次拷贝
+    pixels = np.frombuffer(data, dtype=np.uint8, count=pixel_bytes, offset=header_size)
+    pixels = pixels.reshape(height, width, 4)
+    return cv2.cvtColor(pixels, RAW_PIXEL_FORMATS[pixel_format])
+
+@metrics.timed("capture_frame")
+def capture_frame(serial=None):
+    """
+    通过 exec-out 直接读取屏幕原始数据，返回内存中的图像，不经过设备和本地磁盘。
+
+    Args:
+        serial (str): 目标设备，默认为配置中的 device_name
+
+    Returns:
+        numpy.ndarray: BGR 格式的屏幕图像
+    """
+    device = _attached_devices.get(serial or device_name)
+    if device is not None:
+        return device.capture_frame()
+    # exec-out 不经过伪终端，二进制数据不会被换行符转换破坏
+    full_command = [adb_path, "-s", serial or device_name, "exec-out", "screencap"]
+    result = subprocess.run(full_command, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ADB screencap failed: {result.stderr.decode(errors='ignore')}")
+    return decode_raw_screencap(result.stdout)
 
 # 将adb_swipe_utils.py中的所有函数也移到这个文件中
-# 包括swipe_up, swipe_down, swipe_left, swipe_right, pinch_in, pinch_out等函数
\ No newline at end of file
+# 包括swipe_up, swipe_down, swipe_left, swipe_right, pinch_in, pinch_out等函数
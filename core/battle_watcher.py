@@ -0,0 +1,78 @@
+# core/battle_watcher.py
+import threading
+from utils.clock import clock
+from utils.event_log import log
+
+class BattleEndWatcher:
+    """
+    后台对战结束检测线程。
+
+    以较低的频率独立截图，只匹配当前模式的结束按钮（confirm / exit / confirm2）所在区域，
+    检测到后设置 ended 事件，对战循环中等待该事件的出牌间隔会立即结束。
+    """
+
+    def __init__(self, robot, interval=1.0):
+        """
+        Args:
+            robot (Robot): 机器人实例，用于匹配模板和确定设备
+            interval (float): 两次检测之间的间隔（秒）
+        """
+        self.robot = robot
+        self.interval = interval
+        self.ended = threading.Event()
+        self.match = None  # 检测到的结束按钮 TemplateMatch
+        self.detected_at = None
+        self._armed = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.ended.clear()
+        self._armed.clear()
+        self._stop.clear()
+        self.match = None
+        self.detected_at = None
+        self._thread = threading.Thread(target=self._run, name=f"battle-end-{self.robot.device}", daemon=True)
+        self._thread.start()
+
+    def arm(self):
+        """
+        开始检测（释放的卡牌数达到 check_end_after 之后调用）
+        """
+        self._armed.set()
+
+    def stop(self):
+        self._stop.set()
+        self._armed.set()  # 唤醒尚未开始检测的线程
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def wait(self, timeout):
+        """
+        等待对战结束，最多等待 timeout 秒
+
+        Returns:
+            bool: 对战是否已结束
+        """
+        return clock.wait(self.ended, timeout)
+
+    def _run(self):
+        templates = self.robot.battle_end_templates()
+        self._armed.wait()
+        while not self._stop.is_set():
+            started = clock.time()
+            try:
+                # 使用独立的截图（stream 模式下为视频流的最新一帧），不影响主线程的 robot.frame
+                frame = self.robot.grab_frame()
+                results = self.robot.match_templates(templates, frame=frame)
+            except Exception as e:
+                log.error("watcher.end", f"对战结束检测出错: {e}")
+                results = None
+            match = results.first_found(templates) if results is not None else None
+            if match is not None:
+                self.match = match
+                self.detected_at = clock.time()
+                self.ended.set()
+                return
+            clock.wait(self._stop, max(0, self.interval - (clock.time() - started)))
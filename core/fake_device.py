@@ -0,0 +1,218 @@
+# core/fake_device.py
+import os
+import glob
+import json
+import shlex
+import subprocess
+import threading
+import time
+from collections import namedtuple
+import cv2
+from config.settings import ELIXIR_BAR_REGION, ELIXIR_SEGMENTS
+from utils.clock import clock
+
+# 卡牌栏的上边缘（归一化坐标），对战阶段中落在它上方的输入视为出牌
+_HAND_TOP = 0.83
+
+# 设备收到的一次输入：虚拟时间、类型（tap / swipe）、坐标、所在场景阶段、距最近一次截图的实际耗时（毫秒）
+InputRecord = namedtuple("InputRecord", ["time", "kind", "x", "y", "stage", "latency_ms"])
+
+class Stage:
+    """
+    场景中的一个阶段：阶段内依次循环返回 frames 中的截图，满足以下任一条件时进入下一阶段：
+    - duration: 进入本阶段后经过的虚拟时间（秒）
+    - advance_on_tap: 点击落在该归一化区域 (x1, y1, x2, y2) 内，值为 "overlay" 时使用叠加图片所在区域
+    - taps: 本阶段内收到的点击次数
+
+    elixir 为对战阶段的圣水模拟 {"start": 初始圣水, "regen": 每格恢复秒数, "spend": 每次出牌消耗}：
+    截图中的圣水条按当前圣水重新绘制，落在卡牌栏上方的输入视为一次出牌。
+    """
+
+    def __init__(self, name, frames, duration=None, advance_on_tap=None, taps=None, elixir=None):
+        self.name = name
+        self.frames = frames
+        self.duration = duration
+        self.advance_on_tap = advance_on_tap
+        self.taps = taps
+        self.elixir = elixir
+
+def _load_frames(spec):
+    """
+    读取阶段截图：spec 可以是单个图片、图片目录或二者组成的列表
+    """
+    paths = []
+    for item in spec if isinstance(spec, list) else [spec]:
+        if os.path.isdir(item):
+            paths.extend(sorted(glob.glob(os.path.join(item, "*.png"))))
+        else:
+            paths.append(item)
+    frames = []
+    for path in paths:
+        image = cv2.imread(path)
+        if image is None:
+            raise FileNotFoundError(f"无法读取场景截图: {path}")
+        frames.append(image)
+    if not frames:
+        raise ValueError(f"场景阶段没有截图: {spec}")
+    return frames
+
+def _draw_elixir(frame, elixir):
+    """
+    按圣水量重新绘制圣水条：已填充部分为品红色，其余为暗色
+    """
+    height, width = frame.shape[:2]
+    x1, y1, x2, y2 = (int(ELIXIR_BAR_REGION[0] * width), int(ELIXIR_BAR_REGION[1] * height),
+                      int(ELIXIR_BAR_REGION[2] * width), int(ELIXIR_BAR_REGION[3] * height))
+    filled = x1 + int((x2 - x1) * min(elixir, ELIXIR_SEGMENTS) / ELIXIR_SEGMENTS)
+    frame[y1:y2, x1:x2] = (60, 30, 60)
+    frame[y1:y2, x1:filled] = (255, 0, 255)
+    return frame
+
+def _apply_overlay(frames, overlay):
+    """
+    把图片（如结束按钮）叠加到每一帧的指定位置，返回 (新的帧列表, 叠加区域的归一化坐标)
+    """
+    image = cv2.imread(overlay["image"])
+    if image is None:
+        raise FileNotFoundError(f"无法读取叠加图片: {overlay['image']}")
+    result = []
+    for frame in frames:
+        frame = frame.copy()
+        height, width = frame.shape[:2]
+        h, w = image.shape[:2]
+        x = min(max(0, int(overlay["center"][0] * width) - w // 2), width - w)
+        y = min(max(0, int(overlay["center"][1] * height) - h // 2), height - h)
+        frame[y:y + h, x:x + w] = image
+        result.append(frame)
+    return result, (x / width, y / height, (x + w) / width, (y + h) / height)
+
+class FakeDevice:
+    """
+    本地模拟设备：按场景脚本返回录制好的截图，接收并记录点击，不需要真实的模拟器。
+
+    通过 core.adb_manager.attach_device 挂到某个设备名上后，Robot 对该设备的 adb 命令和截图
+    都由它处理，阶段持续时间使用 utils.clock 的虚拟时间，可以加速回放。
+    """
+
+    def __init__(self, stages, loop=True):
+        self.stages = stages
+        self.loop = loop
+        self.inputs = []  # 收到的全部 InputRecord
+        self.transitions = []  # (虚拟时间, 阶段名称)
+        self.captures = 0
+        self.finished = False  # 不循环的场景播放完毕
+        self._files = {}  # 设备端 screencap -p 保存的文件
+        self._lock = threading.Lock()
+        self._last_capture = None
+        self._enter(0)
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        从 JSON 场景文件创建设备，文件中的路径相对于当前工作目录
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            scenario = json.load(f)
+        stages = []
+        for spec in scenario["stages"]:
+            frames = _load_frames(spec["frames"])
+            advance_on_tap = spec.get("advance_on_tap")
+            if "overlay" in spec:
+                frames, overlay_region = _apply_overlay(frames, spec["overlay"])
+                if advance_on_tap == "overlay":
+                    advance_on_tap = overlay_region
+            stages.append(Stage(spec["name"], frames, spec.get("duration"), advance_on_tap, spec.get("taps"),
+                                spec.get("elixir")))
+        return cls(stages, scenario.get("loop", True))
+
+    @property
+    def stage(self):
+        return self.stages[self._index]
+
+    def _enter(self, index):
+        self._index = index
+        self._entered_at = clock.time()
+        self._stage_taps = 0
+        self._frame_index = 0
+        spec = self.stage.elixir
+        self.elixir = None if spec is None else float(spec.get("start", 5))
+        self._elixir_at = self._entered_at
+        self.transitions.append((self._entered_at, self.stage.name))
+
+    def _advance(self):
+        if self._index + 1 < len(self.stages):
+            self._enter(self._index + 1)
+        elif self.loop:
+            self._enter(0)
+        else:
+            self.finished = True
+
+    def _update(self):
+        """按虚拟时间推进阶段和恢复圣水"""
+        duration = self.stage.duration
+        if duration is not None and clock.time() - self._entered_at >= duration:
+            self._advance()
+        if self.elixir is not None:
+            now = clock.time()
+            regen = self.stage.elixir.get("regen", 2.8)
+            self.elixir = min(ELIXIR_SEGMENTS, self.elixir + (now - self._elixir_at) / regen)
+            self._elixir_at = now
+
+    def capture_frame(self):
+        """
+        返回当前阶段的下一帧截图（BGR），对应 adb exec-out screencap
+        """
+        with self._lock:
+            self._update()
+            frames = self.stage.frames
+            frame = frames[self._frame_index % len(frames)].copy()
+            self._frame_index += 1
+            self.captures += 1
+            self._last_capture = time.perf_counter()
+            if self.elixir is not None:
+                _draw_elixir(frame, self.elixir)
+            return frame
+
+    def _input(self, kind, x, y):
+        with self._lock:
+            self._update()
+            latency = None
+            if self._last_capture is not None:
+                latency = (time.perf_counter() - self._last_capture) * 1000
+            self.inputs.append(InputRecord(clock.time(), kind, x, y, self.stage.name, latency))
+            self._stage_taps += 1
+            height, width = self.stage.frames[0].shape[:2]
+            if self.elixir is not None and y / height < _HAND_TOP:
+                self.elixir = max(0.0, self.elixir - self.stage.elixir.get("spend", 3))
+            region = self.stage.advance_on_tap
+            hit = region is not None and region[0] <= x / width <= region[2] and region[1] <= y / height <= region[3]
+            if hit or (self.stage.taps is not None and self._stage_taps >= self.stage.taps):
+                self._advance()
+
+    def run(self, command):
+        """
+        执行 adb 命令，支持 InputScript 生成的 input tap / input swipe / sleep 组合、
+        screencap -p 与 pull，其余命令直接返回成功
+
+        Returns:
+            subprocess.CompletedProcess: 执行结果
+        """
+        if command.startswith("shell "):
+            for step in command[len("shell "):].split(";"):
+                self._run_shell(shlex.split(step))
+        elif command.startswith("pull "):
+            _, source, target = shlex.split(command)
+            with open(target, "wb") as f:
+                f.write(self._files.get(source, b""))
+        return subprocess.CompletedProcess(command, 0, "", "")
+
+    def _run_shell(self, args):
+        if args[:2] == ["input", "tap"]:
+            self._input("tap", int(args[2]), int(args[3]))
+        elif args[:2] == ["input", "swipe"]:
+            # 拖动出牌以松手位置为准
+            self._input("swipe", int(args[4]), int(args[5]))
+        elif args[:1] == ["sleep"]:
+            clock.sleep(float(args[1]))
+        elif args[:2] == ["screencap", "-p"]:
+            self._files[args[2]] = cv2.imencode(".png", self.capture_frame())[1].tobytes()
@@ -0,0 +1,174 @@
+# core/navigator.py
+import os
+from collections import Counter, defaultdict
+from config.settings import max_lobby_recoveries, lobby_recovery_backoff
+from utils.clock import clock
+from utils.event_log import log
+
+# 屏幕状态
+LOBBY = "lobby"              # 主界面（对战页）
+MATCHMAKING = "matchmaking"  # 匹配中 / 选择匹配方式
+IN_BATTLE = "in_battle"      # 对战中
+RESULT = "result"            # 对战结算
+REWARD = "reward"            # 奖励领取
+DIALOG = "dialog"            # 弹窗
+SUB_PAGE = "sub_page"        # 其他页面（底部导航栏未选中对战页）
+UNKNOWN = "unknown"          # 无法识别
+
+# 各状态的识别模板
+SCREEN_STATES = {
+    LOBBY: ["modle/Combat.png", "modle/Battle_Interface3.png"],
+    MATCHMAKING: ["modle/Quick_matching.png"],
+    RESULT: ["modle/confirm.png", "modle/exit.png"],
+    REWARD: ["modle/Reward.png"],
+    DIALOG: ["modle/Return_to_game.png", "modle/close.png", "modle/confirm2.png"],
+    SUB_PAGE: ["modle/Battle_Interface.png", "modle/Battle_Interface2.png"],
+}
+
+# 各状态返回主界面时的操作：[(模板, 点击参数)]，按优先级点击第一个匹配成功的模板
+TRANSITIONS = {
+    LOBBY: [],
+    MATCHMAKING: [],
+    RESULT: [("modle/confirm.png", {}), ("modle/exit.png", {})],
+    REWARD: [("modle/Reward.png", {"delay_after": 4, "click_count": 6})],
+    DIALOG: [("modle/Return_to_game.png", {"delay_after": 4}), ("modle/close.png", {}), ("modle/confirm2.png", {})],
+    SUB_PAGE: [("modle/Battle_Interface.png", {}), ("modle/Battle_Interface2.png", {})],
+}
+
+class ScreenNavigator:
+    """
+    屏幕状态机：识别当前界面所处的状态，并执行返回主界面所需的操作。
+
+    识别时先只匹配根据历史转移统计最可能出现的几个状态的模板，置信度足够高时直接采用；
+    否则再匹配其余状态的模板，取置信度最高的状态。
+
+    已在主界面时恢复操作什么也不做；两次对战成功之间连续出现这种恢复时逐次延长等待，
+    达到 max_recoveries 次后不再认为已恢复，由调用方停止循环。
+    """
+
+    def __init__(self, robot, likely_states=2, confident_threshold=0.9,
+                 max_recoveries=max_lobby_recoveries, recovery_backoff=lobby_recovery_backoff):
+        """
+        Args:
+            robot (Robot): 用于截图、匹配和点击的机器人实例
+            likely_states (int): 第一轮优先匹配的状态数量
+            confident_threshold (float): 第一轮匹配达到该置信度时不再匹配其余状态
+            max_recoveries (int): 连续多少次恢复时已在主界面后放弃
+            recovery_backoff (float): 第 n 次连续恢复前等待 n 倍该时间（秒）
+        """
+        self.robot = robot
+        self.likely_states = likely_states
+        self.confident_threshold = confident_threshold
+        self.max_recoveries = max_recoveries
+        self.recovery_backoff = recovery_backoff
+        self.lobby_recoveries = 0  # 自上次对战成功以来，恢复时已在主界面的连续次数
+        self.transitions = defaultdict(Counter)  # {上一个状态: Counter(下一个状态)}
+        self.state_counts = Counter()
+        self.last_state = None
+        self.last_recovery = None  # 最近一次返回主界面的方式，如 "dialog:close"
+
+    def state_order(self):
+        """
+        按出现概率排列待识别的状态：优先使用从上一个状态出发的转移统计，其次是各状态的总出现次数
+        """
+        following = self.transitions.get(self.last_state, Counter())
+        states = list(SCREEN_STATES)
+        return sorted(states, key=lambda state: (-following[state], -self.state_counts[state], states.index(state)))
+
+    def _best_state(self, results, states):
+        best_state, best_score = UNKNOWN, 0
+        for state in states:
+            for template_path in SCREEN_STATES[state]:
+                if results.found(template_path) and results[template_path].score > best_score:
+                    best_state, best_score = state, results[template_path].score
+        return best_state, best_score
+
+    def classify(self, need_capture=True):
+        """
+        识别当前屏幕状态
+
+        Args:
+            need_capture (bool): 是否需要重新截图
+
+        Returns:
+            tuple: (状态, MatchResults)，识别失败时状态为 UNKNOWN
+        """
+        if need_capture and not self.robot.capture_screen():
+            return UNKNOWN, None
+
+        order = self.state_order()
+        likely, rest = order[:self.likely_states], order[self.likely_states:]
+
+        results = self.robot.match_templates([path for state in likely for path in SCREEN_STATES[state]])
+        if results is None:
+            return UNKNOWN, None
+        state, score = self._best_state(results, likely)
+
+        if score < self.confident_threshold:
+            rest_results = self.robot.match_templates([path for state in rest for path in SCREEN_STATES[state]])
+            if rest_results is not None:
+                results.matches.update(rest_results.matches)
+            state, score = self._best_state(results, order)
+
+        self.record(state)
+        return state, results
+
+    def record(self, state):
+        """
+        记录一次状态观测，更新转移统计
+        """
+        if self.last_state is not None:
+            self.transitions[self.last_state][state] += 1
+        self.state_counts[state] += 1
+        self.last_state = state
+
+    def recover_to_lobby(self):
+        """
+        识别当前状态并执行对应的返回主界面操作
+
+        Returns:
+            bool: 已在主界面或已执行了返回操作时返回True；
+                  连续 max_recoveries 次恢复时都已在主界面（对战始终无法开始）时返回False
+        """
+        if self.lobby_recoveries:
+            clock.sleep(self.recovery_backoff * self.lobby_recoveries)
+        state, results = self.classify()
+        log.info("navigator.recover", f"当前屏幕状态: {state}")
+        self.last_recovery = state
+
+        if state == LOBBY:
+            self.lobby_recoveries += 1
+            if self.lobby_recoveries >= self.max_recoveries:
+                log.error("navigator.recover", f"连续 {self.lobby_recoveries} 次恢复时已在主界面，仍无法开始对战")
+                self.last_recovery = f"{state}:stuck"
+                return False
+            return True
+
+        for template_path, click_args in TRANSITIONS.get(state, []):
+            box = results.box(template_path)
+            if box is None:
+                continue
+            template_name = os.path.splitext(os.path.basename(template_path))[0]
+            if self.robot.click_box(box, **click_args):
+                log.info("navigator.recover", f"已点击{template_name}图像，返回主界面")
+                self.last_recovery = f"{state}:{template_name}"
+                return True
+
+        log.warning("navigator.recover", f"状态 {state} 没有可用的返回操作")
+        self.last_recovery = f"{state}:none"
+        return False
+
+    def reset_recoveries(self):
+        """
+        对战成功后调用：重新开始统计连续的主界面恢复次数
+        """
+        self.lobby_recoveries = 0
+
+    def stats(self):
+        """
+        返回状态统计：各状态出现次数和状态转移次数
+        """
+        return {
+            "states": dict(self.state_counts),
+            "transitions": {prev: dict(counter) for prev, counter in self.transitions.items()},
+        }
@@ -0,0 +1,269 @@
+# core/stream_capture.py
+import atexit
+import os
+import socket
+import subprocess
+import threading
+import time
+import cv2
+import numpy as np
+from config.settings import (adb_path, device_name, stream_bit_rate, stream_size, stream_max_frame_age,
+                             stream_restart_limit, stream_file_fps)
+from utils.clock import clock
+from utils.event_log import log
+from utils.metrics import metrics
+
+# 低延迟解码：只探测最少的数据就开始输出画面。
+# 不使用 fflags;nobuffer：它会丢弃探测期间读取的数据，第一个关键帧所在的整组画面都无法解码
+_LOW_DELAY_OPTIONS = "probesize;32|analyzeduration;0|flags;low_delay"
+_capture_options_lock = threading.Lock()
+
+def _open_capture(url, input_format=None):
+    """
+    用 OpenCV 的 FFmpeg 后端打开视频流。
+    FFmpeg 的参数只能通过环境变量 OPENCV_FFMPEG_CAPTURE_OPTIONS 传入，打开期间加锁，避免多个流互相覆盖。
+    input_format 为 None 时由 FFmpeg 自动识别格式（使用默认的探测长度）。
+    """
+    options = "" if input_format is None else f"input_format;{input_format}|{_LOW_DELAY_OPTIONS}"
+    with _capture_options_lock:
+        previous = os.environ.get("OPENCV_FFMPEG_CAPTURE_OPTIONS")
+        os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = options
+        try:
+            return cv2.VideoCapture(url, cv2.CAP_FFMPEG)
+        finally:
+            if previous is None:
+                os.environ.pop("OPENCV_FFMPEG_CAPTURE_OPTIONS", None)
+            else:
+                os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = previous
+
+def screenrecord_command(serial=None, bit_rate=stream_bit_rate, time_limit=None, size=stream_size):
+    """
+    通过 exec-out 把 screenrecord 的 H.264 输出直接写到标准输出的 adb 命令
+
+    Args:
+        size (tuple): 输出分辨率 (宽, 高)，None 为设备默认
+    """
+    command = [adb_path, "-s", serial or device_name, "exec-out", "screenrecord", "--output-format=h264",
+               f"--bit-rate={bit_rate}"]
+    if size is not None:
+        command.append(f"--size={size[0]}x{size[1]}")
+    if time_limit is not None:
+        command.append(f"--time-limit={time_limit}")
+    return command + ["-"]
+
+def record_stream(output_path, seconds=10, serial=None, bit_rate=stream_bit_rate, size=stream_size):
+    """
+    录制设备画面为 H.264 文件，可作为 StreamCapture 的 source 代替设备
+
+    Returns:
+        int: 文件大小（字节）
+    """
+    with open(output_path, "wb") as f:
+        result = subprocess.run(screenrecord_command(serial, bit_rate, seconds, size), stdout=f, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"screenrecord 失败: {result.stderr.decode(errors='ignore')}")
+    return os.path.getsize(output_path)
+
+class StreamCapture:
+    """
+    视频流截图。
+
+    设备端通过 exec-out 持续运行 screenrecord --output-format=h264，后台线程把输出转发到本机回环端口，
+    由 OpenCV（FFmpeg）边接收边解码，只保留最新的一帧。latest() 直接返回这一帧而不等待设备截图，
+    画面变化时帧的延迟只有编码、传输和解码的时间。
+
+    source 为录制的 H.264 文件时代替设备：数据经过与设备相同的转发和解码流程，按 fps 播放（跟随时钟加速），
+    loop 为 True 时播放到结尾后从头开始。
+
+    size 为 screenrecord 的输出分辨率，未指定时由设备决定，可能小于单次截图，调用方需检查帧的尺寸。
+
+    screenrecord 有时长上限，结束后自动重新启动；连续 restart_limit 次没有解码出画面时视为不可用，
+    failed 置为 True，调用方应改用单次截图（capture_frame）。
+    """
+
+    def __init__(self, serial=None, source=None, bit_rate=stream_bit_rate, fps=stream_file_fps, loop=True,
+                 restart_limit=stream_restart_limit, size=stream_size):
+        self.serial = serial or device_name
+        self.source = source
+        self.bit_rate = bit_rate
+        self.size = size
+        self.fps = fps
+        self.loop = loop
+        self.restart_limit = restart_limit
+        self.frames = 0  # 已解码的帧数
+        self.failed = False
+        self._latest = None  # (帧, 解码完成的时间, 序号)，整体替换，读取时无需加锁
+        self._stop = threading.Event()
+        self._thread = None
+        self._process = None
+
+    def start(self):
+        """
+        启动后台接收和解码线程，返回自身
+        """
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=f"stream-{self.serial}", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        """
+        停止视频流并结束 screenrecord 进程
+        """
+        self._stop.set()
+        self._terminate()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def latest(self, max_age=None):
+        """
+        返回最新解码的一帧，不等待（多个线程共享同一个数组，调用方不应修改）
+
+        Args:
+            max_age (float): 允许的最长未更新时间（秒），超过时返回 None
+
+        Returns:
+            numpy.ndarray: BGR 格式的屏幕图像，还没有画面或画面过旧时返回 None
+        """
+        latest = self._latest
+        if latest is None:
+            return None
+        frame, decoded_at, _ = latest
+        age = time.monotonic() - decoded_at
+        if max_age is not None and age > max_age:
+            return None
+        metrics.observe("stream_frame_age", age)
+        return frame
+
+    def _run(self):
+        failures = 0
+        while not self._stop.is_set():
+            frames_before = self.frames
+            try:
+                self._stream_once()
+            except (OSError, cv2.error) as e:
+                log.warning("stream", f"视频流出错: {e}")
+            if self._stop.is_set():
+                break
+            if self.frames > frames_before:
+                failures = 0
+            else:
+                failures += 1
+                if failures >= self.restart_limit:
+                    self.failed = True
+                    self._latest = None
+                    log.warning("stream", f"视频流连续 {failures} 次没有画面，改用单次截图: {self.source or self.serial}")
+                    break
+                self._stop.wait(1.0)
+            if self.source is not None and not self.loop:
+                break
+            log.debug("stream", f"视频流已结束，重新启动: {self.source or self.serial}")
+
+    def _stream_once(self):
+        """
+        启动一次数据源并解码到结束（screenrecord 退出、文件播放完或调用 stop）
+        """
+        reader = self._open_source()
+        server = socket.create_server(("127.0.0.1", 0))
+        server.settimeout(5)
+        pump = threading.Thread(target=self._pump, args=(server, reader), name=f"stream-pump-{self.serial}",
+                                daemon=True)
+        pump.start()
+        capture = _open_capture(f"tcp://127.0.0.1:{server.getsockname()[1]}", self._input_format())
+        try:
+            if capture.isOpened():
+                self._decode(capture)
+        finally:
+            capture.release()
+            self._terminate()
+            pump.join(timeout=5)
+            reader.close()
+            server.close()
+
+    def _open_source(self):
+        if self.source is not None:
+            return open(self.source, "rb")
+        self._process = subprocess.Popen(screenrecord_command(self.serial, self.bit_rate, size=self.size),
+                                         stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        return self._process.stdout
+
+    def _input_format(self):
+        """设备和 .h264 文件为裸 H.264 码流，直接指定格式；其他录制文件由 FFmpeg 识别"""
+        if self.source is None or self.source.lower().endswith((".h264", ".264")):
+            return "h264"
+        return None
+
+    def _pump(self, server, reader):
+        """
+        后台线程：把数据源的输出原样转发给解码器的连接，解码跟不上时 sendall 阻塞，数据留在管道中
+        """
+        try:
+            conn, _ = server.accept()
+        except OSError:
+            return
+        with conn:
+            try:
+                while not self._stop.is_set():
+                    chunk = reader.read1(65536)
+                    if not chunk:
+                        break
+                    conn.sendall(chunk)
+            except (OSError, ValueError):
+                # 解码器已断开或数据源已关闭
+                pass
+
+    def _decode(self, capture):
+        due = None
+        while not self._stop.is_set():
+            ok, frame = capture.read()
+            if not ok:
+                return
+            self.frames += 1
+            self._latest = (frame, time.monotonic(), self.frames)
+            metrics.count("stream_frames")
+            if self.source is not None and self.fps:
+                # 录制文件按帧率播放
+                due = (due or time.monotonic()) + clock.scale(1 / self.fps)
+                self._stop.wait(max(0.0, due - time.monotonic()))
+
+    def _terminate(self):
+        process, self._process = self._process, None
+        if process is not None and process.poll() is None:
+            process.kill()
+            process.wait()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="视频流截图：录制设备画面，或测试视频流的帧率和画面延迟")
+    parser.add_argument("source", nargs="?", help="录制的视频文件，默认直接读取设备")
+    parser.add_argument("--serial", default=device_name, help="设备名称")
+    parser.add_argument("--seconds", type=float, default=10, help="录制或测试的时长（秒）")
+    parser.add_argument("--record", help="把设备画面录制到该文件后退出")
+    args = parser.parse_args()
+
+    if args.record:
+        size = record_stream(args.record, int(args.seconds), args.serial)
+        print(f"已录制 {args.seconds:g} 秒到 {args.record}（{size / 1024:.0f} KB）")
+    else:
+        stream = StreamCapture(args.serial, source=args.source).start()
+        ages, started = [], time.monotonic()
+        while time.monotonic() - started < args.seconds and not stream.failed:
+            latest = stream._latest
+            if latest is not None:
+                ages.append(time.monotonic() - latest[1])
+            time.sleep(0.05)
+        stream.stop()
+        log.flush()
+        elapsed = time.monotonic() - started
+        print(f"解码 {stream.frames} 帧，{stream.frames / elapsed:.1f} 帧/秒")
+        if ages:
+            print(f"最新帧距解码的时间: p50 {np.percentile(ages, 50) * 1000:.0f} ms，"
+                  f"p95 {np.percentile(ages, 95) * 1000:.0f} ms，最大允许 {stream_max_frame_age * 1000:.0f} ms")
@@ -2,7 +2,9 @@
 import os
 import cv2
 import numpy as np
-from utils.image_utils import find_template_position
+from concurrent.futures import ThreadPoolExecutor
+from utils.image_utils import find_template_position, load_image, match_many
+from utils.event_log import log
 
 def setup_result_directory():
     """
@@ -19,7 +21,7 @@ def match_images(source_image_path, template_image_path, result_save_name=None,
     通用图像匹配函数，用于测试目标图像和源图像的匹配情况
     
     Args:
-        source_image_path (str): 源图像路径（大图）
+        source_image_path (str | numpy.ndarray): 源图像路径（大图），也可以直接传入内存中的屏幕图像
         template_image_path (str): 模板图像路径（小图）
         result_save_name (str): 结果图像保存名称，如果为None则自动生成
         threshold (float): 匹配置信度阈值
@@ -29,13 +31,15 @@ def match_images(source_image_path, template_image_path, result_save_name=None,
     Returns:
         dict: 匹配结果字典，包含位置信息和匹配状态
     """
+    is_frame = isinstance(source_image_path, np.ndarray)
+
     # 检查源图像和模板图像是否存在
-    if not os.path.exists(source_image_path):
-        print(f"错误：源图像 {source_image_path} 不存在")
+    if not is_frame and not os.path.exists(source_image_path):
+        log.error("matcher", f"错误：源图像 {source_image_path} 不存在")
         return {"success": False, "error": "源图像不存在"}
     
     if not os.path.exists(template_image_path):
-        print(f"错误：模板图像 {template_image_path} 不存在")
+        log.error("matcher", f"错误：模板图像 {template_image_path} 不存在")
         return {"success": False, "error": "模板图像不存在"}
     
     # 创建结果目录
@@ -50,9 +54,9 @@ def match_images(source_image_path, template_image_path, result_save_name=None,
     
     result_path = os.path.join('modle_result', result_save_name)
     
-    print(f"正在匹配模板 '{template_name}'...")
-    print(f"源图像: {source_image_path}")
-    print(f"模板图像: {template_image_path}")
+    log.info("matcher", f"正在匹配模板 '{template_name}'...")
+    log.info("matcher", f"源图像: {'内存图像' if is_frame else source_image_path}")
+    log.info("matcher", f"模板图像: {template_image_path}")
     
     try:
         # 调用图像匹配函数
@@ -66,21 +70,21 @@ def match_images(source_image_path, template_image_path, result_save_name=None,
         )
         
         # 读取源图像用于绘制结果
-        source_image = cv2.imread(source_image_path)
+        source_image = source_image_path.copy() if is_frame else load_image(source_image_path)
         if source_image is None:
-            print("无法读取源图像")
+            log.error("matcher", "无法读取源图像")
             return {"success": False, "error": "无法读取源图像"}
         
         if result:
             x, y, w, h = result
-            print(f"匹配成功！位置: ({x}, {y}), 宽度: {w}, 高度: {h}")
+            log.info("matcher", f"匹配成功！位置: ({x}, {y}), 宽度: {w}, 高度: {h}")
             
             # 在源图像上绘制矩形框
             cv2.rectangle(source_image, (x, y), (x + w, y + h), (0, 255, 0), 2)
             
             # 保存结果图像
             cv2.imwrite(result_path, source_image)
-            print(f"结果图像已保存到: {result_path}")
+            log.info("matcher", f"结果图像已保存到: {result_path}")
             
             return {
                 "success": True,
@@ -89,61 +93,113 @@ def match_images(source_image_path, template_image_path, result_save_name=None,
                 "result_path": result_path
             }
         else:
-            print("未找到匹配")
+            log.info("matcher", "未找到匹配")
             return {"success": False, "error": "未找到匹配"}
             
     except Exception as e:
-        print(f"匹配过程中发生错误: {e}")
+        log.error("matcher", f"匹配过程中发生错误: {e}")
         return {"success": False, "error": str(e)}
 
 def batch_match_images(source_image_path, template_paths, threshold=0.75, 
-                       min_scale=0.75, max_scale=2.0):
+                       min_scale=0.75, max_scale=2.0, max_workers=None):
     """
     批量匹配多个模板图像
+    源图像只读取和预处理一次，所有模板通过 match_many 在同一帧上完成匹配。
     
     Args:
-        source_image_path (str): 源图像路径
+        source_image_path (str | numpy.ndarray): 源图像路径，也可以直接传入内存中的屏幕图像
         template_paths (list): 模板图像路径列表
         threshold (float): 匹配置信度阈值
         min_scale (float): 最小缩放比例
         max_scale (float): 最大缩放比例
+        max_workers (int): 并行匹配的线程数，None 或 1 表示串行
     
     Returns:
         dict: 所有匹配结果的字典
     """
     results = {}
+    is_frame = isinstance(source_image_path, np.ndarray)
+    
+    log.info("matcher", f"开始批量匹配，源图像: {'内存图像' if is_frame else source_image_path}")
+    log.info("matcher", f"模板数量: {len(template_paths)}")
+    
+    source_image = load_image(source_image_path)
+    if source_image is None:
+        log.error("matcher", "无法读取源图像")
+        for template_path in template_paths:
+            template_name = os.path.splitext(os.path.basename(template_path))[0]
+            results[template_name] = {"success": False, "error": "无法读取源图像"}
+        return results
     
-    print(f"开始批量匹配，源图像: {source_image_path}")
-    print(f"模板数量: {len(template_paths)}")
+    # 创建结果目录
+    setup_result_directory()
+    
+    existing = [path for path in template_paths if os.path.exists(path)]
+    executor = ThreadPoolExecutor(max_workers) if max_workers and max_workers > 1 else None
+    try:
+        matched = match_many(
+            source_image, existing,
+            threshold=threshold,
+            min_scale=min_scale,
+            max_scale=max_scale,
+            executor=executor
+        )
+    except Exception as e:
+        # 匹配出错时不中断调用方，每个模板都返回错误
+        log.error("matcher", f"批量匹配出错: {e}")
+        for template_path in template_paths:
+            template_name = os.path.splitext(os.path.basename(template_path))[0]
+            error = f"匹配出错: {e}" if template_path in existing else "模板图像不存在"
+            results[template_name] = {"success": False, "error": error}
+        return results
+    finally:
+        if executor is not None:
+            executor.shutdown()
     
     for i, template_path in enumerate(template_paths):
-        print(f"\n--- 处理第 {i+1}/{len(template_paths)} 个模板 ---")
+        log.info("matcher", f"--- 处理第 {i+1}/{len(template_paths)} 个模板 ---")
         
         # 生成结果保存名称
         template_name = os.path.splitext(os.path.basename(template_path))[0]
-        result_name = f"{template_name}_result.png"
+        result_path = os.path.join('modle_result', f"{template_name}_result.png")
         
-        # 执行匹配
-        result = match_images(
-            source_image_path=source_image_path,
-            template_image_path=template_path,
-            result_save_name=result_name,
-            threshold=threshold,
-            min_scale=min_scale,
-            max_scale=max_scale
-        )
+        if not matched.matches.get(template_path):
+            log.error("matcher", f"错误：模板图像 {template_path} 不存在")
+            results[template_name] = {"success": False, "error": "模板图像不存在"}
+            continue
+        
+        match = matched[template_path]
+        if match.box is None:
+            log.info("matcher", f"未找到匹配，最高置信度: {match.score:.2f}")
+            results[template_name] = {"success": False, "error": "未找到匹配", "score": match.score}
+            continue
+        
+        x, y, w, h = match.box
+        log.info("matcher", f"匹配成功！位置: ({x}, {y}), 宽度: {w}, 高度: {h}, 置信度: {match.score:.2f}")
+        
+        # 在源图像副本上绘制矩形框并保存
+        result_image = source_image.copy()
+        cv2.rectangle(result_image, (x, y), (x + w, y + h), (0, 255, 0), 2)
+        cv2.imwrite(result_path, result_image)
+        log.info("matcher", f"结果图像已保存到: {result_path}")
         
-        results[template_name] = result
+        results[template_name] = {
+            "success": True,
+            "position": (x, y),
+            "size": (w, h),
+            "score": match.score,
+            "result_path": result_path
+        }
     
     # 输出摘要
-    print("\n=== 匹配结果摘要 ===")
+    log.info("matcher", "=== 匹配结果摘要 ===")
     for template_name, result in results.items():
         status = "成功" if result["success"] else "失败"
-        print(f"{template_name}: {status}")
+        log.info("matcher", f"{template_name}: {status}")
         if result["success"]:
             pos = result["position"]
             size = result["size"]
-            print(f"  位置: ({pos[0]}, {pos[1]}), 大小: {size[0]}x{size[1]}")
+            log.info("matcher", f"  位置: ({pos[0]}, {pos[1]}), 大小: {size[0]}x{size[1]}")
     
     return results
 
@@ -0,0 +1,161 @@
+# replay.py
+import argparse
+import json
+import time
+from collections import defaultdict
+import numpy as np
+from core.adb_manager import attach_device, detach_device
+from core.fake_device import FakeDevice
+from utils.battle_history import BattleHistory
+from utils.clock import clock
+from utils.event_log import log
+
+# 统计耗时的 Robot 方法（包含嵌套调用，例如 click_template 的耗时中包含截图和匹配）
+TIMED_STAGES = [
+    "capture_screen", "match_template", "match_templates", "read_elixir",
+    "select_random_card", "play_random_card", "click_template", "check_battle_end",
+]
+
+REPLAY_DEVICE = "replay"
+
+def _timed(func, samples):
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - started)
+    return wrapper
+
+def _percentiles(values):
+    if not values:
+        return {"count": 0}
+    values = np.asarray(values, dtype=np.float64)
+    return {
+        "count": int(values.size),
+        "mean": float(values.mean()),
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+    }
+
+def run_replay(scenario="scenarios/single.json", battles=3, speed=20.0, check_end_after=5, history=None,
+               **robot_options):
+    """
+    在本地模拟设备上离线回放对战流程，用于比较改动前后的性能
+
+    Args:
+        scenario (str): 场景文件路径
+        battles (int): 回放的对战场数
+        speed (float): 等待时间的加速倍数，截图和匹配等计算不加速
+        check_end_after (int): 在释放多少张卡牌后开始检查对战结束
+        history (str): 对战历史数据库路径，指定时按历史数据安排结束检测和等待，并记录回放的对战；
+            默认不读写对战历史，避免回放数据混入真实设备的记录
+        robot_options: 传给 Robot 的其他参数
+
+    Returns:
+        dict: 回放报告
+    """
+    from robot import Robot
+    from async_battle import run_auto_battle
+
+    clock.set_speed(speed)
+    device = FakeDevice.from_file(scenario)
+    attach_device(REPLAY_DEVICE, device)
+    robot = Robot(device=REPLAY_DEVICE, use_history=False, **robot_options)
+    if history:
+        robot.history = BattleHistory(history)
+        robot.refresh_schedule()
+
+    stage_samples = defaultdict(list)
+    for name in TIMED_STAGES:
+        setattr(robot, name, _timed(getattr(robot, name), stage_samples[name]))
+
+    durations = []
+    successful = 0
+    started_virtual, started_real = clock.time(), time.perf_counter()
+    try:
+        for i in range(battles):
+            print(f"回放第 {i + 1}/{battles} 场对战")
+            battle_started = clock.time()
+            battle_check_end_after = check_end_after
+            if robot.history is not None:
+                battle_check_end_after = robot.next_check_end_after(0)
+                robot.begin_battle_record()
+            if robot.async_battle:
+                done = run_auto_battle(robot, check_end_after=battle_check_end_after)
+            else:
+                done = robot.auto_battle(check_end_after=battle_check_end_after)
+            durations.append(clock.time() - battle_started)
+            if robot.history is not None:
+                robot._notify_battle_finished(done, battle_started, 0)
+                robot.refresh_schedule()
+            if done:
+                successful += 1
+                robot.navigator.reset_recoveries()
+            elif not robot.recover_to_lobby():
+                print("无法返回主界面，停止回放")
+                break
+    finally:
+        detach_device(REPLAY_DEVICE)
+        clock.set_speed(1.0)
+        if robot.history is not None:
+            robot.history.close()
+
+    virtual_elapsed = clock.time() - started_virtual
+    latencies = [record.latency_ms for record in device.inputs
+                 if record.latency_ms is not None and record.stage == "battle"]
+    return {
+        "scenario": scenario,
+        "speed": speed,
+        "battles": len(durations),
+        "successful": successful,
+        "virtual_seconds": virtual_elapsed,
+        "real_seconds": time.perf_counter() - started_real,
+        "battles_per_hour": successful / (virtual_elapsed / 3600) if virtual_elapsed > 0 else 0.0,
+        "battle_seconds": _percentiles(durations),
+        "decision_latency_ms": _percentiles(latencies),
+        "inputs": len(device.inputs),
+        "captures": device.captures,
+        "stages_ms": {name: {key: value * 1000 if key != "count" else value
+                             for key, value in _percentiles(samples).items()}
+                      for name, samples in stage_samples.items() if samples},
+        "waits": {label: _percentiles(values) for label, values in robot.wait_stats.items()},
+    }
+
+def print_report(report):
+    log.flush()  # 先输出回放过程中缓冲的日志
+    print(f"\n{'='*50}")
+    print(f"场景: {report['scenario']}，加速 {report['speed']:g} 倍")
+    print(f"对战: {report['successful']}/{report['battles']} 场成功，虚拟用时 {report['virtual_seconds']:.1f} 秒，"
+          f"实际用时 {report['real_seconds']:.1f} 秒")
+    print(f"每小时对战: {report['battles_per_hour']:.1f} 场")
+    latency = report["decision_latency_ms"]
+    if latency["count"]:
+        print(f"决策延迟（截图到输入）: 平均 {latency['mean']:.1f} ms，p50 {latency['p50']:.1f} ms，"
+              f"p95 {latency['p95']:.1f} ms（{latency['count']} 次）")
+    print(f"截图 {report['captures']} 次，输入 {report['inputs']} 次")
+    for name, stats in report["stages_ms"].items():
+        print(f"  {name}: {stats['count']} 次，平均 {stats['mean']:.1f} ms，p95 {stats['p95']:.1f} ms")
+    for label, stats in report["waits"].items():
+        print(f"  等待[{label}]: {stats['count']} 次，平均 {stats['mean']:.2f} 秒")
+    print(f"{'='*50}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="使用录制的截图离线回放对战流程")
+    parser.add_argument("scenario", nargs="?", default="scenarios/single.json", help="场景文件")
+    parser.add_argument("--battles", type=int, default=3, help="回放的对战场数")
+    parser.add_argument("--speed", type=float, default=20, help="等待时间加速倍数")
+    parser.add_argument("--mode", default="single", choices=["single", "double", "defense"], help="对战模式")
+    parser.add_argument("--check-end-after", type=int, default=5, help="释放多少张卡牌后开始检查对战结束")
+    parser.add_argument("--async-battle", action="store_true", help="使用异步对战引擎")
+    parser.add_argument("--history", help="对战历史数据库，指定时使用并记录对战历史")
+    parser.add_argument("--json", help="把报告保存为 JSON 文件")
+    args = parser.parse_args()
+
+    report = run_replay(args.scenario, battles=args.battles, speed=args.speed,
+                        check_end_after=args.check_end_after, history=args.history, battle_mode=args.mode,
+                        async_battle=args.async_battle)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
@@ -1,14 +1,37 @@
 # robot.py
 import os
+import re
 import cv2
-import time
 import random
-from core.adb_manager import adb_command, capture_screen
-from utils.image_utils import find_template_position, randomize_coordinate
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import (match_workers, device_name, device_vm_size, battle_end_watch_interval,
+                             ELIXIR_REQUIRED, CARD_COSTS, elixir_poll_interval, card_play_mode, card_select_delay,
+                             card_drag_duration, max_failed_plays, stream_max_frame_age, hand_frame_max_age)
+from core.adb_manager import InputScript, capture_screen, capture_frame
+from core.stream_capture import StreamCapture
+from core.navigator import ScreenNavigator, LOBBY
+from core.battle_watcher import BattleEndWatcher
+from async_battle import run_auto_battle
+from utils.image_utils import (find_template_position, match_many, calibrate_scales, get_sweep_executor,
+                               get_template_region, randomize_coordinate, MatchResults)
+from utils.frame_cache import MatchCache, frame_fingerprint, fingerprints_equal
+from utils.wait import wait_until, fixed_schedule
+from utils.clock import clock
+from utils.metrics import metrics
+from utils.event_log import log
+from utils.elixir import ElixirReader
+from utils.hand import HandRecognizer
+from utils.scale_lock import ScaleLock
+from utils.battle_history import BattleHistory
+from utils.template_registry import template_registry
 
 class Robot:
     def __init__(self, default_threshold=0.75, default_min_scale=0.75, default_max_scale=2.0,
-                 battle_mode="single", wait_time=10, max_cards=60):
+                 battle_mode="single", wait_time=10, max_cards=60, capture_mode="raw",
+                 search_mode="pyramid", use_scale_lock=True, use_match_cache=True, async_battle=False,
+                 device=None, end_watch_interval=battle_end_watch_interval, use_elixir=True,
+                 use_hand_recognition=True, match_mode="auto", stream_source=None, use_history=True):
         """
         初始化机器人
         
@@ -19,6 +42,19 @@ class Robot:
             battle_mode (str): 对战模式，"single" 为单人模式，"double" 为双人模式，"defense" 为保卫模式
             wait_time (int): 等待对战开始的时间（秒）
             max_cards (int): 最大释放卡牌次数
+            capture_mode (str): 截图方式，"raw" 为直接读取内存图像，"png" 为保存screen.png后再读取，
+                "stream" 为读取 screenrecord 视频流的最新一帧（不可用时自动退回 raw）
+            search_mode (str): 模板搜索方式，"pyramid" 为由粗到细的金字塔搜索，"full" 为原分辨率全图搜索
+            use_scale_lock (bool): 是否锁定每个模板的缩放比例，只搜索已知比例及相邻比例
+            use_match_cache (bool): 画面相关区域没有变化时是否复用上一次的匹配结果（raw或stream截图模式）
+            async_battle (bool): 是否使用异步对战引擎（截图、匹配、出牌并行进行）
+            device (str): 设备名称，默认为配置中的 device_name；多台设备同时运行时各自使用独立的截图文件
+            end_watch_interval (float): 后台检测对战结束的间隔（秒），0 表示在每次出牌前检查
+            use_elixir (bool): 是否读取圣水条，圣水足够时立即出牌而不是固定等待
+            use_hand_recognition (bool): 是否识别手牌，只在可用的卡槽中选择卡牌（raw或stream截图模式）
+            match_mode (str): 模板匹配模式 "color"/"gray"/"edge"/"hybrid"，"auto" 使用 TEMPLATE_MATCH_MODES 中的配置
+            stream_source (str): stream 模式下用录制的 H.264 文件代替设备画面（用于测试）
+            use_history (bool): 是否记录对战历史，并据此安排对战结束检测和等待
         """
         self.default_threshold = default_threshold
         self.default_min_scale = default_min_scale
@@ -26,12 +62,51 @@ class Robot:
         self.battle_mode = battle_mode
         self.wait_time = wait_time
         self.max_cards = max_cards
-        self.screenshot_path = "screen.png"
+        self.capture_mode = capture_mode
+        self.search_mode = search_mode
+        self.match_mode = match_mode
+        self.device = device or device_name
+        # 默认设备沿用 screen.png，其他设备使用各自的截图文件，避免互相覆盖
+        if self.device == device_name:
+            self.screenshot_path = "screen.png"
+        else:
+            self.screenshot_path = f"screen_{re.sub(r'[^0-9A-Za-z_.-]', '_', self.device)}.png"
+        self.frame = None  # raw/stream模式下最近一次截取的屏幕图像
+        self.frame_time = None  # self.frame 的截取时间（虚拟时间）
+        # stream模式下后台解码的视频流
+        self.stream = StreamCapture(self.device, source=stream_source).start() if capture_mode == "stream" else None
+        self.screen_size = None  # 单次截图的尺寸 (高, 宽)，视频流的帧按该尺寸使用
+        self._stream_resized = False
+        self.frame_fingerprint = None  # 最近一次截图的指纹，用于判断画面是否变化
         self.result_dir = "modle_result"
+        self.template_registry = template_registry  # 预处理模板缓存
+        self.scale_lock = self._new_scale_lock() if use_scale_lock else None  # 模板缩放比例锁定表
+        self.on_battle_finished = None  # 每场对战结束后的回调，参数为本场统计信息字典
+        # 多模板匹配共用的线程池
+        self.match_executor = ThreadPoolExecutor(match_workers) if match_workers > 1 else None
+        # 需要完整多尺度搜索时并行搜索各尺度的线程池
+        self.sweep_executor = get_sweep_executor()
+        self.navigator = ScreenNavigator(self)  # 屏幕状态识别与恢复
+        self.match_cache = MatchCache() if use_match_cache else None  # 画面未变化时复用匹配结果
+        self.async_battle = async_battle
+        self.end_watch_interval = end_watch_interval
+        self.wait_stats = defaultdict(list)  # 各类等待的实际用时（秒）
+        metrics.start_exporter(device=self.device)  # 定期导出各环节耗时统计
+        self.elixir_reader = ElixirReader() if use_elixir else None  # 圣水条读取器
+        self.hand_recognizer = HandRecognizer() if use_hand_recognition else None  # 手牌识别器
+        self.next_card = None  # 等待圣水时选定的下一张卡牌（HandSlot），释放时优先使用
         self.cards_played_in_battle = 0  # 添加这一行，用于统计每场对战释放的卡牌数
+        self.history = BattleHistory() if use_history else None  # 对战历史（SQLite）
+        self.wait_delays = {}  # 各类等待第一次检查前的延迟（秒），由对战历史计算
+        self.battle_waits = []  # 尚未写入对战历史的等待 [(名称, 用时, 条件是否满足)]
+        self.battle_end_detected = False  # 本场对战是否检测到了结束（而不是达到 max_cards 等原因退出对战循环）
+        self.battle_phases = {}  # 本场对战各阶段用时（秒）
+        self._phase_mark = clock.time()
+        self._match_totals = (0, 0.0)
+        self.refresh_schedule()
 
         self.battle_count = 1  # 对战次数
-        self.start_time = time.time()  # 开始时间
+        self.start_time = clock.time()  # 开始时间
         self.total_cards_played = 0  # 总卡牌释放数
         self.successful_battles = 0  # 成功对战次数
         
@@ -67,6 +142,10 @@ class Robot:
         if not os.path.exists(self.result_dir):
             os.makedirs(self.result_dir)
     
+    def _new_scale_lock(self):
+        return ScaleLock(profile_key=f"{self.device}:{device_vm_size}")
+    
+    @metrics.timed("robot_capture")
     def capture_screen(self):
         """
         截取屏幕截图
@@ -75,28 +154,82 @@ class Robot:
             bool: 截图是否成功
         """
         try:
-            capture_screen()
+            if self.capture_mode != "png":
+                self.frame = self.grab_frame()
+                self.frame_time = clock.time()
+                if self.match_cache is not None and self.frame is not None:
+                    self.frame_fingerprint = frame_fingerprint(self.frame)
+                return self.frame is not None
+            capture_screen(self.device, self.screenshot_path)
+            self.frame = None
+            self.frame_time = None
+            self.frame_fingerprint = None
             return os.path.exists(self.screenshot_path)
         except Exception as e:
-            print(f"截图失败: {e}")
+            log.warning("robot.capture", f"截图失败: {e}")
             return False
     
+    def recent_frame(self, max_age):
+        """
+        返回 max_age 秒内截取的 self.frame，没有时重新截图（raw或stream截图模式）
+
+        Returns:
+            numpy.ndarray: BGR 格式的屏幕图像，截图失败时返回 None
+        """
+        frame, frame_time = self.frame, self.frame_time
+        if frame is not None and frame_time is not None and clock.time() - frame_time <= max_age:
+            return frame
+        return self.frame if self.capture_screen() else None
+    
+    def grab_frame(self):
+        """
+        获取当前屏幕图像，不修改 self.frame（可在后台线程中调用）。
+        stream 模式下直接取视频流最新解码的一帧，视频流未就绪、已中断或画面过旧时退回单次截图。
+        
+        Returns:
+            numpy.ndarray: BGR 格式的屏幕图像
+        """
+        # 视频流的分辨率可能与单次截图不同（screenrecord 默认会缩小），以单次截图的尺寸为准，
+        # 还没有单次截图时先截一次，保证两种来源的帧尺寸一致（模板缩放比例和区域都按该尺寸计算）
+        if self.stream is not None and self.screen_size is not None:
+            frame = self.stream.latest(stream_max_frame_age)
+            if frame is not None:
+                if frame.shape[:2] != self.screen_size:
+                    if not self._stream_resized:
+                        self._stream_resized = True
+                        log.warning("robot.capture", f"视频流分辨率 {frame.shape[1]}x{frame.shape[0]} 与截图 "
+                                                     f"{self.screen_size[1]}x{self.screen_size[0]} 不一致，缩放后使用")
+                    frame = cv2.resize(frame, self.screen_size[::-1], interpolation=cv2.INTER_LINEAR)
+                return frame
+        frame = capture_frame(self.device)
+        if frame is not None:
+            self.screen_size = frame.shape[:2]
+        return frame
+    
     def match_template(self, template_path, screenshot_path=None, threshold=None, 
-                       min_scale=None, max_scale=None, save_result=False):
+                       min_scale=None, max_scale=None, save_result=False, frame=None,
+                       search_mode=None, region="auto", match_mode=None):
         """
         匹配模板图像
         
         Args:
             template_path (str): 模板图像路径
-            screenshot_path (str): 截图路径，默认使用screen.png
+            screenshot_path (str): 截图路径，默认使用最近一次截图（raw或stream模式为内存图像，否则为screen.png）
             threshold (float): 匹配置信度阈值
             min_scale (float): 最小缩放比例
             max_scale (float): 最大缩放比例
             save_result (bool): 是否保存结果图像
+            frame (numpy.ndarray): 直接传入的屏幕图像，优先于screenshot_path
+            search_mode (str): 模板搜索方式，默认使用初始化时的设置
+            region (tuple): 搜索区域（归一化坐标），"auto" 使用 TEMPLATE_REGIONS 中的配置，None 搜索全屏
+            match_mode (str): 模板匹配模式，默认使用初始化时的设置
             
         Returns:
             tuple: (x, y, width, height) 如果匹配成功，否则返回None
         """
+        if frame is None and screenshot_path is None:
+            frame = self.frame
+
         if screenshot_path is None:
             screenshot_path = self.screenshot_path
             
@@ -109,28 +242,49 @@ class Robot:
         if max_scale is None:
             max_scale = self.default_max_scale
             
+        if search_mode is None:
+            search_mode = self.search_mode
+            
+        if match_mode is None:
+            match_mode = self.match_mode
+            
         # 检查文件是否存在
-        if not os.path.exists(screenshot_path):
-            print(f"截图文件不存在: {screenshot_path}")
+        if frame is None and not os.path.exists(screenshot_path):
+            log.warning("robot.match", f"截图文件不存在: {screenshot_path}")
             return None
             
         if not os.path.exists(template_path):
-            print(f"模板文件不存在: {template_path}")
+            log.warning("robot.match", f"模板文件不存在: {template_path}")
             return None
         
+        # 画面相关区域与上次匹配时相同，直接复用结果
+        cache_key = self._match_cache_key(template_path, frame, region, threshold, min_scale, max_scale,
+                                          search_mode, match_mode, save_result)
+        if cache_key is not None:
+            hit, cached = self.match_cache.lookup(cache_key, self.frame_fingerprint, cache_key[-1])
+            if hit:
+                log.debug("robot.match_cache", f"画面未变化，复用匹配结果: {template_path}")
+                return cached
+        
         try:
             # 调用图像匹配函数
             result = find_template_position(
-                large_image_path=screenshot_path,
+                large_image_path=frame if frame is not None else screenshot_path,
                 template_image_path=template_path,
                 threshold=threshold,
                 min_scale=min_scale,
-                max_scale=max_scale
+                max_scale=max_scale,
+                registry=self.template_registry,
+                search_mode=search_mode,
+                region=region,
+                scale_lock=self.scale_lock,
+                sweep_executor=self.sweep_executor,
+                match_mode=match_mode
             )
             
             if result and save_result:
                 # 读取截图并在上面绘制匹配结果
-                screenshot = cv2.imread(screenshot_path)
+                screenshot = frame.copy() if frame is not None else cv2.imread(screenshot_path)
                 if screenshot is not None:
                     x, y, w, h = result
                     cv2.rectangle(screenshot, (x, y), (x + w, y + h), (0, 255, 0), 2)
@@ -139,12 +293,140 @@ class Robot:
                     template_name = os.path.splitext(os.path.basename(template_path))[0]
                     result_path = os.path.join(self.result_dir, f"{template_name}_result.png")
                     cv2.imwrite(result_path, screenshot)
-                    print(f"结果图像已保存到: {result_path}")
+                    log.debug("robot.match", f"结果图像已保存到: {result_path}")
             
+            if cache_key is not None:
+                self.match_cache.store(cache_key, self.frame_fingerprint, result)
             return result
         except Exception as e:
-            print(f"匹配模板时出错: {e}")
+            log.error("robot.match", f"匹配模板时出错: {e}")
+            return None
+    
+    def _match_cache_key(self, template_path, frame, region, *params):
+        """
+        生成匹配结果缓存的键，只有匹配对象是最近一次raw截图时才使用缓存，否则返回None
+        键的第一项为模板路径，最后一项为实际的搜索区域
+        """
+        if self.match_cache is None or self.frame_fingerprint is None or frame is not self.frame:
+            return None
+        if region == "auto":
+            region = get_template_region(template_path)
+        return (template_path,) + params + (region,)
+    
+    def match_templates(self, template_paths, threshold=None, min_scale=None, max_scale=None, frame=None):
+        """
+        在同一张截图上一次性匹配多个模板，截图只解码和预处理一次
+        
+        Args:
+            template_paths (list): 模板图像路径列表
+            threshold (float): 匹配置信度阈值
+            min_scale (float): 最小缩放比例
+            max_scale (float): 最大缩放比例
+            frame (numpy.ndarray): 直接传入的屏幕图像，默认使用最近一次截图
+            
+        Returns:
+            MatchResults: 所有模板的匹配结果，失败时返回None
+        """
+        if frame is None:
+            frame = self.frame if self.frame is not None else self.screenshot_path
+        
+        threshold = self.default_threshold if threshold is None else threshold
+        min_scale = self.default_min_scale if min_scale is None else min_scale
+        max_scale = self.default_max_scale if max_scale is None else max_scale
+        
+        # 先从缓存中取出画面未变化的模板，只匹配剩余的模板
+        matches, cache_keys = {}, {}
+        for template_path in template_paths:
+            cache_key = self._match_cache_key(template_path, frame, "auto", "many", threshold,
+                                              min_scale, max_scale, self.search_mode, self.match_mode)
+            if cache_key is None:
+                continue
+            hit, cached = self.match_cache.lookup(cache_key, self.frame_fingerprint, cache_key[-1])
+            if hit:
+                matches[template_path] = cached
+            else:
+                cache_keys[template_path] = cache_key
+        if matches:
+            log.debug("robot.match_cache", f"画面未变化，复用 {len(matches)}/{len(template_paths)} 个模板的匹配结果")
+        
+        pending = [path for path in template_paths if path not in matches]
+        try:
+            if pending:
+                results = match_many(
+                    frame, pending,
+                    threshold=threshold,
+                    min_scale=min_scale,
+                    max_scale=max_scale,
+                    registry=self.template_registry,
+                    search_mode=self.search_mode,
+                    executor=self.match_executor,
+                    scale_lock=self.scale_lock,
+                    sweep_executor=self.sweep_executor,
+                    match_mode=self.match_mode
+                )
+                for template_path, match in results.matches.items():
+                    matches[template_path] = match
+                    if template_path in cache_keys:
+                        self.match_cache.store(cache_keys[template_path], self.frame_fingerprint, match)
+        except Exception as e:
+            log.error("robot.match", f"批量匹配模板时出错: {e}")
+            return None
+        
+        return MatchResults({path: matches[path] for path in template_paths})
+    
+    def calibrate_scales(self, template_paths=None, need_capture=True):
+        """
+        校准缩放比例：在当前画面上对模板做完整的多尺度搜索，并记录匹配成功的比例
+        
+        Args:
+            template_paths (list): 模板图像路径列表，默认为 modle/ 下所有模板
+            need_capture (bool): 是否需要重新截图
+            
+        Returns:
+            dict: {模板路径: (缩放比例, 置信度)}，失败时返回None
+        """
+        if self.scale_lock is None:
+            self.scale_lock = self._new_scale_lock()
+        
+        if template_paths is None:
+            template_paths = sorted(
+                os.path.join("modle", name) for name in os.listdir("modle") if name.endswith(".png")
+            )
+        
+        if need_capture and not self.capture_screen():
+            return None
+        
+        frame = self.frame if self.frame is not None else self.screenshot_path
+        try:
+            results = calibrate_scales(
+                frame, template_paths, self.scale_lock,
+                threshold=self.default_threshold,
+                min_scale=self.default_min_scale,
+                max_scale=self.default_max_scale,
+                registry=self.template_registry,
+                sweep_executor=self.sweep_executor
+            )
+        except Exception as e:
+            log.error("robot.calibrate", f"校准缩放比例时出错: {e}")
             return None
+        
+        for template_path, (scale, score) in results.items():
+            if scale is not None:
+                log.info("robot.calibrate", f"已锁定 {template_path} 的缩放比例: {scale:.3f}（置信度 {score:.2f}）")
+        return results
+    
+    def click_box(self, box, offset_x=0, offset_y=0, radius=5, delay_before=0, delay_after=0, click_count=1):
+        """
+        点击匹配结果 (x, y, width, height) 的中心位置
+        
+        Returns:
+            bool: 点击是否成功
+        """
+        x, y, w, h = box
+        return self.click_position(
+            x + w // 2 + offset_x, y + h // 2 + offset_y, radius,
+            delay_before, delay_after, click_count
+        )
     
     def click_position(self, x, y, radius=5, delay_before=0, delay_after=0, click_count=1):
         """
@@ -163,30 +445,33 @@ class Robot:
         """
         try:
             if delay_before > 0:
-                time.sleep(delay_before)
+                clock.sleep(delay_before)
             
             # 添加随机偏移避免机器人检测
             click_x, click_y = randomize_coordinate(x, y, radius)
             
-            # 执行点击操作
+            # 多次点击及其间隔编译成一个输入脚本，一次 adb 往返执行
+            script = InputScript()
             for i in range(click_count):
-                adb_command(f"shell input tap {click_x} {click_y}")
-                print(f"点击位置: ({click_x}, {click_y}) 第{i+1}次")
+                script.tap(click_x, click_y)
                 if i < click_count - 1:  # 如果不是最后一次点击，则添加小延迟
-                    time.sleep(delay_after)
+                    script.sleep(delay_after)
+            result = script.run(self.device)
+            log.debug("robot.click", f"点击位置: ({click_x}, {click_y}) 共{click_count}次")
             
             if delay_after > 0:
-                time.sleep(delay_after)
+                clock.sleep(delay_after)
                 
-            return True
+            return result.returncode == 0
         except Exception as e:
-            print(f"点击操作失败: {e}")
+            log.error("robot.click", f"点击操作失败: {e}")
             return False
     
+    @metrics.timed("click_template")
     def click_template(self, template_path, offset_x=0, offset_y=0, radius=5,
                        threshold=None, min_scale=None, max_scale=None,
                        delay_before=0, delay_after=0, retry_count=1, click_count=1,
-                       need_capture=True):
+                       need_capture=True, region="auto"):
         """
         匹配模板并点击其中心位置
         
@@ -203,14 +488,15 @@ class Robot:
             retry_count (int): 重试次数
             click_count (int): 点击次数
             need_capture (bool): 是否需要重新截图，默认为True
+            region (tuple): 搜索区域（归一化坐标），"auto" 使用 TEMPLATE_REGIONS 中的配置，None 搜索全屏
             
         Returns:
             bool: 是否成功匹配并点击
         """
         for attempt in range(retry_count):
             if attempt > 0:
-                print(f"重试第 {attempt + 1} 次...")
-                time.sleep(1)
+                log.debug("robot.click", f"重试第 {attempt + 1} 次...")
+                clock.sleep(1)
             
             # 根据need_capture参数决定是否截取屏幕
             if need_capture and not self.capture_screen():
@@ -221,33 +507,45 @@ class Robot:
                 template_path=template_path,
                 threshold=threshold,
                 min_scale=min_scale,
-                max_scale=max_scale
+                max_scale=max_scale,
+                region=region
             )
             
             if result:
-                x, y, w, h = result
-                # 计算中心点并应用偏移
-                center_x = x + w // 2 + offset_x
-                center_y = y + h // 2 + offset_y
-                
-                # 执行点击
-                return self.click_position(
-                    center_x, center_y, radius,
+                # 点击中心点并应用偏移
+                return self.click_box(
+                    result, offset_x, offset_y, radius,
                     delay_before, delay_after, click_count
                 )
         
-        print(f"无法匹配模板: {template_path}")
+        log.info("robot.click", f"无法匹配模板: {template_path}")
         return False
     
     def select_random_card(self):
         """
-        随机选择一张卡牌
+        随机选择一张卡牌，识别手牌时只在可用的卡槽中选择；
+        等待圣水时已选定下一张卡牌且它仍在原卡槽中可用时，直接选择它
         
         Returns:
-            tuple: (x, y) 选中卡牌的位置
+            tuple: (x, y) 选中卡牌的位置，没有可用卡牌时返回 None
         """
-        selected_card = random.choice(self.card_positions)
-        print(f"随机选择卡牌位置: {selected_card}")
+        positions = self.card_positions
+        planned, self.next_card = self.next_card, None
+        # 等待圣水时刚截取过画面，直接复用，不再为选牌单独截图
+        frame = self.recent_frame(hand_frame_max_age) if self.hand_recognizer is not None and self.capture_mode != "png" else None
+        if frame is not None:
+            hand = self.hand_recognizer.recognize(frame)
+            playable = [slot for slot in hand if slot.playable]
+            if planned is not None and hand[planned.index].playable and hand[planned.index].card == planned.card:
+                playable = [hand[planned.index]]
+            positions = [self.card_positions[slot.index] for slot in playable]
+            log.debug("robot.hand", "手牌: " + ", ".join(
+                f"{slot.index + 1}:{slot.card or '?'}{'' if slot.playable else '(不可用)'}" for slot in hand))
+            if not positions:
+                log.info("robot.hand", "没有可用的卡牌")
+                return None
+        selected_card = random.choice(positions)
+        log.debug("robot.card", f"随机选择卡牌位置: {selected_card}")
         return selected_card
     
     def get_random_drop_position(self):
@@ -260,7 +558,7 @@ class Robot:
         x1, y1, x2, y2 = self.drop_area
         drop_x = random.randint(x1, x2)
         drop_y = random.randint(y1, y2)
-        print(f"随机释放位置: ({drop_x}, {drop_y})")
+        log.debug("robot.card", f"随机释放位置: ({drop_x}, {drop_y})")
         return drop_x, drop_y
     
     def play_random_card(self, card_radius=2, drop_radius=5):
@@ -276,25 +574,28 @@ class Robot:
         """
         try:
             # 随机选择一张卡牌
-            card_x, card_y = self.select_random_card()
-            
-            # 点击选中的卡牌
-            if not self.click_position(card_x, card_y, radius=card_radius, delay_after=0.5):
-                print("点击卡牌失败")
+            selected_card = self.select_random_card()
+            if selected_card is None:
                 return False
+            card_x, card_y = randomize_coordinate(*selected_card, card_radius)
             
             # 在指定区域获取随机释放位置
-            drop_x, drop_y = self.get_random_drop_position()
+            drop_x, drop_y = randomize_coordinate(*self.get_random_drop_position(), card_radius)
             
-            # 点击释放位置
-            if not self.click_position(drop_x, drop_y, radius=card_radius):
-                print("释放卡牌失败")
+            # 选牌和释放合成一个输入脚本，一次 adb 往返完成
+            script = InputScript()
+            if card_play_mode == "drag":
+                script.swipe(card_x, card_y, drop_x, drop_y, card_drag_duration)
+            else:
+                script.tap(card_x, card_y).sleep(card_select_delay).tap(drop_x, drop_y)
+            if script.run(self.device).returncode != 0:
+                log.warning("robot.card", "释放卡牌失败")
                 return False
             
-            print(f"成功释放卡牌: 从位置({card_x}, {card_y})到位置({drop_x}, {drop_y})")
+            log.debug("robot.card", f"成功释放卡牌: 从位置({card_x}, {card_y})到位置({drop_x}, {drop_y})")
             return True
         except Exception as e:
-            print(f"释放卡牌时出错: {e}")
+            log.error("robot.card", f"释放卡牌时出错: {e}")
             return False
         
     def wait_for_battle_start(self):
@@ -304,10 +605,173 @@ class Robot:
         Returns:
             bool: 是否等待成功
         """
-        print(f"等待 {self.wait_time} 秒让对战开始...")
-        time.sleep(self.wait_time)
+        log.info("robot.wait", f"等待对战开始（最长 {self.wait_time} 秒）...")
+        self.wait_for("battle_start", self.battle_started, self.wait_time)
+        self.mark_phase("start")
         return True
     
+    def wait_for(self, label, condition, timeout, poll_schedule=None):
+        """
+        等待条件满足或超时，并记录实际等待时间
+        
+        Args:
+            label (str): 等待的名称，用于统计
+            condition (callable): 检查函数，返回真值表示可以继续
+            timeout (float): 最长等待时间（秒）
+            poll_schedule (iterable): 检查间隔序列，默认为指数退避
+            
+        Returns:
+            WaitResult: 等待结果
+        """
+        # 使用默认检查间隔时，按历史等待用时推迟第一次检查
+        initial_delay = self.wait_delays.get(label, 0) if poll_schedule is None else 0
+        result = wait_until(condition, timeout, poll_schedule, initial_delay)
+        self.wait_stats[label].append(result.elapsed)
+        if self.history is not None and poll_schedule is None:
+            # 只记录使用默认检查间隔的等待，自定义间隔的等待（如圣水）不按历史推迟
+            self.battle_waits.append((label, result.elapsed, result.ok))
+        status = "条件满足" if result.ok else "超时"
+        log.debug("robot.wait", f"等待[{label}]{status}，用时 {result.elapsed:.2f} 秒（上限 {timeout} 秒，检查 {result.polls} 次）")
+        return result
+    
+    def template_visible(self, template_path, **kwargs):
+        """
+        生成等待条件：截图中出现指定模板
+        """
+        return lambda: self.capture_screen() and self.match_template(template_path, **kwargs) is not None
+    
+    def template_gone(self, template_path, **kwargs):
+        """
+        生成等待条件：截图中不再出现指定模板
+        """
+        return lambda: self.capture_screen() and self.match_template(template_path, **kwargs) is None
+    
+    def screen_in_state(self, *states):
+        """
+        生成等待条件：屏幕处于指定状态之一
+        """
+        return lambda: self.navigator.classify()[0] in states
+    
+    def screen_settled(self):
+        """
+        生成等待条件：连续两次截图没有变化，说明界面切换动画已结束
+        """
+        previous = {"fingerprint": None}
+        
+        def condition():
+            if not self.capture_screen() or self.frame is None:
+                return False
+            fingerprint = frame_fingerprint(self.frame)
+            settled = fingerprints_equal(previous["fingerprint"], fingerprint)
+            previous["fingerprint"] = fingerprint
+            return settled
+        
+        return condition
+    
+    def battle_started(self):
+        """
+        检查对战是否已经开始：必须看到对战界面的圣水条。
+        匹配和加载中的画面不能作为对战开始的依据；
+        没有圣水条读取器时始终返回 False，即等待到 wait_time 超时（与原来的固定等待相同）。
+        """
+        if self.elixir_reader is not None:
+            if self.capture_mode == "png":
+                if self.capture_screen():
+                    frame = cv2.imread(self.screenshot_path)
+                    if frame is not None and self.elixir_reader.read(frame) is not None:
+                        return True
+            elif self.read_elixir() is not None:
+                return True
+        return False
+    
+    def read_elixir(self, need_capture=True):
+        """
+        读取当前圣水量（raw或stream截图模式）
+        
+        Args:
+            need_capture (bool): 是否重新截图
+            
+        Returns:
+            float: 圣水量，圣水条不可见或无法读取时返回 None
+        """
+        if self.elixir_reader is None or self.capture_mode == "png":
+            return None
+        if need_capture and not self.capture_screen():
+            return None
+        if self.frame is None:
+            return None
+        return self.elixir_reader.read(self.frame)
+    
+    def elixir_required(self, card=None):
+        """
+        释放卡牌前需要等待的圣水量：卡牌费用已知时为该卡牌的费用，否则为当前模式的出牌阈值
+        
+        Args:
+            card (str): 下一张卡牌的名称
+        """
+        if card in CARD_COSTS:
+            return CARD_COSTS[card]
+        return ELIXIR_REQUIRED.get(self.battle_mode, ELIXIR_REQUIRED["single"])
+    
+    def choose_next_card(self, frame):
+        """
+        从当前手牌中随机选定下一张要释放的卡牌（包括圣水不足的卡槽），用于计算需要等待的圣水
+        
+        Returns:
+            HandSlot: 选定的卡槽，不识别手牌时返回 None
+        """
+        if self.hand_recognizer is None or frame is None:
+            return None
+        slot = random.choice(self.hand_recognizer.recognize(frame))
+        log.debug("robot.hand", f"下一张卡牌: 卡槽 {slot.index + 1} {slot.card or '?'}，"
+                                f"等待圣水 {self.elixir_required(slot.card)}")
+        return slot
+    
+    def card_ready(self, frame_max_age=0):
+        """
+        圣水是否足够释放下一张卡牌：第一次读到圣水时选定下一张卡牌，按它的费用判断
+        
+        Args:
+            frame_max_age (float): 可以复用的截图的最长时间（秒），0 表示重新截图
+            
+        Returns:
+            bool: 圣水是否足够，无法读取圣水时返回 False
+        """
+        frame = self.recent_frame(frame_max_age)
+        elixir = self.elixir_reader.read(frame) if frame is not None else None
+        if elixir is None:
+            return False
+        if self.next_card is None:
+            self.next_card = self.choose_next_card(frame)
+        card = self.next_card.card if self.next_card is not None else None
+        return elixir >= self.elixir_required(card)
+    
+    def wait_for_card_ready(self, timeout, watcher=None):
+        """
+        等待圣水足够释放下一张卡牌（识别手牌时按选定卡牌的费用）；无法读取圣水时退回固定等待
+        
+        Args:
+            timeout (float): 最长等待时间（秒），即原固定出牌间隔
+            watcher (BattleEndWatcher): 对战结束检测器，检测到结束时立即返回
+            
+        Returns:
+            bool: 是否因圣水足够而提前结束等待
+        """
+        if self.elixir_reader is None or self.capture_mode == "png":
+            if watcher is not None:
+                watcher.wait(timeout)
+            else:
+                clock.sleep(timeout)
+            return False
+        
+        def condition():
+            if watcher is not None and watcher.ended.is_set():
+                return True
+            return self.card_ready()
+        
+        result = self.wait_for("elixir", condition, timeout, fixed_schedule(elixir_poll_interval))
+        return result.ok and not (watcher is not None and watcher.ended.is_set())
+    
     def check_battle_end(self):
         """
         检查对战是否结束
@@ -315,7 +779,7 @@ class Robot:
         Returns:
             bool: 对战是否结束
         """
-        print("检查对战是否结束...")
+        log.debug("robot.battle", "检查对战是否结束...")
         
         # 根据模式选择不同的结束按钮
         if self.battle_mode == "double":
@@ -327,6 +791,36 @@ class Robot:
         
         return result
     
+    def battle_end_templates(self):
+        """
+        当前模式下表示对战结束的按钮模板，按优先级排列
+        
+        Returns:
+            list: 模板路径列表
+        """
+        if self.battle_mode == "double":
+            return ["modle/exit.png", "modle/confirm2.png"]
+        return ["modle/confirm.png"]
+    
+    def next_card_delay(self):
+        """
+        根据对战模式计算下一张卡牌的释放间隔
+        
+        Returns:
+            float: 等待时间（秒）
+        """
+        if self.battle_mode == "double":
+            return 6
+        if self.battle_mode == "defense":
+            # 保卫模式使用固定较短的间隔时间
+            return 2
+        # 单人模式使用1-10秒的正态分布随机等待时间
+        # 使用均值为4，标准差为1.5的正态分布，然后限制在1-10范围内
+        wait_time = max(1, min(10, int(random.normalvariate(4, 1.5))))
+        log.debug("robot.battle", f"单人模式等待 {wait_time} 秒")
+        return wait_time
+    
+    @metrics.timed("battle_loop")
     def battle_loop(self, check_end_after=5):
         """
         对战主循环
@@ -337,45 +831,72 @@ class Robot:
         Returns:
             bool: 对战是否成功完成
         """
-        print("开始对战循环...")
+        log.info("robot.battle", "开始对战循环...")
         self.cards_played_in_battle = 0  # 重置计数器
+        self.next_card = None
+        self.battle_end_detected = False
+        
+        # 后台线程检测对战结束，检测到后出牌间隔的等待立即结束
+        watcher = None
+        if self.end_watch_interval > 0:
+            watcher = BattleEndWatcher(self, self.end_watch_interval)
+            watcher.start()
         
-        for i in range(self.max_cards):
+        try:
+            # 释放失败不计入 max_cards，单独限制次数
+            failures = 0
+            while self.cards_played_in_battle < self.max_cards:
+                i = self.cards_played_in_battle
 
-            # 在指定次数后开始检查对战是否结束
-            if i >= check_end_after:
-                # 检查是否出现确认按钮（对战结束标志）
-                if self.check_battle_end():
-                    if self.battle_mode == "double":
-                        print("检测到exit按钮，双人对战已结束")
-                    else:
-                        print("检测到确认按钮，对战已结束")
-                    return True
-            
-            print(f"释放第 {i+1} 张卡牌")
-            
-            # 释放随机卡牌
-            if not self.play_random_card():
-                print("释放卡牌失败")
-                continue
+                # 在指定次数后开始检查对战是否结束
+                if i >= check_end_after:
+                    if watcher is not None:
+                        watcher.arm()
+                        if watcher.ended.is_set():
+                            log.info("robot.battle", f"检测到结束按钮 {watcher.match.template}，对战已结束")
+                            self.battle_end_detected = True
+                            self.click_box(watcher.match.box)
+                            return True
+                    # 检查是否出现确认按钮（对战结束标志）
+                    elif self.check_battle_end():
+                        if self.battle_mode == "double":
+                            log.info("robot.battle", "检测到exit按钮，双人对战已结束")
+                        else:
+                            log.info("robot.battle", "检测到确认按钮，对战已结束")
+                        self.battle_end_detected = True
+                        return True
+                
+                log.info("robot.battle", f"释放第 {i+1} 张卡牌")
+                
+                # 释放随机卡牌
+                with metrics.timer("battle_stage", stage="play_card"):
+                    played = self.play_random_card()
+                if not played:
+                    log.warning("robot.battle", "释放卡牌失败")
+                    metrics.count("card_failures", mode=self.battle_mode)
+                    failures += 1
+                    if failures >= max_failed_plays:
+                        log.warning("robot.battle", f"本场对战释放卡牌失败 {failures} 次，对战循环结束")
+                        return True
+                    # 没有可用卡牌时短暂等待圣水恢复，避免连续空转
+                    with metrics.timer("battle_stage", stage="wait"):
+                        self.wait_for_card_ready(1, watcher)
+                    continue
 
-            self.cards_played_in_battle = i + 1  # 更新已释放卡牌数
-            
-            # 卡牌释放间隔
-            if self.battle_mode == "double":
-                time.sleep(6)
-            elif self.battle_mode == "defense":
-                # 保卫模式使用固定较短的间隔时间
-                time.sleep(2)
-            else:
-                # 单人模式使用1-10秒的正态分布随机等待时间
-                # 使用均值为5.5，标准差为1.5的正态分布，然后限制在1-10范围内
-                wait_time = max(1, min(10, int(random.normalvariate(4, 1.5))))
-                print(f"单人模式等待 {wait_time} 秒")
-                time.sleep(wait_time)
+                self.cards_played_in_battle = i + 1  # 更新已释放卡牌数
+                metrics.count("cards_played", mode=self.battle_mode)
+                
+                # 卡牌释放间隔：圣水足够时提前出牌，原固定间隔作为等待上限
+                delay = self.next_card_delay()
+                with metrics.timer("battle_stage", stage="wait"):
+                    self.wait_for_card_ready(delay, watcher)
+        finally:
+            if watcher is not None:
+                watcher.stop()
+            self.mark_phase("battle")
             
         
-        print(f"已释放 {self.max_cards} 张卡牌，对战循环结束")
+        log.info("robot.battle", f"已释放 {self.max_cards} 张卡牌，对战循环结束")
         return True
 
     def auto_battle(self, check_end_after=5):
@@ -388,40 +909,40 @@ class Robot:
         Returns:
             bool: 是否成功完成整个对战流程
         """
-        print("开始自动对战流程...")
+        log.info("robot.flow", "开始自动对战流程...")
         
         # 点击对战按钮
         if not self.click_template("modle/Combat.png"):
-            print("无法点击对战按钮")
+            log.warning("robot.flow", "无法点击对战按钮")
             return False
         
-        print("已点击对战按钮")
+        log.info("robot.flow", "已点击对战按钮")
 
         # 如果是双人模式，需要匹配并点击快速匹配按钮
         if self.battle_mode == "double":
-            print("双人模式：正在寻找快速匹配按钮...")
+            log.info("robot.flow", "双人模式：正在寻找快速匹配按钮...")
             if not self.click_template("modle/Quick_matching.png"):
-                print("无法找到或点击快速匹配按钮")
+                log.warning("robot.flow", "无法找到或点击快速匹配按钮")
                 return False
-            print("已点击快速匹配按钮")
+            log.info("robot.flow", "已点击快速匹配按钮")
             # 等待匹配界面稳定
-            time.sleep(2)
+            self.wait_for("quick_matching", self.template_gone("modle/Quick_matching.png"), 2)
         
         # 等待对战开始
         if not self.wait_for_battle_start():
-            print("等待对战开始失败")
+            log.warning("robot.flow", "等待对战开始失败")
             return False
         
         # 进入对战循环
         battle_ended = self.battle_loop(check_end_after)
         
         if battle_ended:
-            print("对战已结束，准备开始新的对战...")
-            # 等待一下确保界面稳定
-            time.sleep(3)
+            log.info("robot.flow", "对战已结束，准备开始新的对战...")
+            # 等待回到主界面
+            self.wait_for("after_battle", self.screen_in_state(LOBBY), 3)
             return True
         else:
-            print("对战循环完成")
+            log.info("robot.flow", "对战循环完成")
             return True
         
     def switch_deck(self, deck_index):
@@ -444,16 +965,153 @@ class Robot:
         ]
         
         if deck_index < 0 or deck_index >= len(deck_positions):
-            print(f"无效的卡组索引: {deck_index}，应为0-4之间")
+            log.error("robot.deck", f"无效的卡组索引: {deck_index}，应为0-4之间")
             return False
         
         # 获取目标卡组位置
         x, y = deck_positions[deck_index]
-        print(f"切换到卡组 {deck_index + 1}，位置: ({x}, {y})")
+        log.info("robot.deck", f"切换到卡组 {deck_index + 1}，位置: ({x}, {y})")
         
 
-        # 点击卡组位置
-        return self.click_position(x, y, radius=2, delay_after=2)
+        # 点击卡组位置，等待界面稳定
+        if not self.click_position(x, y, radius=2):
+            return False
+        self.wait_for("deck_select", self.screen_settled(), 2)
+        return True
+    
+    def recover_to_lobby(self):
+        """
+        对战按钮识别失败后尝试返回主界面：识别当前屏幕状态，执行该状态对应的返回操作
+        
+        Returns:
+            bool: 是否已在主界面或执行了返回操作
+        """
+        return self.navigator.recover_to_lobby()
+    
+    def refresh_schedule(self):
+        """
+        从对战历史重新计算各类等待第一次检查前的延迟
+        """
+        if self.history is None:
+            return
+        try:
+            self.wait_delays = self.history.wait_delays(self.battle_mode)
+        except Exception as e:
+            log.warning("robot.history", f"读取对战历史失败: {e}")
+            return
+        if self.wait_delays:
+            delays = "，".join(f"{label} {delay:.1f}秒" for label, delay in sorted(self.wait_delays.items()))
+            log.info("robot.history", f"根据对战历史推迟首次检查: {delays}")
+    
+    def begin_battle_record(self):
+        """
+        开始记录一场对战：清空本场的阶段用时，记下匹配耗时的累计值。
+        上一场对战写入历史之后的等待（next_battle、lobby、切换卡组等）不清空，计入这一场的记录
+        """
+        self.battle_end_detected = False
+        self.battle_phases = {}
+        self._phase_mark = clock.time()
+        self._match_totals = self._match_metrics()
+    
+    def mark_phase(self, phase):
+        """
+        记录从上一个阶段结束到现在的用时
+        """
+        now = clock.time()
+        self.battle_phases[phase] = now - self._phase_mark
+        self._phase_mark = now
+    
+    @staticmethod
+    def _match_metrics():
+        calls, seconds = 0, 0.0
+        for name in ("find_template_position", "match_many"):
+            count, total = metrics.totals(name)
+            calls, seconds = calls + count, seconds + total
+        return calls, seconds
+    
+    def _notify_battle_finished(self, success, started_at, deck_index):
+        """
+        把本场对战写入对战历史并调用 on_battle_finished 回调，出错不影响对战流程
+        
+        Returns:
+            int: 对战历史中的记录 id，未记录时为 None
+        """
+        result = "success" if success else "failure"
+        duration = clock.time() - started_at
+        metrics.count("battles", mode=self.battle_mode, result=result)
+        metrics.observe("battle", duration, mode=self.battle_mode, result=result)
+        cards_played = self.cards_played_in_battle if success else 0
+        
+        battle_id = None
+        if self.history is not None:
+            self.mark_phase("end")
+            calls, seconds = self._match_metrics()
+            calls, seconds = calls - self._match_totals[0], seconds - self._match_totals[1]
+            try:
+                battle_id = self.history.record({
+                    "finished_at": clock.time(),
+                    "device": self.device,
+                    "mode": self.battle_mode,
+                    "deck_index": deck_index,
+                    "success": int(bool(success)),
+                    "end_detected": int(self.battle_end_detected),
+                    "cards_played": cards_played,
+                    "duration": duration,
+                    "start_seconds": self.battle_phases.get("start"),
+                    "battle_seconds": self.battle_phases.get("battle"),
+                    "end_seconds": self.battle_phases.get("end"),
+                    "match_calls": calls,
+                    "match_ms": seconds / calls * 1000 if calls else None,
+                }, self.battle_waits)
+            except Exception as e:
+                log.error("robot.history", f"保存对战历史出错: {e}")
+            self.battle_waits = []
+        
+        if self.on_battle_finished is not None:
+            try:
+                self.on_battle_finished({
+                    "device": self.device,
+                    "battle_mode": self.battle_mode,
+                    "deck_index": deck_index,
+                    "success": bool(success),
+                    "cards_played": cards_played,
+                    "duration": duration,
+                })
+            except Exception as e:
+                log.error("robot.stats", f"对战统计回调出错: {e}")
+        return battle_id
+    
+    def _record_recovery(self, battle_id):
+        """
+        把返回主界面的方式写入对战历史
+        """
+        if self.history is None or battle_id is None:
+            return
+        try:
+            self.history.set_recovery(battle_id, self.navigator.last_recovery)
+        except Exception as e:
+            log.error("robot.history", f"保存对战历史出错: {e}")
+    
+    def next_check_end_after(self, deck_index):
+        """
+        本场对战从第几张卡牌开始检查结束：优先使用对战历史中的分布，
+        没有足够的历史数据时使用本次运行的平均释放卡牌数的70%，都没有时为10
+        """
+        if self.history is not None:
+            try:
+                check_end_after = self.history.check_end_after(self.battle_mode, deck_index)
+            except Exception as e:
+                log.warning("robot.history", f"读取对战历史失败: {e}")
+                check_end_after = None
+            if check_end_after is not None:
+                log.info("robot.flow", f"基于对战历史，check_end_after 设置为: {check_end_after}")
+                return check_end_after
+        if self.successful_battles > 0:
+            avg_cards = self.total_cards_played / self.successful_battles
+            check_end_after = max(5, int(avg_cards * 0.7))  # 使用平均值的70%作为检查点
+            log.info("robot.flow", f"基于历史数据，check_end_after 设置为: {check_end_after}")
+            return check_end_after
+        return 10  # 默认值
     
     def auto_battle_with_deck_switch(self, battles_per_deck=3, check_end_after=5):
         """
@@ -466,7 +1124,7 @@ class Robot:
         Returns:
             bool: 是否成功完成整个对战流程
         """
-        print("开始带卡组切换功能的自动对战流程...")
+        log.info("robot.flow", "开始带卡组切换功能的自动对战流程...")
         
         # 初始化卡组索引和对战计数器
         current_deck_index = 0
@@ -477,87 +1135,71 @@ class Robot:
             while True:
                 # 检查是否需要切换卡组
                 if battles_with_current_deck >= battles_per_deck:
-                    print(f"当前卡组已对战 {battles_with_current_deck} 次，需要切换卡组")
+                    log.info("robot.flow", f"当前卡组已对战 {battles_with_current_deck} 次，需要切换卡组")
                     
                     # 进入卡组选择界面的步骤
                     # 1. 点击卡组按钮 (假设在某个固定位置)
-                    self.click_position(129, 750, radius=2, delay_after=2.0)  # 假设卡组按钮位置
+                    self.click_position(129, 750, radius=2)  # 假设卡组按钮位置
                     
-                    time.sleep(2)  # 等待界面切换
+                    self.wait_for("deck_page", self.screen_settled(), 4)  # 等待界面切换
                     
                     # 2. 切换到下一个卡组
                     current_deck_index = (current_deck_index + 1) % 5  # 循环切换卡组
                     if not self.switch_deck(current_deck_index):
-                        print(f"切换到卡组 {current_deck_index + 1} 失败")
+                        log.warning("robot.flow", f"切换到卡组 {current_deck_index + 1} 失败")
                         return False
                     
-                    time.sleep(2)  # 等待卡组切换
-                    
                     # 3. 点击确认或返回按钮 (假设在某个固定位置)
-                    self.click_position(270, 73, radius=2, delay_after=3.0)  # 假设确认按钮位置
+                    self.click_position(270, 73, radius=2)  # 假设确认按钮位置
+                    self.wait_for("deck_confirm", self.screen_settled(), 3)
                     
                     # 重置对战计数器
                     battles_with_current_deck = 0
                 
-                print(f"\n{'='*50}")
-                print(f"使用卡组 {current_deck_index + 1} 开始第 {battles_with_current_deck + 1} 次对战")
-                print(f"{'='*50}")
+                log.info("robot.flow", "=" * 50)
+                log.info("robot.flow", f"使用卡组 {current_deck_index + 1} 开始第 {battles_with_current_deck + 1} 次对战")
+                log.info("robot.flow", "=" * 50)
                 
                 if self.battle_mode == "single":
                     # 点击主界面
                     self.click_template("modle/Battle_Interface3.png")
-                    time.sleep(3)
+                    self.wait_for("lobby", self.template_visible("modle/Combat.png"), 3)
 
-                # 计算动态 check_end_after 值（基于历史平均值）
-                if self.successful_battles > 0:
-                    avg_cards = self.total_cards_played / self.successful_battles
-                    check_end_after = max(5, int(avg_cards * 0.7))  # 使用平均值的70%作为检查点
-                    print(f"基于历史数据，check_end_after 设置为: {check_end_after}")
+                # 计算动态 check_end_after 值（基于对战历史）
+                check_end_after = self.next_check_end_after(current_deck_index)
+
+                battle_started = clock.time()
+                self.begin_battle_record()
+                if self.async_battle:
+                    battle_done = run_auto_battle(self, check_end_after=check_end_after)
                 else:
-                    check_end_after = 10  # 默认值
+                    battle_done = self.auto_battle(check_end_after=check_end_after)
+
+                battle_id = self._notify_battle_finished(battle_done, battle_started, current_deck_index)
+                self.refresh_schedule()
 
-                if self.auto_battle(check_end_after=check_end_after):
+                if battle_done:
+                    self.navigator.reset_recoveries()
                     self.battle_count += 1
                     self.successful_battles += 1
                     self.total_cards_played += self.cards_played_in_battle  # 紫色累加卡牌数
                     battles_with_current_deck += 1
                     avg_cards = self.total_cards_played / self.successful_battles
-                    print(f"完成一次对战，本次释放 {self.cards_played_in_battle} 张卡牌")
-                    print(f"平均释放卡牌数: {avg_cards:.2f}")
-                    print("8秒后开始新的对战...")
-                    time.sleep(8)
+                    log.info("robot.flow", f"完成一次对战，本次释放 {self.cards_played_in_battle} 张卡牌")
+                    log.info("robot.flow", f"平均释放卡牌数: {avg_cards:.2f}")
+                    log.info("robot.flow", "等待主界面对战按钮出现后开始新的对战（最长8秒）...")
+                    self.wait_for("next_battle", self.template_visible("modle/Combat.png"), 8)
                 else:
-                    print("对战失败，尝试返回主界面...")
-                    # 对战按钮识别失败后，识别并点击Battle_Interface图像返回主界面
-                    if self.click_template("modle/Battle_Interface.png"):
-                        print("已点击Battle_Interface图像，返回主界面")
-                        continue
-                    
-                    if self.click_template("modle/Battle_Interface2.png", need_capture=False):
-                        print("已点击Battle_Interface2图像，返回主界面")  
-                        continue
-                    
-                    if self.click_template("modle/Reward.png", delay_after=4, click_count=6, need_capture=False):
-                        print("已点击Reward图像，返回主界面")
-                        continue
-
-                    if self.click_template("modle/Return_to_game.png", delay_after=4, need_capture=False):
-                        print("已点击Return_to_game图像，返回主界面")
-                        continue
-
-                    if self.click_template("modle/close.png", need_capture=False):
-                        print("已点击close图像，返回主界面")
-                        continue
-
-                    if self.click_template("modle/confirm2.png", need_capture=False):
-                        print("已点击confirm2图像，返回主界面")
+                    log.warning("robot.flow", "对战失败，尝试返回主界面...")
+                    recovered = self.recover_to_lobby()
+                    self._record_recovery(battle_id)
+                    if recovered:
                         continue
-                    else:
-                        break  # 如果都无法返回主界面，则退出循环
+                    break  # 如果都无法返回主界面，则退出循环
 
             return True
         except KeyboardInterrupt:
-            print("程序已手动终止")
+            log.info("robot.flow", "程序已手动终止")
             return False
 
 # 使用示例
@@ -583,7 +1225,7 @@ if __name__ == "__main__":
 
     # 添加统计信息初始化
     robot.battle_count = 1  # 对战次数
-    robot.start_time = time.time()  # 开始时间
+    robot.start_time = clock.time()  # 开始时间
     robot.total_cards_played = 0  # 总卡牌释放数
     robot.successful_battles = 0  # 成功对战次数
 
@@ -592,18 +1234,25 @@ if __name__ == "__main__":
         # 每个卡组对战3次后切换
         robot.auto_battle_with_deck_switch(battles_per_deck=1000)
     except KeyboardInterrupt:
-        print("程序已手动终止")
+        log.info("robot.summary", "程序已手动终止")
     finally:
         # 输出最终统计信息
-        elapsed_time = time.time() - robot.start_time
+        elapsed_time = clock.time() - robot.start_time
         avg_cards_final = robot.total_cards_played / robot.successful_battles if robot.successful_battles > 0 else 0
-        print(f"\n{'='*50}")
-        print(f"程序运行结束，最终统计信息:")
-        print(f"总对战次数: {robot.battle_count}")
-        print(f"成功对战次数: {robot.successful_battles}")
-        print(f"总卡牌释放数: {robot.total_cards_played}")
-        print(f"平均每次对战释放卡牌数: {avg_cards_final:.2f}")
-        print(f"总运行时间: {int(elapsed_time//3600)}小时 {int((elapsed_time%3600)//60)}分钟 {int(elapsed_time%60)}秒")
-        print(f"{'='*50}")
+        log.info("robot.summary", "=" * 50)
+        log.info("robot.summary", f"程序运行结束，最终统计信息:")
+        log.info("robot.summary", f"总对战次数: {robot.battle_count}")
+        log.info("robot.summary", f"成功对战次数: {robot.successful_battles}")
+        log.info("robot.summary", f"总卡牌释放数: {robot.total_cards_played}")
+        log.info("robot.summary", f"平均每次对战释放卡牌数: {avg_cards_final:.2f}")
+        log.info("robot.summary", f"总运行时间: {int(elapsed_time//3600)}小时 {int((elapsed_time%3600)//60)}分钟 {int(elapsed_time%60)}秒")
+        if robot.match_cache is not None:
+            hits = sum(robot.match_cache.hits.values())
+            misses = sum(robot.match_cache.misses.values())
+            if hits + misses > 0:
+                log.info("robot.summary", f"匹配缓存命中: {hits}/{hits + misses} ({hits / (hits + misses):.0%})")
+        for label, durations in robot.wait_stats.items():
+            log.info("robot.summary", f"等待[{label}]: {len(durations)} 次，平均 {sum(durations) / len(durations):.2f} 秒")
+        log.info("robot.summary", "=" * 50)
 
     pass
\ No newline at end of file
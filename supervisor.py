@@ -0,0 +1,146 @@
+# supervisor.py
+import argparse
+import glob
+import multiprocessing
+import queue
+import time
+from collections import defaultdict
+from config.settings import device_names
+from utils.image_utils import get_match_mode
+from utils.template_registry import template_registry
+
+def preload_templates(min_scale=0.75, max_scale=2.0, factors=(2, 4)):
+    """
+    在主进程中预先加载所有模板及其金字塔，包括模板的匹配模式所用的 gray / edge 版本
+    （hybrid 在 gray 上搜索，再用 color 确认）。
+    使用 fork 启动子进程时，子进程直接共享这些只读的内存页，无需各自重新加载和转换。
+    存在模板包时金字塔直接映射包中的数据，不使用 fork 的子进程也通过页缓存共享。
+    """
+    for template_path in sorted(glob.glob("modle/*.png")):
+        match_mode = get_match_mode(template_path)
+        modes = {"color", "gray" if match_mode == "hybrid" else match_mode}
+        for mode in sorted(modes):
+            template_registry.get(template_path, min_scale, max_scale, mode=mode)
+            for factor in factors:
+                template_registry.get(template_path, min_scale, max_scale, downsample=factor, mode=mode)
+    return len(template_registry)
+
+def _run_device(device, robot_options, battles_per_deck, stats_queue):
+    """
+    子进程入口：为单台设备创建机器人并运行自动对战，每场对战的统计信息发送到 stats_queue
+    """
+    from robot import Robot
+
+    robot = Robot(device=device, **robot_options)
+    robot.on_battle_finished = stats_queue.put
+    try:
+        robot.auto_battle_with_deck_switch(battles_per_deck=battles_per_deck)
+    finally:
+        stats_queue.put({"device": device, "exited": True})
+
+class FleetStats:
+    """
+    汇总所有设备的对战统计
+    """
+
+    def __init__(self):
+        self.start_time = time.time()
+        self.devices = defaultdict(lambda: {"battles": 0, "successful": 0, "cards": 0, "duration": 0.0})
+
+    def add(self, record):
+        stats = self.devices[record["device"]]
+        stats["battles"] += 1
+        stats["duration"] += record.get("duration", 0)
+        if record.get("success"):
+            stats["successful"] += 1
+            stats["cards"] += record.get("cards_played", 0)
+
+    def summary(self):
+        elapsed_hours = max(time.time() - self.start_time, 1) / 3600
+        total = sum(stats["successful"] for stats in self.devices.values())
+        lines = [f"{'='*50}", f"设备数量: {len(self.devices)}，成功对战总数: {total}，每小时: {total / elapsed_hours:.1f}"]
+        for device, stats in sorted(self.devices.items()):
+            avg_cards = stats["cards"] / stats["successful"] if stats["successful"] else 0
+            lines.append(f"  {device}: 对战 {stats['battles']} 次，成功 {stats['successful']} 次，"
+                         f"平均释放卡牌 {avg_cards:.2f} 张")
+        lines.append(f"{'='*50}")
+        return "\n".join(lines)
+
+def run_fleet(devices=None, battles_per_deck=1000, report_interval=60, **robot_options):
+    """
+    在同一台主机上同时运行多台模拟器，每台设备一个独立进程
+
+    每个进程拥有自己的 Robot、截图缓冲区和 ADB 会话；模板在主进程中预先加载，
+    fork 后以只读方式共享；各进程的对战统计通过队列汇总到主进程。
+
+    Args:
+        devices (list): 设备名称列表，默认为配置中的 device_names
+        battles_per_deck (int): 每个卡组对战次数
+        report_interval (float): 输出汇总统计的间隔（秒）
+        robot_options: 传给 Robot 的其他参数
+
+    Returns:
+        FleetStats: 汇总统计
+    """
+    devices = list(devices or device_names)
+    # Windows 不支持 fork，此时每个子进程各自加载模板
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    if context.get_start_method() == "fork":
+        print(f"已预加载 {preload_templates()} 组模板（其中 {template_registry.bundle_hits} 组来自模板包），子进程共享")
+
+    stats_queue = context.Queue()
+    processes = {}
+    for device in devices:
+        process = context.Process(target=_run_device, name=f"robot-{device}",
+                                  args=(device, robot_options, battles_per_deck, stats_queue))
+        process.start()
+        processes[device] = process
+        print(f"已启动设备 {device} 的机器人进程 (pid={process.pid})")
+
+    fleet = FleetStats()
+    running = set(devices)
+    last_report = time.time()
+    try:
+        while running:
+            try:
+                record = stats_queue.get(timeout=1)
+            except queue.Empty:
+                # 子进程异常退出时不会发送退出消息
+                running = {device for device in running if processes[device].is_alive()}
+                record = None
+            if record is not None:
+                if record.get("exited"):
+                    running.discard(record["device"])
+                    print(f"设备 {record['device']} 的机器人已退出")
+                else:
+                    fleet.add(record)
+            if time.time() - last_report >= report_interval:
+                print(fleet.summary())
+                last_report = time.time()
+    except KeyboardInterrupt:
+        print("程序已手动终止，正在停止所有设备...")
+        for process in processes.values():
+            process.terminate()
+    finally:
+        for process in processes.values():
+            process.join()
+        print(fleet.summary())
+    return fleet
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="多模拟器自动对战")
+    parser.add_argument("devices", nargs="*", help="设备名称列表，默认使用配置中的 device_names")
+    parser.add_argument("--mode", default="defense", choices=["single", "double", "defense"], help="对战模式")
+    parser.add_argument("--wait-time", type=int, default=10, help="等待对战开始的时间（秒）")
+    parser.add_argument("--max-cards", type=int, default=60, help="最大释放卡牌次数")
+    parser.add_argument("--battles-per-deck", type=int, default=1000, help="每个卡组对战次数")
+    args = parser.parse_args()
+
+    run_fleet(
+        args.devices or None,
+        battles_per_deck=args.battles_per_deck,
+        battle_mode=args.mode,
+        wait_time=args.wait_time,
+        max_cards=args.max_cards
+    )
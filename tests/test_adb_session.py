@@ -0,0 +1,65 @@
+# tests/test_adb_session.py
+import os
+import stat
+import pytest
+from core import adb_manager
+from core.adb_manager import AdbShellSession
+
+# 用本机的 sh 代替 adb shell：会话只关心标准输入输出，与设备端 shell 的行为相同
+pytestmark = pytest.mark.skipif(not os.path.exists("/bin/sh"), reason="需要 /bin/sh")
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    fake_adb = tmp_path / "adb"
+    fake_adb.write_text("#!/bin/sh\nexec /bin/sh\n")  # 忽略 -s <设备名> shell 参数
+    fake_adb.chmod(fake_adb.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(adb_manager, "adb_path", str(fake_adb))
+    session = AdbShellSession("fake")
+    yield session
+    session.close()
+
+def test_output_ends_at_marker(session):
+    result = session.run("echo first; echo second")
+    assert result.returncode == 0
+    assert result.stdout == "first\nsecond\n"
+    # 同一会话中的下一条命令不会读到上一条命令的输出
+    assert session.run("echo third").stdout == "third\n"
+
+def test_output_without_trailing_newline(session):
+    # 没有换行时结束标记与输出在同一行，标记前的内容属于命令输出
+    assert session.run("printf abc").stdout == "abc\n"
+
+def test_echoed_marker_text_is_output(session):
+    # 命令本身输出类似标记的文本时不能提前结束
+    result = session.run("echo __ADB_END_x__ 5")
+    assert result.stdout == "__ADB_END_x__ 5\n"
+    assert result.returncode == 0
+
+def test_exit_code(session):
+    assert session.run("false").returncode == 1
+    assert session.run("sh -c 'exit 7'").returncode == 7
+    assert session.run("true").returncode == 0
+
+def test_stderr_merged(session):
+    assert session.run("echo oops >&2").stdout == "oops\n"
+
+def test_restarts_dead_session(session):
+    first = session.process
+    first.kill()
+    first.wait()
+    assert not session.is_alive()
+    assert session.run("echo back").stdout == "back\n"
+    assert session.process is not first
+    assert session.is_alive()
+
+def test_exit_closes_session_and_next_command_reconnects(session):
+    with pytest.raises(ConnectionError):
+        session.run("exit 3")
+    assert session.process is None
+    assert session.run("echo again").stdout == "again\n"
+
+def test_timeout_discards_session(session):
+    with pytest.raises(TimeoutError):
+        session.run("sleep 5", timeout=0.2)
+    assert session.process is None
+    assert session.run("echo ok").stdout == "ok\n"
@@ -0,0 +1,61 @@
+# tests/test_frame_cache.py
+import numpy as np
+from utils.frame_cache import MatchCache, frame_fingerprint, fingerprints_equal
+
+GRID = (32, 18)
+BOTTOM = (0.0, 0.5, 1.0, 1.0)  # 下半屏（归一化坐标）
+
+def _frame(value=100):
+    return np.full((960, 540, 3), value, np.uint8)
+
+def test_fingerprint_is_block_mean():
+    frame = _frame(0)
+    frame[:30, :30] = 255  # 左上角正好是一个网格块（960/32 x 540/18）
+    fingerprint = frame_fingerprint(frame, GRID)
+    assert fingerprint.shape == GRID
+    assert fingerprint[0, 0] == 255
+    assert fingerprint[0, 1] == 0 and fingerprint[1, 0] == 0
+
+def test_noise_within_tolerance_is_equal():
+    rng = np.random.default_rng(0)
+    noisy = (_frame().astype(np.int16) + rng.integers(-10, 11, (960, 540, 3))).astype(np.uint8)
+    # 逐像素差值最大为 10，但每块平均后远小于默认容差
+    assert fingerprints_equal(frame_fingerprint(_frame(), GRID), frame_fingerprint(noisy, GRID))
+
+def test_uniform_change_against_tolerance():
+    base = frame_fingerprint(_frame(100), GRID)
+    assert fingerprints_equal(base, frame_fingerprint(_frame(103), GRID), tolerance=3.0)
+    assert not fingerprints_equal(base, frame_fingerprint(_frame(104), GRID), tolerance=3.0)
+
+def test_single_block_change_is_detected():
+    changed = _frame()
+    changed[900:930, 240:270] = 200  # 一个按钮大小的变化
+    assert not fingerprints_equal(frame_fingerprint(_frame(), GRID), frame_fingerprint(changed, GRID))
+
+def test_change_outside_region_is_ignored():
+    changed = _frame()
+    changed[:300] = 255  # 只有上半屏变化
+    before, after = frame_fingerprint(_frame(), GRID), frame_fingerprint(changed, GRID)
+    assert fingerprints_equal(before, after, region=BOTTOM)
+    assert not fingerprints_equal(before, after)
+
+def test_small_region_covers_at_least_one_block():
+    changed = _frame()
+    changed[475:485, 265:275] = 255  # 10x10 像素，落在一个网格块内
+    before, after = frame_fingerprint(_frame(), GRID), frame_fingerprint(changed, GRID)
+    assert not fingerprints_equal(before, after, region=(0.5, 0.5, 0.501, 0.501))
+
+def test_missing_or_mismatched_fingerprints_are_not_equal():
+    fingerprint = frame_fingerprint(_frame(), GRID)
+    assert not fingerprints_equal(None, fingerprint)
+    assert not fingerprints_equal(fingerprint, frame_fingerprint(_frame(), (16, 9)))
+
+def test_cache_reuses_result_until_region_changes():
+    cache = MatchCache(tolerance=3.0)
+    key = ("modle/confirm.png", 0.75)
+    cache.store(key, frame_fingerprint(_frame(), GRID), "match")
+    assert cache.lookup(key, frame_fingerprint(_frame(102), GRID), BOTTOM) == (True, "match")
+    changed = _frame()
+    changed[700:800] = 255
+    assert cache.lookup(key, frame_fingerprint(changed, GRID), BOTTOM) == (False, None)
+    assert cache.report()["modle/confirm.png"] == {"hits": 1, "misses": 1, "hit_rate": 0.5}
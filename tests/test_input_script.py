@@ -0,0 +1,51 @@
+# tests/test_input_script.py
+import numpy as np
+import pytest
+from core.adb_manager import InputScript, attach_device, detach_device
+from core.fake_device import FakeDevice, Stage
+from utils.clock import clock
+
+SERIAL = "input-script-test"
+
+class CountingDevice(FakeDevice):
+    """记录收到的每条 adb 命令"""
+
+    def __init__(self, stages):
+        super().__init__(stages)
+        self.commands = []
+
+    def run(self, command):
+        self.commands.append(command)
+        return super().run(command)
+
+@pytest.fixture
+def device():
+    clock.set_speed(1000)  # 设备端 sleep 只按虚拟时间推进
+    device = CountingDevice([Stage("lobby", [np.zeros((960, 540, 3), np.uint8)])])
+    attach_device(SERIAL, device)
+    yield device
+    detach_device(SERIAL)
+    clock.set_speed(1.0)
+
+def test_compiles_steps_into_one_command():
+    script = InputScript().tap(10.7, 20.2).sleep(0.5).swipe(1, 2, 3, 4, 150).sleep(0).tap(5, 6)
+    assert len(script) == 4  # 0 秒的等待不生成命令
+    assert script.to_shell() == "input tap 10 20; sleep 0.5; input swipe 1 2 3 4 150; input tap 5 6"
+    assert script.duration == pytest.approx(0.65)
+
+def test_empty_script_does_not_run(device):
+    assert InputScript().run(SERIAL) is None
+    assert device.commands == []
+
+def test_runs_in_one_round_trip(device):
+    result = InputScript().tap(100, 200).sleep(0.5).tap(300, 400).run(SERIAL)
+    assert result.returncode == 0
+    assert device.commands == ["shell input tap 100 200; sleep 0.5; input tap 300 400"]
+    assert [(record.kind, record.x, record.y) for record in device.inputs] == [("tap", 100, 200), ("tap", 300, 400)]
+    # 两次点击之间的等待在设备端执行
+    assert device.inputs[1].time - device.inputs[0].time == pytest.approx(0.5, abs=0.05)
+
+def test_swipe_records_release_position(device):
+    InputScript().swipe(100, 800, 270, 400, 150).run(SERIAL)
+    assert len(device.commands) == 1
+    assert [(record.kind, record.x, record.y) for record in device.inputs] == [("swipe", 270, 400)]
@@ -0,0 +1,67 @@
+# tests/test_screencap.py
+import struct
+import numpy as np
+import pytest
+from core.adb_manager import decode_raw_screencap
+
+WIDTH, HEIGHT = 5, 3
+
+def _pixels():
+    """每个像素的 R、G、B 各不相同，A 固定为 255，可以检查通道顺序和行列位置"""
+    ys, xs = np.mgrid[0:HEIGHT, 0:WIDTH]
+    return np.dstack([xs * 40, ys * 80, xs + ys * 10, np.full_like(xs, 255)]).astype(np.uint8)
+
+def _raw(channels, pixel_format, colorspace=None, width=WIDTH, height=HEIGHT):
+    header = struct.pack("<III", width, height, pixel_format)
+    if colorspace is not None:
+        header += struct.pack("<I", colorspace)  # Android 9 及以上的 colorspace 字段
+    return header + channels.tobytes()
+
+def test_rgba_without_colorspace():
+    rgba = _pixels()
+    frame = decode_raw_screencap(_raw(rgba, 1))
+    assert frame.shape == (HEIGHT, WIDTH, 3)
+    np.testing.assert_array_equal(frame, rgba[:, :, 2::-1])
+
+def test_rgba_with_colorspace():
+    rgba = _pixels()
+    frame = decode_raw_screencap(_raw(rgba, 1, colorspace=1))
+    np.testing.assert_array_equal(frame, rgba[:, :, 2::-1])
+
+def test_rgbx():
+    rgbx = _pixels()
+    rgbx[:, :, 3] = 0
+    np.testing.assert_array_equal(decode_raw_screencap(_raw(rgbx, 2)), rgbx[:, :, 2::-1])
+
+def test_bgra():
+    bgra = _pixels()
+    np.testing.assert_array_equal(decode_raw_screencap(_raw(bgra, 5, colorspace=0)), bgra[:, :, :3])
+
+def test_rows_are_width_pixels_apart():
+    # 宽高不相等时行和列不能颠倒：第 y 行第 x 个像素在 (y * width + x) * 4 处
+    frame = decode_raw_screencap(_raw(_pixels(), 5))
+    for y in range(HEIGHT):
+        for x in range(WIDTH):
+            assert tuple(frame[y, x]) == (x * 40, y * 80, x + y * 10)
+
+def test_result_is_writable_copy():
+    data = _raw(_pixels(), 1)
+    frame = decode_raw_screencap(data)
+    frame[0, 0] = 0
+    assert frame.flags.writeable
+
+def test_rejects_short_data():
+    with pytest.raises(ValueError):
+        decode_raw_screencap(b"\x00" * 8)
+
+def test_rejects_size_mismatch():
+    # 缺少或多出像素数据（如行末填充）时无法确定头部长度
+    data = _raw(_pixels(), 1)
+    with pytest.raises(ValueError):
+        decode_raw_screencap(data[:-4])
+    with pytest.raises(ValueError):
+        decode_raw_screencap(data + b"\x00" * (HEIGHT * 4 * 2))
+
+def test_rejects_unknown_format():
+    with pytest.raises(ValueError):
+        decode_raw_screencap(_raw(_pixels(), 4))
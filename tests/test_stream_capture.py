@@ -0,0 +1,46 @@
+# tests/test_stream_capture.py
+import os
+import time
+import cv2
+import numpy as np
+from core.stream_capture import StreamCapture
+
+# 裸 H.264 码流（与 screenrecord --output-format=h264 相同的格式）：3 帧主界面 + 3 帧对战画面，每 3 帧一个关键帧
+CLIP = os.path.join(os.path.dirname(__file__), "data", "battle.h264")
+CLIP_FRAMES = 6
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _decode_all(stream, timeout=10):
+    """等待录制文件播放完毕（loop=False 时后台线程在结尾退出）"""
+    deadline = time.monotonic() + timeout
+    while stream.running and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not stream.running, "视频流没有在超时前播放完"
+
+def _closest(frame, *paths):
+    """返回与帧最接近的截图路径"""
+    errors = [np.abs(cv2.imread(os.path.join(ROOT, path)).astype(np.int16) - frame).mean() for path in paths]
+    return paths[int(np.argmin(errors))]
+
+def test_decodes_recorded_clip():
+    stream = StreamCapture(source=CLIP, fps=0, loop=False).start()
+    try:
+        _decode_all(stream)
+        frame = stream.latest()
+    finally:
+        stream.stop()
+    # 第一个关键帧之前的数据不能被丢弃，否则设备的视频流每次重启都要等到下一个关键帧
+    assert stream.frames == CLIP_FRAMES
+    assert not stream.failed
+    assert frame.shape == (960, 540, 3)
+    assert _closest(frame, "screen.png", "screen copy.png") == "screen copy.png"
+
+def test_latest_rejects_old_frames():
+    stream = StreamCapture(source=CLIP, fps=0, loop=False).start()
+    try:
+        _decode_all(stream)
+        assert stream.latest(max_age=60) is not None
+        time.sleep(0.1)
+        assert stream.latest(max_age=0.05) is None
+    finally:
+        stream.stop()
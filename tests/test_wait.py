@@ -0,0 +1,63 @@
+# tests/test_wait.py
+import itertools
+import pytest
+from utils.clock import clock
+from utils.wait import wait_until, fixed_schedule, exponential_schedule
+
+@pytest.fixture(autouse=True)
+def fast_clock():
+    clock.set_speed(1000)  # 等待只按虚拟时间推进
+    yield
+    clock.set_speed(1.0)
+
+def _recording(results):
+    """依次返回 results 中的值，并记录每次检查时的虚拟时间"""
+    times = []
+    values = iter(results)
+
+    def condition():
+        times.append(clock.time())
+        return next(values)
+
+    condition.times = times
+    return condition
+
+def test_exponential_schedule():
+    intervals = list(itertools.islice(exponential_schedule(0.2, 1.5, 2.0), 8))
+    assert intervals[:4] == pytest.approx([0.2, 0.3, 0.45, 0.675])
+    assert max(intervals) == 2.0 and intervals[-1] == 2.0
+
+def test_fixed_schedule_polls_until_condition():
+    condition = _recording([False, False, "done"])
+    start = clock.time()
+    result = wait_until(condition, 5, fixed_schedule(0.5))
+    assert result.ok and result.polls == 3 and result.value == "done"
+    gaps = [b - a for a, b in zip([start] + condition.times, condition.times)]
+    assert gaps == pytest.approx([0, 0.5, 0.5], abs=0.05)
+    assert result.elapsed == pytest.approx(1.0, abs=0.05)
+
+def test_default_schedule_is_exponential():
+    condition = _recording([False] * 4 + [True])
+    wait_until(condition, 10)
+    gaps = [b - a for a, b in zip(condition.times, condition.times[1:])]
+    assert gaps == pytest.approx([0.2, 0.3, 0.45, 0.675], abs=0.05)
+
+def test_timeout_checks_once_more_at_deadline():
+    condition = _recording(itertools.repeat(0))
+    result = wait_until(condition, 1.0, fixed_schedule(0.3))
+    # 0, 0.3, 0.6, 0.9 以及截止时的最后一次检查，最后一次等待缩短为剩余时间
+    assert not result.ok and result.polls == 5 and result.value == 0
+    assert result.elapsed == pytest.approx(1.0, abs=0.05)
+
+def test_initial_delay_before_first_check():
+    condition = _recording([False, True])
+    start = clock.time()
+    result = wait_until(condition, 5, fixed_schedule(0.5), initial_delay=2)
+    assert condition.times[0] - start == pytest.approx(2, abs=0.05)
+    assert result.ok and result.elapsed == pytest.approx(2.5, abs=0.05)
+
+def test_initial_delay_is_capped_by_timeout():
+    condition = _recording(itertools.repeat(False))
+    result = wait_until(condition, 1, fixed_schedule(0.5), initial_delay=3)
+    assert not result.ok and result.polls == 1
+    assert result.elapsed == pytest.approx(1, abs=0.05)
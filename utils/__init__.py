@@ -1,2 +1,13 @@
 # utils/__init__.py
-from .image_utils import *
\ No newline at end of file
+from .image_utils import *
+from .template_registry import *
+from .scale_lock import *
+from .frame_cache import *
+from .clock import *
+from .wait import *
+from .elixir import *
+from .hand import *
+from .metrics import *
+from .event_log import *
+from .template_bundle import *
+from .battle_history import *
\ No newline at end of file
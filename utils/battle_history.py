@@ -0,0 +1,162 @@
+# utils/battle_history.py
+import sqlite3
+import threading
+import numpy as np
+from config.settings import (battle_history_path, history_window, history_min_samples,
+                             history_check_end_quantile, history_wait_quantile, history_margin)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS battles (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    finished_at REAL NOT NULL,
+    device TEXT,
+    mode TEXT NOT NULL,
+    deck_index INTEGER,
+    success INTEGER NOT NULL,
+    end_detected INTEGER,
+    cards_played INTEGER,
+    duration REAL,
+    start_seconds REAL,
+    battle_seconds REAL,
+    end_seconds REAL,
+    match_calls INTEGER,
+    match_ms REAL,
+    recovery TEXT
+);
+CREATE INDEX IF NOT EXISTS battles_mode ON battles (mode, success, deck_index);
+CREATE TABLE IF NOT EXISTS waits (
+    battle_id INTEGER NOT NULL REFERENCES battles (id),
+    label TEXT NOT NULL,
+    elapsed REAL NOT NULL,
+    ok INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS waits_label ON waits (label, ok);
+"""
+
+# battles 表中可以写入的列
+BATTLE_COLUMNS = ("finished_at", "device", "mode", "deck_index", "success", "end_detected", "cards_played",
+                  "duration", "start_seconds", "battle_seconds", "end_seconds", "match_calls", "match_ms", "recovery")
+
+class BattleHistory:
+    """
+    对战历史：每场对战一条记录（模式、卡组、释放卡牌数、各阶段用时、恢复方式、匹配耗时），
+    以及对战过程中每次等待的用时，保存在 SQLite 数据库中，程序重启后仍然可用。
+
+    数据库使用 WAL 模式，多台设备的进程可以同时读写同一个文件。
+    check_end_after 和 wait_delays 根据最近 window 条记录的分布计算检查点，样本不足时返回空结果，
+    由调用方使用默认值。
+    """
+
+    def __init__(self, path=battle_history_path, window=history_window, min_samples=history_min_samples,
+                 margin=history_margin):
+        self.path = path
+        self.window = window
+        self.min_samples = min_samples
+        self.margin = margin
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """
+        为旧版本创建的数据库补充新增的列。旧记录的 end_detected 为空，不参与检查点的计算
+        """
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(battles)")}
+        if "end_detected" not in columns:
+            with self._conn:
+                self._conn.execute("ALTER TABLE battles ADD COLUMN end_detected INTEGER")
+
+    def record(self, battle, waits=()):
+        """
+        保存一场对战
+
+        Args:
+            battle (dict): 对战记录，键为 BATTLE_COLUMNS 中的列名，缺少的列为空
+            waits (list): 本场对战中的等待 [(名称, 用时, 条件是否满足)]
+
+        Returns:
+            int: 记录的 id
+        """
+        columns = [column for column in BATTLE_COLUMNS if column in battle]
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                f"INSERT INTO battles ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                [battle[column] for column in columns])
+            battle_id = cursor.lastrowid
+            self._conn.executemany("INSERT INTO waits (battle_id, label, elapsed, ok) VALUES (?, ?, ?, ?)",
+                                   [(battle_id, label, float(elapsed), int(bool(ok))) for label, elapsed, ok in waits])
+        return battle_id
+
+    def set_recovery(self, battle_id, recovery):
+        """
+        记录对战失败后返回主界面的方式
+        """
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE battles SET recovery = ? WHERE id = ?", (recovery, battle_id))
+
+    def _query(self, sql, params):
+        with self._lock:
+            return [row[0] for row in self._conn.execute(sql, params)]
+
+    def count(self, mode=None):
+        """
+        已记录的对战场数
+        """
+        if mode is None:
+            return self._query("SELECT COUNT(*) FROM battles", ())[0]
+        return self._query("SELECT COUNT(*) FROM battles WHERE mode = ?", (mode,))[0]
+
+    def cards_played(self, mode, deck_index=None):
+        """
+        最近 window 场检测到对战结束的对战中，结束时已释放的卡牌数。
+        达到 max_cards 等原因结束对战循环的记录只是下限，不参与计算
+        """
+        sql = ("SELECT cards_played FROM battles "
+               "WHERE mode = ? AND success = 1 AND end_detected = 1 AND cards_played > 0")
+        params = [mode]
+        if deck_index is not None:
+            sql += " AND deck_index = ?"
+            params.append(deck_index)
+        return self._query(sql + " ORDER BY id DESC LIMIT ?", params + [self.window])
+
+    def wait_times(self, label, mode):
+        """
+        最近 window 次条件满足的等待用时（秒）
+        """
+        return self._query(
+            "SELECT w.elapsed FROM waits w JOIN battles b ON b.id = w.battle_id "
+            "WHERE w.label = ? AND w.ok = 1 AND b.mode = ? ORDER BY w.rowid DESC LIMIT ?",
+            (label, mode, self.window))
+
+    def check_end_after(self, mode, deck_index=None, quantile=history_check_end_quantile):
+        """
+        从第几张卡牌开始检查对战结束：先使用同一模式和卡组的记录，样本不足时使用同一模式的全部记录
+
+        Returns:
+            int: 卡牌数，样本不足时返回 None
+        """
+        for deck in ([deck_index, None] if deck_index is not None else [None]):
+            samples = self.cards_played(mode, deck)
+            if len(samples) >= self.min_samples:
+                return max(1, int(np.quantile(samples, quantile) * self.margin))
+        return None
+
+    def wait_delays(self, mode, quantile=history_wait_quantile):
+        """
+        各类等待在第一次检查前的延迟
+
+        Returns:
+            dict: {等待名称: 秒}，样本不足的等待不在结果中
+        """
+        delays = {}
+        for label in self._query("SELECT DISTINCT label FROM waits", ()):
+            samples = self.wait_times(label, mode)
+            if len(samples) >= self.min_samples:
+                delays[label] = float(np.quantile(samples, quantile)) * self.margin
+        return delays
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
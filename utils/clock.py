@@ -0,0 +1,134 @@
+# utils/clock.py
+import asyncio
+import threading
+import time
+
+class Clock:
+    """
+    可加速的时钟。对战流程中的等待都通过它进行，离线回放时可以按倍数缩短等待。
+
+    speed 为 1 时与 time.time / time.sleep 完全相同。speed > 1 时等待只实际等待 1/speed，
+    省下的时间计入虚拟时间，因此 time() 返回的虚拟时间 = 实际计算耗时 + 完整的等待时间，
+    截图、匹配等计算开销不会被放大。只有调用 set_speed 的线程（主流程）的等待计入虚拟时间，
+    后台线程的等待与主流程重叠，只缩短不计入。
+
+    主流程线程中运行的 asyncio 任务通过 async_sleep / async_wait 等待。多个任务的等待可能同时进行，
+    只有所有等待都结束时才把这段实际时间（各等待的并集）计入虚拟时间，重叠部分不重复计算。
+    """
+
+    def __init__(self, speed=1.0):
+        self._lock = threading.Lock()
+        self._skipped = 0.0
+        self._owner = threading.get_ident()
+        self._async_waits = 0  # 正在进行的 asyncio 等待数
+        self._async_since = 0.0  # 第一个等待开始的实际时间
+        self.speed = float(speed)
+
+    def set_speed(self, speed):
+        """
+        设置加速倍数，调用线程成为主流程线程
+        """
+        if speed <= 0:
+            raise ValueError(f"时钟倍数必须大于0: {speed}")
+        with self._lock:
+            self.speed = float(speed)
+            self._owner = threading.get_ident()
+
+    def time(self):
+        """
+        当前虚拟时间（秒），speed 为 1 时等于 time.time()
+        """
+        now = time.time()
+        with self._lock:
+            skipped = self._skipped
+            if self._async_waits:
+                # asyncio 等待进行中：已经过的部分先计入，等待结束时再正式累加
+                skipped += self._pending(now)
+        return now + skipped
+
+    def scale(self, seconds):
+        """
+        把虚拟时长换算为实际需要等待的时长，用于 asyncio 等无法经过本时钟等待的场景
+        """
+        return seconds / self.speed if seconds else seconds
+
+    def sleep(self, seconds):
+        if seconds <= 0:
+            return
+        real = self.scale(seconds)
+        time.sleep(real)
+        self._skip(real)
+
+    def wait(self, event, timeout=None):
+        """
+        等待 threading.Event，最多等待 timeout 秒（虚拟时间）
+
+        Returns:
+            bool: 事件是否已设置
+        """
+        if timeout is None:
+            return event.wait()
+        started = time.time()
+        result = event.wait(self.scale(timeout))
+        self._skip(time.time() - started)
+        return result
+
+    async def async_sleep(self, seconds):
+        """
+        asyncio 版本的 sleep，用于在主流程线程的事件循环中等待
+        """
+        if seconds <= 0:
+            return
+        self._begin_async()
+        try:
+            await asyncio.sleep(self.scale(seconds))
+        finally:
+            self._end_async()
+
+    async def async_wait(self, event, timeout=None):
+        """
+        等待 asyncio.Event，最多等待 timeout 秒（虚拟时间）
+
+        Returns:
+            bool: 事件是否已设置
+        """
+        if timeout is None:
+            await event.wait()
+            return True
+        self._begin_async()
+        try:
+            await asyncio.wait_for(event.wait(), timeout=self.scale(timeout))
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._end_async()
+        return event.is_set()
+
+    def _pending(self, now):
+        return (now - self._async_since) * (self.speed - 1)
+
+    def _begin_async(self):
+        # 只有主流程线程的事件循环计入虚拟时间
+        if self.speed == 1.0 or threading.get_ident() != self._owner:
+            return
+        with self._lock:
+            if self._async_waits == 0:
+                self._async_since = time.time()
+            self._async_waits += 1
+
+    def _end_async(self):
+        if self.speed == 1.0 or threading.get_ident() != self._owner:
+            return
+        with self._lock:
+            self._async_waits -= 1
+            if self._async_waits == 0:
+                self._skipped += self._pending(time.time())
+
+    def _skip(self, real):
+        if self.speed == 1.0 or threading.get_ident() != self._owner:
+            return
+        with self._lock:
+            self._skipped += real * (self.speed - 1)
+
+# 全局时钟
+clock = Clock()
@@ -0,0 +1,78 @@
+# utils/elixir.py
+import numpy as np
+from config.settings import ELIXIR_BAR_REGION, ELIXIR_SEGMENTS
+from .image_utils import crop_region
+
+class ElixirReader:
+    """
+    圣水条读取器：直接对圣水条区域的像素做向量化颜色判断，不使用模板匹配。
+
+    圣水为品红色（R、B 通道高，G 通道低），统计每一列中品红色像素的比例，
+    从左到右连续填充的列数占整条的比例即为当前圣水量。
+    """
+
+    def __init__(self, region=ELIXIR_BAR_REGION, segments=ELIXIR_SEGMENTS, min_channel=140,
+                 green_ratio=0.6, column_fill=0.5):
+        """
+        Args:
+            region (tuple): 圣水条区域（归一化坐标）
+            segments (int): 圣水条的格数
+            min_channel (int): R、B 通道的最小值
+            green_ratio (float): G 通道不超过 min(R, B) 的比例
+            column_fill (float): 一列中品红色像素达到该比例时视为已填充
+        """
+        self.region = region
+        self.segments = segments
+        self.min_channel = min_channel
+        self.green_ratio = green_ratio
+        self.column_fill = column_fill
+
+    def filled_columns(self, frame):
+        """
+        返回圣水条每一列是否已填充的布尔数组
+        """
+        bar, _, _ = crop_region(frame, self.region)
+        if bar.size == 0:
+            return np.zeros(0, dtype=bool)
+        # 转为 int16 避免 uint8 运算溢出
+        b = bar[:, :, 0].astype(np.int16)
+        g = bar[:, :, 1].astype(np.int16)
+        r = bar[:, :, 2].astype(np.int16)
+        magenta = (r >= self.min_channel) & (b >= self.min_channel) & (g <= self.green_ratio * np.minimum(r, b))
+        return magenta.mean(axis=0) >= self.column_fill
+
+    def read(self, frame):
+        """
+        读取当前圣水量
+
+        Args:
+            frame (numpy.ndarray): BGR 屏幕图像
+
+        Returns:
+            float: 圣水量（0 ~ segments），圣水条不可见时返回 None
+        """
+        columns = self.filled_columns(frame)
+        if columns.size == 0 or not columns[0]:
+            # 最左侧不是品红色：圣水为0或不在对战界面，无法区分，视为不可见
+            return None
+        # 从左侧开始连续填充的长度，中间的格子分隔线和数字不影响判断
+        empty = np.flatnonzero(~columns)
+        filled = columns.size if empty.size == 0 else self._filled_length(columns, empty)
+        return self.segments * filled / columns.size
+
+    def _filled_length(self, columns, empty):
+        # 允许宽度不超过半格的空隙（格子之间的分隔线、覆盖在圣水条上的数字）
+        max_gap = max(1, columns.size // (self.segments * 2))
+        filled_idx = np.flatnonzero(columns)
+        gaps = np.diff(filled_idx)
+        breaks = np.flatnonzero(gaps > max_gap + 1)
+        last = filled_idx[breaks[0]] if breaks.size else filled_idx[-1]
+        return last + 1
+
+    def count(self, frame):
+        """
+        读取当前圣水的整数格数，不可见时返回 None
+        """
+        elixir = self.read(frame)
+        # 容忍末尾分隔线造成的少量误差
+        return None if elixir is None else int(elixir + 0.1)
@@ -0,0 +1,165 @@
+# utils/event_log.py
+import atexit
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from config.settings import (log_level, log_buffer_size, log_flush_interval, log_console, log_file,
+                             LOG_SAMPLING)
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+
+class EventLog:
+    """
+    结构化事件日志。
+
+    调用方只把事件追加到内存中的环形缓冲区（deque 的 append 是原子操作，无需加锁），
+    后台线程定期取出事件批量写到控制台和 JSONL 文件。终端或磁盘写入变慢时，控制流程不会被阻塞，
+    缓冲区写满后丢弃最旧的事件并在输出中提示丢弃数量。
+
+    每个事件有名称（如 "adb.exec"）和级别，低于 level 的事件直接丢弃，
+    sampling 中列出的事件只按比例保留一部分。
+
+    fork 出的子进程中，父进程的后台线程不存在，锁可能停留在被该线程持有的状态，
+    因此在子进程中重新创建锁、事件和缓冲区，第一次记录时再启动后台线程。
+    """
+
+    def __init__(self, level=log_level, buffer_size=log_buffer_size, flush_interval=log_flush_interval,
+                 console=log_console, path=log_file, sampling=None):
+        self.level = LEVELS[level]
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.console = console
+        self.path = path
+        self.sampling = dict(LOG_SAMPLING if sampling is None else sampling)
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+        atexit.register(self.close)
+
+    def _reset(self):
+        """
+        创建缓冲区、锁和事件（初始化时，以及 fork 出的子进程中）
+        """
+        self.dropped = 0
+        self._buffer = deque(maxlen=self.buffer_size)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._write_lock = threading.Lock()
+        self._dropped_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def set_level(self, level):
+        self.level = LEVELS[level]
+
+    def log(self, level, event, message, **fields):
+        """
+        记录一个事件
+
+        Args:
+            level (str): 级别
+            event (str): 事件名称，用于采样和检索
+            message (str): 可读的说明
+            fields: 附加的结构化字段（写入 JSONL 文件）
+        """
+        if LEVELS[level] < self.level:
+            return
+        rate = self.sampling.get(event)
+        if rate is not None and rate < 1.0 and random.random() >= rate:
+            return
+        if self._pid != os.getpid():
+            self._start()
+        if len(self._buffer) >= self.buffer_size:
+            with self._dropped_lock:
+                self.dropped += 1
+        self._buffer.append((time.time(), level, event, message, fields))
+        if len(self._buffer) > self.buffer_size // 2:
+            self._wake.set()
+
+    def debug(self, event, message, **fields):
+        self.log("DEBUG", event, message, **fields)
+
+    def info(self, event, message, **fields):
+        self.log("INFO", event, message, **fields)
+
+    def warning(self, event, message, **fields):
+        self.log("WARNING", event, message, **fields)
+
+    def error(self, event, message, **fields):
+        self.log("ERROR", event, message, **fields)
+
+    def _start(self):
+        """
+        启动后台输出线程；不支持 register_at_fork 的平台上，子进程第一次记录时也会经过这里重新启动
+        """
+        self._pid = os.getpid()
+        self._buffer = deque(maxlen=self.buffer_size)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="event-log", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """
+        取出缓冲区中的全部事件并输出
+        """
+        with self._write_lock:
+            batch = []
+            try:
+                while True:
+                    batch.append(self._buffer.popleft())
+            except IndexError:
+                pass
+            with self._dropped_lock:
+                dropped, self.dropped = self.dropped, 0
+            if not batch and not dropped:
+                return
+            try:
+                self._write(batch, dropped)
+            except (OSError, ValueError):
+                # 输出失败（如管道关闭）时丢弃这批事件，不影响控制流程
+                pass
+
+    def _write(self, batch, dropped):
+        if self.console:
+            lines = []
+            if dropped:
+                lines.append(f"[日志] 缓冲区已满，丢弃了 {dropped} 条事件\n")
+            for timestamp, level, event, message, fields in batch:
+                prefix = "" if level == "INFO" else f"[{level}] "
+                lines.append(f"{time.strftime('%H:%M:%S', time.localtime(timestamp))} {prefix}{message}\n")
+            sys.stdout.write("".join(lines))
+            sys.stdout.flush()
+        if self.path:
+            path = self.path.format(pid=os.getpid())
+            parent = os.path.dirname(path)
+            if parent:
+                os.makedirs(parent, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                for timestamp, level, event, message, fields in batch:
+                    record = {"time": timestamp, "level": level, "event": event, "message": message, **fields}
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+    def close(self):
+        """
+        停止后台线程并输出剩余事件
+        """
+        if self._thread is not None and self._pid == os.getpid():
+            self._stop.set()
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+            self._pid = None
+        self.flush()
+
+# 全局事件日志
+log = EventLog()
@@ -0,0 +1,97 @@
+# utils/frame_cache.py
+import math
+import threading
+from collections import Counter
+import cv2
+import numpy as np
+from config.settings import frame_fingerprint_grid, frame_diff_tolerance
+
+def frame_fingerprint(image, grid=frame_fingerprint_grid):
+    """
+    计算截图指纹：灰度图按网格划分后每一块的平均亮度。
+
+    Args:
+        image (numpy.ndarray): BGR 图像
+        grid (tuple): 网格大小 (行, 列)
+
+    Returns:
+        numpy.ndarray: 形状为 grid 的 float32 数组
+    """
+    rows, cols = grid
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    # INTER_AREA 缩小时正好是每块像素的平均值
+    return cv2.resize(gray, (cols, rows), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+def fingerprints_equal(first, second, region=None, tolerance=frame_diff_tolerance):
+    """
+    比较两个截图指纹在指定区域内是否相同（各块平均亮度之差不超过 tolerance）
+    """
+    if first is None or second is None or first.shape != second.shape:
+        return False
+    diff = np.abs(_region_blocks(first, region) - _region_blocks(second, region))
+    return diff.size > 0 and float(diff.max()) <= tolerance
+
+def _region_blocks(fingerprint, region):
+    """取出归一化区域覆盖的网格块，region 为 None 时返回整个指纹"""
+    if region is None:
+        return fingerprint
+    rows, cols = fingerprint.shape
+    x1, y1, x2, y2 = region
+    return fingerprint[int(y1 * rows):max(int(y1 * rows) + 1, math.ceil(y2 * rows)),
+                       int(x1 * cols):max(int(x1 * cols) + 1, math.ceil(x2 * cols))]
+
+class MatchCache:
+    """
+    匹配结果缓存：同一模板在相关区域没有变化的截图上直接复用上一次的匹配结果。
+
+    缓存键由调用方给出（模板路径及匹配参数），每个键只保留最近一次的结果和当时的截图指纹。
+    """
+
+    def __init__(self, tolerance=frame_diff_tolerance):
+        self.tolerance = tolerance
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = Counter()
+        self.misses = Counter()
+
+    def lookup(self, key, fingerprint, region=None):
+        """
+        查找缓存
+
+        Args:
+            key (tuple): 缓存键，第一个元素为模板路径
+            fingerprint (numpy.ndarray): 当前截图的指纹
+            region (tuple): 模板的搜索区域（归一化坐标），只比较该区域内的网格块
+
+        Returns:
+            tuple: (是否命中, 缓存的匹配结果)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        hit = entry is not None and fingerprints_equal(fingerprint, entry[0], region, self.tolerance)
+        with self._lock:
+            if hit:
+                self.hits[key[0]] += 1
+            else:
+                self.misses[key[0]] += 1
+        return (True, entry[1]) if hit else (False, None)
+
+    def store(self, key, fingerprint, result):
+        with self._lock:
+            self._entries[key] = (fingerprint, result)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def report(self):
+        """
+        返回各模板的命中、未命中次数和命中率
+        """
+        with self._lock:
+            templates = set(self.hits) | set(self.misses)
+            report = {}
+            for template in sorted(templates):
+                hits, misses = self.hits[template], self.misses[template]
+                report[template] = {"hits": hits, "misses": misses, "hit_rate": hits / (hits + misses)}
+            return report
@@ -0,0 +1,176 @@
+# utils/hand.py
+import os
+import glob
+from collections import namedtuple
+import cv2
+import numpy as np
+from config.settings import (HAND_SLOT_REGIONS, card_template_dir, card_signature_path, card_signature_size,
+                             card_match_distance, card_min_saturation)
+from .image_utils import crop_region
+from .event_log import log
+
+# 单个卡槽的识别结果：卡槽序号、卡牌名称（未识别时为 None）、特征距离、是否可以释放
+HandSlot = namedtuple("HandSlot", ["index", "card", "distance", "playable"])
+
+def card_signature(image, size=card_signature_size):
+    """
+    计算卡牌图像的特征向量：缩小后的 HSV 图像，减去均值并归一化为单位向量。
+
+    Args:
+        image (numpy.ndarray): BGR 卡牌图像
+        size (tuple): 缩略图大小 (宽, 高)
+
+    Returns:
+        numpy.ndarray: 一维 float32 特征向量
+    """
+    small = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    vector = cv2.cvtColor(small, cv2.COLOR_BGR2HSV).astype(np.float32).ravel()
+    vector -= vector.mean()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+class CardSignatureIndex:
+    """
+    卡牌特征索引：所有已知卡牌的特征向量保存在一个矩阵中，
+    一帧的全部卡槽通过一次矩阵乘法与所有卡牌比较，不需要逐张调用 matchTemplate。
+    """
+
+    def __init__(self, names=None, matrix=None, size=card_signature_size):
+        self.size = tuple(size)
+        self.names = list(names or [])
+        dim = self.size[0] * self.size[1] * 3
+        self.matrix = matrix if matrix is not None else np.zeros((0, dim), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def from_directory(cls, directory=card_template_dir, size=card_signature_size):
+        """
+        从卡牌图片目录建立索引，文件名（不含扩展名）即卡牌名称
+        """
+        names, rows = [], []
+        for path in sorted(glob.glob(os.path.join(directory, "*.png"))):
+            image = cv2.imread(path)
+            if image is None:
+                continue
+            names.append(os.path.splitext(os.path.basename(path))[0])
+            rows.append(card_signature(image, size))
+        matrix = np.vstack(rows) if rows else None
+        return cls(names, matrix, size)
+
+    @classmethod
+    def load(cls, path=card_signature_path, directory=card_template_dir, size=card_signature_size):
+        """
+        加载特征矩阵缓存；缓存不存在、过期或尺寸不一致时从图片目录重建并保存
+        """
+        newest = max((os.path.getmtime(p) for p in glob.glob(os.path.join(directory, "*.png"))), default=0)
+        if os.path.exists(path) and os.path.getmtime(path) >= newest:
+            try:
+                data = np.load(path)
+                if tuple(data["size"]) == tuple(size):
+                    return cls(data["names"].tolist(), data["matrix"].astype(np.float32), size)
+            except (OSError, KeyError, ValueError) as e:
+                log.warning("hand", f"读取卡牌特征缓存失败: {e}")
+        index = cls.from_directory(directory, size)
+        if len(index):
+            index.save(path)
+        return index
+
+    def save(self, path=card_signature_path):
+        """
+        保存特征矩阵
+        """
+        np.savez(path, names=np.array(self.names), matrix=self.matrix, size=np.array(self.size))
+
+    def add(self, name, image):
+        """
+        添加一张卡牌
+        """
+        self.names.append(name)
+        self.matrix = np.vstack([self.matrix, card_signature(image, self.size)])
+
+    def nearest(self, signatures):
+        """
+        为每个特征向量找出最接近的卡牌
+
+        Args:
+            signatures (numpy.ndarray): 形状为 (n, d) 的特征矩阵
+
+        Returns:
+            tuple: (索引数组, 距离数组)，索引为空时索引均为 -1、距离为 inf
+        """
+        n = signatures.shape[0]
+        if not len(self):
+            return np.full(n, -1), np.full(n, np.inf, dtype=np.float32)
+        # 单位向量之间的欧氏距离平方 = 2 - 2 * 余弦相似度
+        similarity = signatures @ self.matrix.T
+        best = similarity.argmax(axis=1)
+        distance = np.sqrt(np.maximum(0.0, 2.0 - 2.0 * similarity[np.arange(n), best]))
+        return best, distance
+
+class HandRecognizer:
+    """
+    手牌识别器：从当前截图中截取四个卡槽，判断卡槽是否可用并识别卡牌。
+
+    圣水不足或空的卡槽颜色是灰的，用平均饱和度即可排除，不需要识别卡牌；
+    即使没有任何卡牌图片，也能用于跳过不可用的卡槽。
+    """
+
+    def __init__(self, index=None, regions=HAND_SLOT_REGIONS, max_distance=card_match_distance,
+                 min_saturation=card_min_saturation):
+        self.index = index if index is not None else CardSignatureIndex.load()
+        self.regions = list(regions)
+        self.max_distance = max_distance
+        self.min_saturation = min_saturation
+
+    def slot_images(self, frame):
+        """
+        截取各卡槽图像（原图视图，不复制）
+        """
+        return [crop_region(frame, region)[0] for region in self.regions]
+
+    def recognize(self, frame):
+        """
+        识别当前手牌
+
+        Args:
+            frame (numpy.ndarray): BGR 屏幕图像
+
+        Returns:
+            list: 每个卡槽的 HandSlot
+        """
+        slots = self.slot_images(frame)
+        signatures = np.vstack([card_signature(slot, self.index.size) for slot in slots])
+        best, distance = self.index.nearest(signatures)
+        hand = []
+        for i, slot in enumerate(slots):
+            saturation = float(cv2.cvtColor(slot, cv2.COLOR_BGR2HSV)[:, :, 1].mean()) if slot.size else 0.0
+            known = best[i] >= 0 and distance[i] <= self.max_distance
+            hand.append(HandSlot(i, self.index.names[best[i]] if known else None, float(distance[i]),
+                                 saturation >= self.min_saturation))
+        return hand
+
+    def playable_slots(self, frame):
+        """
+        返回可以释放的卡槽序号列表
+        """
+        return [slot.index for slot in self.recognize(frame) if slot.playable]
+
+if __name__ == "__main__":
+    # 保存当前截图中的四个卡槽图像到卡牌目录的 new/ 子目录（不参与识别），
+    # 重命名为卡牌名称后移到卡牌目录即可用于识别
+    import sys
+    from core.adb_manager import capture_frame
+
+    frame = capture_frame(sys.argv[1] if len(sys.argv) > 1 else None)
+    if frame is None:
+        print("截图失败")
+        sys.exit(1)
+    output_dir = os.path.join(card_template_dir, "new")
+    os.makedirs(output_dir, exist_ok=True)
+    recognizer = HandRecognizer()
+    for slot, image in zip(recognizer.recognize(frame), recognizer.slot_images(frame)):
+        path = os.path.join(output_dir, f"slot{slot.index + 1}.png")
+        cv2.imwrite(path, image)
+        print(f"卡槽 {slot.index + 1}: 识别为 {slot.card}（距离 {slot.distance:.3f}，可用: {slot.playable}），已保存到 {path}")
\ No newline at end of file
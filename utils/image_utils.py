@@ -1,63 +1,525 @@
 # utils/image_utils.py
 import cv2
 import numpy as np
+import os
 import random
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from config.settings import (TEMPLATE_REGIONS, TEMPLATE_MATCH_MODES, default_match_mode, scale_sweep_workers,
+                             scale_accept_threshold)
+from .template_registry import template_registry, convert_image, MATCH_MODES
+from .metrics import metrics
 
-def preprocess_image(image):
+def preprocess_image(image, mode="gray"):
     """
-    对图像进行预处理，例如灰度化、模糊处理等。
+    对图像进行预处理：高斯去噪后转换为匹配模式所用的图像（与模板的预处理方式相同）。
     """
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-    return blurred
+    blurred = cv2.GaussianBlur(image, (3, 3), 0)
+    return convert_image(blurred, mode)
 
 def randomize_coordinate(x, y, radius=5):
     """添加随机偏移，避免机器人痕迹"""
     return x + random.randint(-radius, radius), y + random.randint(-radius, radius)
 
-def find_template_position(large_image_path, template_image_path, output_path="result.png", threshold=0.6, min_scale=0.5, max_scale=2.0):
+def load_image(image):
+    """
+    读取图像：传入路径时从磁盘读取，传入 NumPy 数组（内存中的截图）时直接返回。
+    """
+    if isinstance(image, np.ndarray):
+        return image
+    return cv2.imread(image)
+
+def get_template_region(template_path):
+    """
+    从 TEMPLATE_REGIONS 中查找模板的搜索区域（归一化坐标），未配置时返回 None。
+    """
+    return TEMPLATE_REGIONS.get(os.path.basename(template_path))
+
+def get_match_mode(template_path):
+    """
+    从 TEMPLATE_MATCH_MODES 中查找模板的匹配模式，未配置时返回 default_match_mode。
+    """
+    return TEMPLATE_MATCH_MODES.get(os.path.basename(template_path), default_match_mode)
+
+def _resolve_match_mode(match_mode, template_path):
+    """返回 (匹配模式, 搜索所用的图像类型)，hybrid 在灰度图上搜索"""
+    if match_mode == "auto":
+        match_mode = get_match_mode(template_path)
+    if match_mode not in MATCH_MODES:
+        raise ValueError(f"未知的匹配模式: {match_mode}")
+    return match_mode, "gray" if match_mode == "hybrid" else match_mode
+
+def crop_region(image, region):
+    """
+    按归一化区域裁剪图像，返回 (裁剪后的图像, x偏移, y偏移)。
+    裁剪使用NumPy切片，不复制像素数据；region 为 None 时返回整幅图像。
+    """
+    if region is None:
+        return image, 0, 0
+    h, w = image.shape[:2]
+    x1, y1, x2, y2 = region
+    left, top = int(x1 * w), int(y1 * h)
+    right, bottom = int(round(x2 * w)), int(round(y2 * h))
+    return image[top:bottom, left:right], left, top
+
+_sweep_executor = None
+_sweep_executor_lock = threading.Lock()
+
+def get_sweep_executor(workers=scale_sweep_workers):
+    """
+    获取进程内共享的多尺度搜索线程池，workers 不大于1时返回 None（串行搜索）。
+    """
+    global _sweep_executor
+    if workers <= 1:
+        return None
+    with _sweep_executor_lock:
+        if _sweep_executor is None:
+            _sweep_executor = ThreadPoolExecutor(workers, thread_name_prefix="scale-sweep")
+        return _sweep_executor
+
+def _match_level(image, scale, resized_template):
+    """
+    在图像上匹配单个尺度的模板，返回 (置信度, x, y, w, h, scale)，模板大于图像时返回 None
+    """
+    if resized_template.shape[0] > image.shape[0] or resized_template.shape[1] > image.shape[1]:
+        return None
+    
+    # 使用彩色匹配
+    result = cv2.matchTemplate(image, resized_template, cv2.TM_CCOEFF_NORMED)
+    _, max_val, _, (x, y) = cv2.minMaxLoc(result)
+    return (max_val, x, y, resized_template.shape[1], resized_template.shape[0], scale)
+
+def _match_levels_parallel(image, levels, executor, accept_threshold=None):
+    """
+    在线程池中并行匹配各尺度，所有线程共享同一份只读的图像。
+    某个尺度的置信度达到 accept_threshold 后立即返回，尚未开始的尺度被取消。
+    返回各尺度的匹配结果列表（不含跳过和取消的尺度）。
+    """
+    stop = threading.Event()
+    
+    def run(level):
+        if stop.is_set():
+            return None
+        return _match_level(image, *level)
+    
+    futures = [executor.submit(run, level) for level in levels]
+    hits = []
+    for future in as_completed(futures):
+        hit = future.result()
+        if hit is None:
+            continue
+        hits.append(hit)
+        if accept_threshold is not None and hit[0] >= accept_threshold:
+            stop.set()
+            for pending in futures:
+                pending.cancel()
+            break
+    return hits
+
+def _match_full(image, levels, executor=None, accept_threshold=None):
+    """
+    在整幅图像上逐尺度匹配，返回 (置信度, x, y, w, h, scale)
+    传入 executor 时各尺度并行搜索。
+    """
+    if executor is not None and len(levels) > 1:
+        hits = _match_levels_parallel(image, levels, executor, accept_threshold)
+    else:
+        hits = []
+        for scale, resized_template in levels:
+            hit = _match_level(image, scale, resized_template)
+            if hit is None:
+                continue
+            hits.append(hit)
+            if accept_threshold is not None and hit[0] >= accept_threshold:
+                break
+    
+    best = (0, 0, 0, 0, 0, None)
+    for hit in hits:
+        if hit[0] > best[0]:
+            best = hit
+    return best
+
+def _match_pyramid(image, levels, coarse_levels, factor, candidates=3, min_coarse_size=8,
+                   coarse_image=None, coarse_origin=(0, 0), executor=None):
+    """
+    由粗到细的金字塔匹配：先在降采样后的图像上找到候选位置和尺度，
+    再只在候选位置附近的小窗口内以原分辨率精确匹配相邻的几个尺度。
+    coarse_image 为预先降采样好的图像（可选，未提供时直接缩小 image，只适用于彩色和灰度图像），
+    coarse_origin 为其左上角相对 image 的原分辨率坐标。
+    传入 executor 时粗匹配阶段的各尺度并行搜索。返回值与 _match_full 相同。
+    """
+    h, w = image.shape[:2]
+    if coarse_image is None:
+        coarse_image = cv2.resize(image, (w // factor, h // factor), interpolation=cv2.INTER_AREA)
+        coarse_origin = (0, 0)
+    origin_x, origin_y = coarse_origin
+    
+    # 粗匹配：记录每个尺度的最佳位置
+    scale_index = {scale: i for i, (scale, _) in enumerate(levels)}
+    usable = [(scale, template) for scale, template in coarse_levels
+              if min(template.shape[:2]) >= min_coarse_size]
+    if executor is not None and len(usable) > 1:
+        hits = _match_levels_parallel(coarse_image, usable, executor)
+    else:
+        hits = [_match_level(coarse_image, scale, template) for scale, template in usable]
+    coarse_hits = [(val, x * factor + origin_x, y * factor + origin_y, scale_index[scale])
+                   for val, x, y, _, _, scale in filter(None, hits)]
+    
+    # 模板缩小后过小，无法可靠地粗匹配，退回全图搜索
+    if not coarse_hits:
+        return _match_full(image, levels)
+    
+    coarse_hits.sort(reverse=True)
+    margin = 2 * factor + 2
+    best = (0, 0, 0, 0, 0, None)
+    refined = set()
+    for _, cx, cy, index in coarse_hits[:candidates]:
+        for i in range(max(0, index - 1), min(len(levels), index + 2)):
+            if (i, cx, cy) in refined:
+                continue
+            refined.add((i, cx, cy))
+            scale, template = levels[i]
+            th, tw = template.shape[:2]
+            # 候选窗口：粗匹配位置周围留出降采样带来的误差
+            x0 = max(0, cx - margin)
+            y0 = max(0, cy - margin)
+            x1 = min(w, cx + tw + margin)
+            y1 = min(h, cy + th + margin)
+            if y1 - y0 < th or x1 - x0 < tw:
+                continue
+            result = cv2.matchTemplate(image[y0:y1, x0:x1], template, cv2.TM_CCOEFF_NORMED)
+            _, val, _, (x, y) = cv2.minMaxLoc(result)
+            if val > best[0]:
+                best = (val, x0 + x, y0 + y, tw, th, scale)
+    return best
+
+def _auto_pyramid_factor(size):
+    """按整幅截图的分辨率选择降采样倍数：短边不小于1000像素（1080P）时缩小4倍，否则缩小2倍"""
+    return 4 if min(size) >= 1000 else 2
+
+def _verify_color(color_image, hit, color_levels, margin=2):
+    """
+    用彩色模板确认灰度搜索的结果：只在最佳位置周围 margin 像素内匹配同一尺度的彩色模板，
+    返回的置信度和位置替换为彩色匹配的结果
+    """
+    _, x, y, w, h, scale = hit
+    template = dict(color_levels).get(scale)
+    if template is None:
+        return hit
+    height, width = color_image.shape[:2]
+    x0, y0 = max(0, x - margin), max(0, y - margin)
+    x1, y1 = min(width, x + w + margin), min(height, y + h + margin)
+    if y1 - y0 < h or x1 - x0 < w:
+        return hit
+    result = cv2.matchTemplate(color_image[y0:y1, x0:x1], template, cv2.TM_CCOEFF_NORMED)
+    _, val, _, (dx, dy) = cv2.minMaxLoc(result)
+    return (val, x0 + dx, y0 + dy, w, h, scale)
+
+def _search(image, template_image_path, min_scale, max_scale, registry, search_mode, pyramid_factor,
+            coarse_image=None, coarse_origin=(0, 0), threshold=None, scale_lock=None, frame_size=None,
+            sweep_executor=None, match_mode="color", color_image=None):
+    """
+    在已模糊的图像上搜索模板，返回 (置信度, x, y, w, h, scale)
+    image 和 coarse_image 为已按匹配模式转换的图像（hybrid 为灰度图），
+    hybrid 模式下 color_image 为对应的彩色模糊图像，灰度搜索达到阈值后在最佳位置用彩色模板确认。
+    传入 scale_lock 时优先只搜索锁定的缩放比例及相邻比例，置信度略低于阈值时才退回完整的多尺度搜索。
+    完整的多尺度搜索在 sweep_executor 中并行进行（如果提供）。
+    """
+    if search_mode not in ("full", "pyramid"):
+        raise ValueError(f"未知的搜索模式: {search_mode}")
+    
+    best = _search_levels(image, template_image_path, min_scale, max_scale, registry, search_mode,
+                          pyramid_factor, coarse_image, coarse_origin, threshold, scale_lock, frame_size,
+                          sweep_executor, "gray" if match_mode == "hybrid" else match_mode)
+    if match_mode == "hybrid" and best[5] is not None and (threshold is None or best[0] >= threshold):
+        with metrics.timer("match_stage", stage="verify"):
+            best = _verify_color(color_image, best, registry.get(template_image_path, min_scale, max_scale).levels)
+    return best
+
+def _search_levels(image, template_image_path, min_scale, max_scale, registry, search_mode, pyramid_factor,
+                   coarse_image, coarse_origin, threshold, scale_lock, frame_size, sweep_executor, image_mode):
+    """_search 的多尺度搜索部分，image_mode 为图像和模板的类型（color、gray 或 edge）"""
+    pyramid = registry.get(template_image_path, min_scale, max_scale, mode=image_mode)
+    use_pyramid = search_mode == "pyramid" and pyramid_factor > 1
+    if use_pyramid:
+        coarse_levels = registry.get(template_image_path, min_scale, max_scale, downsample=pyramid_factor,
+                                     mode=image_mode).levels
+    
+    def sweep(levels, executor=None):
+        if use_pyramid:
+            scales = {scale for scale, _ in levels}
+            return _match_pyramid(image, levels, [level for level in coarse_levels if level[0] in scales],
+                                  pyramid_factor, coarse_image=coarse_image, coarse_origin=coarse_origin,
+                                  executor=executor)
+        return _match_full(image, levels, executor, scale_accept_threshold if executor is not None else None)
+    
+    if scale_lock is not None and threshold is not None:
+        locked_scale = scale_lock.get(template_image_path, frame_size)
+        levels = pyramid.levels
+        if locked_scale is not None and levels and levels[0][0] - 1e-6 <= locked_scale <= levels[-1][0] + 1e-6:
+            index = min(range(len(levels)), key=lambda i: abs(levels[i][0] - locked_scale))
+            best = sweep(levels[max(0, index - 1):index + 2])
+            # 置信度远低于阈值说明模板不在画面中，不必重新搜索全部尺度
+            if best[0] >= threshold or best[0] < threshold - scale_lock.fallback_margin:
+                return best
+    
+    best = sweep(pyramid.levels, sweep_executor)
+    if scale_lock is not None and threshold is not None and best[0] >= threshold:
+        scale_lock.update(template_image_path, frame_size, best[5], best[0])
+    return best
+
+@metrics.timed("find_template_position")
+def find_template_position(large_image_path, template_image_path, output_path="result.png", threshold=0.6, min_scale=0.5, max_scale=2.0,
+                           registry=None, search_mode="full", pyramid_factor=None, region="auto",
+                           scale_lock=None, sweep_executor=None, match_mode="auto"):
     """
     在大图中查找模板图像的位置，并在大图上绘制矩形框。
+    large_image_path 既可以是截图路径，也可以是 capture_frame() 返回的图像数组。
+    模板的模糊和多尺度缩放结果从 registry（默认为全局模板注册表）中获取。
+    search_mode 为 "full" 时在原分辨率上逐尺度搜索全图，为 "pyramid" 时先在 1/pyramid_factor
+    的缩小图上粗匹配，再在候选位置附近精确匹配。pyramid_factor 为 None 时按分辨率自动选择：
+    短边不小于1000像素（1080P）时缩小4倍，否则缩小2倍。
+    region 为搜索区域（归一化坐标），"auto" 表示使用 TEMPLATE_REGIONS 中的配置，None 表示搜索全图，
+    返回的坐标始终是相对于整幅图像的。
+    scale_lock 为 ScaleLock 对象时只搜索锁定的缩放比例，匹配成功后自动记录新的比例。
+    sweep_executor 为线程池时，需要完整的多尺度搜索时各尺度并行进行，达到 scale_accept_threshold 后提前结束。
+    match_mode 为 "color"、"gray"、"edge" 或 "hybrid"，"auto" 表示使用 TEMPLATE_MATCH_MODES 中的配置。
     """
+    if registry is None:
+        registry = template_registry
+    match_mode, image_mode = _resolve_match_mode(match_mode, template_image_path)
+
     # 读取图像并预处理
-    large_image = cv2.imread(large_image_path)
-    template = cv2.imread(template_image_path)
-    
-    # 高斯去噪
-    large_image = cv2.GaussianBlur(large_image, (3, 3), 0)
-    template = cv2.GaussianBlur(template, (3, 3), 0)
+    with metrics.timer("match_stage", stage="load"):
+        large_image = load_image(large_image_path)
     
-    # 使用彩色图像
-    large_color = large_image.copy()
-    template_color = template.copy()
+    # 只在模板可能出现的区域内搜索
+    if region == "auto":
+        region = get_template_region(template_image_path)
+    full_size = large_image.shape[:2]
+    large_image, offset_x, offset_y = crop_region(large_image, region)
     
-    # 多尺度参数
-    scales = np.linspace(min_scale, max_scale, 20)  # 在指定范围内搜索20个尺度
+    # 高斯去噪，再转换为匹配模式所用的图像
+    with metrics.timer("match_stage", stage="blur"):
+        color_image = cv2.GaussianBlur(large_image, (3, 3), 0)
+        large_image = convert_image(color_image, image_mode)
     
-    best_match = None
-    max_val = 0
+    if pyramid_factor is None:
+        # 按整幅截图的分辨率选择，与是否裁剪无关
+        pyramid_factor = _auto_pyramid_factor(full_size)
     
-    for scale in scales:
-        h, w = template.shape[:2]
-        resized_template = cv2.resize(template_color, (int(w * scale), int(h * scale)))
-        if resized_template.shape[0] > large_color.shape[0] or resized_template.shape[1] > large_color.shape[1]:
-            continue
-        
-        # 使用彩色匹配
-        result = cv2.matchTemplate(large_color, resized_template, cv2.TM_CCOEFF_NORMED)
-        _, current_max_val, _, (x, y) = cv2.minMaxLoc(result)
-        
-        if current_max_val > max_val:
-            max_val = current_max_val
-            best_match = (x, y, resized_template.shape[1], resized_template.shape[0], scale)
+    # 粗匹配图像与模板一样先降采样再转换（边缘图降采样后与缩小图的边缘不同）
+    coarse_image = None
+    if search_mode == "pyramid" and pyramid_factor > 1:
+        h, w = color_image.shape[:2]
+        coarse_image = convert_image(cv2.resize(color_image, (w // pyramid_factor, h // pyramid_factor),
+                                                interpolation=cv2.INTER_AREA), image_mode)
     
+    # 多尺度匹配，各尺度的模板已预先缩放
+    with metrics.timer("match_stage", stage="search", mode=search_mode, match_mode=match_mode):
+        max_val, x, y, w, h, scale = _search(large_image, template_image_path, min_scale, max_scale,
+                                             registry, search_mode, pyramid_factor, coarse_image=coarse_image,
+                                             threshold=threshold,
+                                             scale_lock=scale_lock, frame_size=full_size,
+                                             sweep_executor=sweep_executor, match_mode=match_mode,
+                                             color_image=color_image)
     if max_val < threshold:
         # print("提示：未找到匹配，请尝试：\n1. 检查模板是否准确\n2. 扩大 scales 范围\n3. 进一步降低 threshold")
         return None
     
+    # 换算回整幅图像的坐标
+    x += offset_x
+    y += offset_y
+    
     # 标注结果
-    x, y, w, h, scale = best_match
     # cv2.rectangle(large_image, (x, y), (x + w, y + h), (0, 255, 0), 2)
     # cv2.imwrite(output_path, large_image)
     # print(f"匹配成功！位置：({x}, {y})，缩放比例：{scale:.2f}，置信度：{max_val:.2f}")
-    return (x, y, w, h)
\ No newline at end of file
+    return (x, y, w, h)
+
+class PreparedFrame:
+    """
+    预处理后的截图：整幅图像只模糊一次，降采样版本按需生成并缓存，
+    供多个模板共享（只读，可在多个线程间同时使用）。
+    """
+
+    def __init__(self, image):
+        self.image = load_image(image)
+        if self.image is None:
+            raise ValueError("无法读取源图像")
+        self.blurred = cv2.GaussianBlur(self.image, (3, 3), 0)
+        self._coarse = {}
+        self._views = {}
+
+    @property
+    def shape(self):
+        return self.image.shape
+
+    def coarse(self, factor):
+        """获取降采样 factor 倍后的模糊图像"""
+        image = self._coarse.get(factor)
+        if image is None:
+            # 多个线程同时首次访问时可能重复计算一次，结果相同，无需加锁
+            h, w = self.blurred.shape[:2]
+            image = cv2.resize(self.blurred, (w // factor, h // factor), interpolation=cv2.INTER_AREA)
+            self._coarse[factor] = image
+        return image
+
+    def view(self, mode, factor=1):
+        """获取匹配模式 mode（color、gray 或 edge）所用的图像，factor 大于1时为降采样后的版本"""
+        key = (mode, factor)
+        image = self._views.get(key)
+        if image is None:
+            image = convert_image(self.blurred if factor == 1 else self.coarse(factor), mode)
+            self._views[key] = image
+        return image
+
+# 单个模板的匹配结果，box 为 (x, y, w, h)，低于阈值时为 None
+TemplateMatch = namedtuple("TemplateMatch", ["template", "box", "score", "scale"])
+
+class MatchResults:
+    """
+    match_many 的返回结果：保存每个模板的位置和置信度。
+    """
+
+    def __init__(self, matches):
+        self.matches = matches  # {模板路径: TemplateMatch}
+
+    def __getitem__(self, template_path):
+        return self.matches[template_path]
+
+    def __iter__(self):
+        return iter(self.matches.values())
+
+    def __len__(self):
+        return len(self.matches)
+
+    def found(self, template_path):
+        match = self.matches.get(template_path)
+        return match is not None and match.box is not None
+
+    def box(self, template_path):
+        match = self.matches.get(template_path)
+        return match.box if match is not None else None
+
+    @property
+    def scores(self):
+        return {path: match.score for path, match in self.matches.items()}
+
+    def first_found(self, template_paths=None):
+        """按给定顺序（默认为匹配时的顺序）返回第一个匹配成功的结果，没有时返回 None"""
+        for path in template_paths if template_paths is not None else self.matches:
+            if self.found(path):
+                return self.matches[path]
+        return None
+
+    def best(self):
+        """返回置信度最高且匹配成功的结果，没有时返回 None"""
+        hits = [match for match in self.matches.values() if match.box is not None]
+        return max(hits, key=lambda match: match.score) if hits else None
+
+def _match_prepared(prepared, template_image_path, threshold, min_scale, max_scale, registry,
+                    search_mode, pyramid_factor, region, scale_lock=None, sweep_executor=None,
+                    match_mode="auto"):
+    match_mode, image_mode = _resolve_match_mode(match_mode, template_image_path)
+    if region == "auto":
+        region = get_template_region(template_image_path)
+    image, offset_x, offset_y = crop_region(prepared.view(image_mode), region)
+    color_image = crop_region(prepared.blurred, region)[0] if match_mode == "hybrid" else None
+    
+    coarse_image, coarse_origin = None, (0, 0)
+    if search_mode == "pyramid" and pyramid_factor > 1:
+        # 从整幅降采样图中切出对应区域，左上角与原分辨率区域的偏差由精匹配窗口吸收
+        coarse_left, coarse_top = offset_x // pyramid_factor, offset_y // pyramid_factor
+        coarse_image = prepared.view(image_mode, pyramid_factor)[
+            coarse_top:coarse_top + image.shape[0] // pyramid_factor,
+            coarse_left:coarse_left + image.shape[1] // pyramid_factor
+        ]
+        coarse_origin = (coarse_left * pyramid_factor - offset_x, coarse_top * pyramid_factor - offset_y)
+    
+    max_val, x, y, w, h, scale = _search(image, template_image_path, min_scale, max_scale, registry,
+                                         search_mode, pyramid_factor, coarse_image, coarse_origin,
+                                         threshold=threshold, scale_lock=scale_lock,
+                                         frame_size=prepared.shape[:2], sweep_executor=sweep_executor,
+                                         match_mode=match_mode, color_image=color_image)
+    box = (x + offset_x, y + offset_y, w, h) if max_val >= threshold else None
+    return TemplateMatch(template_image_path, box, float(max_val), scale)
+
+@metrics.timed("match_many")
+def match_many(frame, templates, threshold=0.6, min_scale=0.5, max_scale=2.0, registry=None,
+               search_mode="full", pyramid_factor=None, regions="auto", executor=None, scale_lock=None,
+               sweep_executor=None, match_mode="auto"):
+    """
+    在同一帧截图上一次性匹配多个模板：截图只读取和模糊一次，所有模板共享。
+    
+    Args:
+        frame (str | numpy.ndarray | PreparedFrame): 截图路径、图像数组或已预处理的截图
+        templates (list): 模板图像路径列表
+        threshold (float): 匹配置信度阈值
+        min_scale (float): 最小缩放比例
+        max_scale (float): 最大缩放比例
+        registry (TemplateRegistry): 模板注册表，默认为全局注册表
+        search_mode (str): "full" 或 "pyramid"
+        pyramid_factor (int): 金字塔降采样倍数，None 时自动选择
+        regions: "auto" 使用 TEMPLATE_REGIONS，None 搜索全图，也可以传入 {模板路径: 区域} 字典
+        executor (concurrent.futures.Executor): 可选的线程池，OpenCV 匹配时会释放GIL，多个模板可并行
+        scale_lock (ScaleLock): 可选的缩放比例锁定表
+        sweep_executor (concurrent.futures.Executor): 可选的线程池，用于并行搜索单个模板的各尺度，
+            必须与 executor 不同，避免任务互相等待
+        match_mode (str): 匹配模式，"auto" 使用 TEMPLATE_MATCH_MODES 中各模板的配置
+    
+    Returns:
+        MatchResults: 所有模板的匹配结果（按 templates 的顺序）
+    """
+    if registry is None:
+        registry = template_registry
+    prepared = frame if isinstance(frame, PreparedFrame) else PreparedFrame(frame)
+    if pyramid_factor is None:
+        pyramid_factor = _auto_pyramid_factor(prepared.shape[:2])
+    
+    def region_of(template_path):
+        if isinstance(regions, dict):
+            return regions.get(template_path, "auto")
+        return regions
+    
+    def run(template_path):
+        return _match_prepared(prepared, template_path, threshold, min_scale, max_scale, registry,
+                               search_mode, pyramid_factor, region_of(template_path), scale_lock,
+                               sweep_executor, match_mode)
+    
+    if executor is not None:
+        matches = list(executor.map(run, templates))
+    else:
+        matches = [run(template_path) for template_path in templates]
+    return MatchResults({match.template: match for match in matches})
+
+def calibrate_scales(frame, templates, scale_lock, threshold=0.75, min_scale=0.75, max_scale=2.0,
+                     registry=None, regions="auto", sweep_executor=None):
+    """
+    校准缩放比例：对每个模板做一次完整的多尺度搜索，把匹配成功的比例写入 scale_lock。
+    
+    Args:
+        frame (str | numpy.ndarray): 截图路径或图像数组
+        templates (list): 模板图像路径列表
+        scale_lock (ScaleLock): 缩放比例锁定表
+        threshold (float): 记录比例所需的最低置信度
+        
+    Returns:
+        dict: {模板路径: (缩放比例, 置信度)}，未匹配的模板缩放比例为 None
+    """
+    if registry is None:
+        registry = template_registry
+    prepared = PreparedFrame(frame)
+    frame_size = prepared.shape[:2]
+    results = {}
+    for template_path in templates:
+        match = _match_prepared(prepared, template_path, threshold, min_scale, max_scale, registry,
+                                "full", 1, regions, sweep_executor=sweep_executor)
+        if match.box is not None:
+            scale_lock.update(template_path, frame_size, match.scale, match.score)
+            results[template_path] = (match.scale, match.score)
+        else:
+            results[template_path] = (None, match.score)
+    scale_lock.flush()  # 校准结果立即写入，不等待后台线程
+    return results
\ No newline at end of file
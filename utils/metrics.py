@@ -0,0 +1,276 @@
+# utils/metrics.py
+import atexit
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from config.settings import (metrics_enabled, metrics_export_interval, metrics_jsonl_path,
+                             metrics_prometheus_path, metrics_window)
+from .event_log import log
+
+# 耗时直方图的桶上限（秒），与 Prometheus 的 le 标签对应
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_PREFIX = "cr_"
+
+class Histogram:
+    """
+    耗时直方图：累计的分桶计数、总和与次数（导出为 Prometheus 格式），
+    以及最近 window 个样本（用于计算滚动的 p50/p95）。
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window=metrics_window):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最后一个为 +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.recent.append(value)
+
+    def summary(self):
+        recent = sorted(self.recent)
+        if not recent:
+            return {"count": self.count, "sum": self.sum}
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": recent[len(recent) // 2],
+            "p95": recent[min(len(recent) - 1, int(len(recent) * 0.95))],
+            "max": recent[-1],
+        }
+
+class Metrics:
+    """
+    进程内的计时与计数器。
+
+    - with metrics.timer("name", key="value"): 统计代码块耗时
+    - @metrics.timed("name"): 统计函数耗时
+    - metrics.count("name"): 计数器加一
+    开销只有一次 perf_counter 和一次加锁，可以在生产环境中常开；enabled 为 False 时全部跳过。
+    """
+
+    def __init__(self, enabled=metrics_enabled):
+        self.enabled = enabled
+        self.labels = {}  # 附加到所有指标上的标签，如设备名
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._exporter = None
+        self._stop = threading.Event()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def observe(self, name, seconds, **labels):
+        """
+        记录一次耗时（秒）
+        """
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def count(self, name, value=1, **labels):
+        """
+        计数器增加 value
+        """
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def timer(self, name, **labels):
+        """
+        统计代码块耗时的上下文管理器
+        """
+        return _Timer(self, name, labels)
+
+    def timed(self, name=None, **labels):
+        """
+        统计函数耗时的装饰器，name 默认为函数名
+        """
+        def decorator(func):
+            metric = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(metric, time.perf_counter() - started, **labels)
+            return wrapper
+        return decorator
+
+    def snapshot(self):
+        """
+        返回当前所有指标的汇总
+        """
+        with self._lock:
+            histograms = [{"name": name, "labels": dict(labels), "type": "histogram", **histogram.summary()}
+                          for (name, labels), histogram in self._histograms.items()]
+            counters = [{"name": name, "labels": dict(labels), "type": "counter", "value": value}
+                        for (name, labels), value in self._counters.items()]
+        return histograms + counters
+
+    def totals(self, name):
+        """
+        返回某个耗时指标在所有标签下的累计 (次数, 总耗时秒)
+        """
+        with self._lock:
+            histograms = [histogram for (metric, _), histogram in self._histograms.items() if metric == name]
+            return sum(h.count for h in histograms), sum(h.sum for h in histograms)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def _path(self, template):
+        """用标签填充路径中的 {device} 等占位符，缺少的标签填 default"""
+        safe = _PathLabels({key: "".join(c if c.isalnum() or c in "_.-" else "_" for c in value)
+                            for key, value in self.labels.items()})
+        return template.format_map(safe)
+
+    def write_jsonl(self, path=None):
+        """
+        追加一行当前指标汇总到 JSONL 文件，默认为配置中的 metrics_jsonl_path
+        """
+        path = path or self._path(metrics_jsonl_path)
+        record = {"time": time.time(), "labels": self.labels, "metrics": self.snapshot()}
+        _ensure_parent(path)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def write_prometheus(self, path=None):
+        """
+        以 Prometheus 文本格式写出全部指标（先写临时文件再替换，供 node_exporter textfile 采集），
+        默认为配置中的 metrics_prometheus_path
+        """
+        path = path or self._path(metrics_prometheus_path)
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+            for name in sorted({name for (name, _), _ in histograms}):
+                lines.append(f"# TYPE {METRIC_PREFIX}{name}_seconds histogram")
+                for (metric, labels), histogram in histograms:
+                    if metric != name:
+                        continue
+                    labels = {**self.labels, **dict(labels)}
+                    cumulative = 0
+                    for bound, count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                        cumulative += count
+                        lines.append(f"{METRIC_PREFIX}{name}_seconds_bucket{_format_labels(labels, le=bound)} {cumulative}")
+                    lines.append(f"{METRIC_PREFIX}{name}_seconds_sum{_format_labels(labels)} {histogram.sum}")
+                    lines.append(f"{METRIC_PREFIX}{name}_seconds_count{_format_labels(labels)} {histogram.count}")
+            for name in sorted({name for (name, _), _ in counters}):
+                lines.append(f"# TYPE {METRIC_PREFIX}{name}_total counter")
+                for (metric, labels), value in counters:
+                    if metric == name:
+                        labels = {**self.labels, **dict(labels)}
+                        lines.append(f"{METRIC_PREFIX}{name}_total{_format_labels(labels)} {value}")
+        _ensure_parent(path)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+
+    def export(self):
+        """
+        导出到配置的 JSONL 和 Prometheus 文件，路径为空时跳过
+        """
+        try:
+            if metrics_jsonl_path:
+                self.write_jsonl()
+            if metrics_prometheus_path:
+                self.write_prometheus()
+        except OSError as e:
+            log.warning("metrics", f"导出统计指标失败: {e}")
+
+    def start_exporter(self, interval=metrics_export_interval, **labels):
+        """
+        启动后台线程，每隔 interval 秒导出一次指标；路径中的 {device} 等占位符用 labels 填充
+
+        Args:
+            interval (float): 导出间隔（秒），不大于0时不启动
+            labels: 附加到所有指标上的标签
+        """
+        self.labels.update({key: str(value) for key, value in labels.items()})
+        if not self.enabled or interval <= 0 or self._exporter is not None:
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                self.export()
+            self.export()
+
+        self._stop.clear()
+        self._exporter = threading.Thread(target=run, name="metrics-exporter", daemon=True)
+        self._exporter.start()
+        # 进程退出前导出最后一次
+        atexit.register(self.stop_exporter)
+
+    def stop_exporter(self):
+        """
+        停止后台导出线程，停止前再导出一次
+        """
+        if self._exporter is None:
+            return
+        self._stop.set()
+        self._exporter.join()
+        self._exporter = None
+
+class _Timer:
+    __slots__ = ("metrics", "name", "labels", "started")
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.name, time.perf_counter() - self.started, **self.labels)
+        return False
+
+class _PathLabels(dict):
+    def __missing__(self, key):
+        return "default"
+
+def _format_labels(labels, **extra):
+    labels = {**labels, **{key: str(value) for key, value in extra.items()}}
+    if not labels:
+        return ""
+    escaped = (f'{key}="{_escape(value)}"' for key, value in sorted(labels.items()))
+    return "{" + ",".join(escaped) + "}"
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _ensure_parent(path):
+    parent = os.path.dirname(path)
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+
+# 全局指标
+metrics = Metrics()
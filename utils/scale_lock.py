@@ -0,0 +1,166 @@
+# utils/scale_lock.py
+import atexit
+import json
+import os
+import threading
+from config.settings import (device_name, device_vm_size, scale_lock_path, scale_lock_fallback_margin,
+                             scale_lock_flush_interval)
+from .event_log import log
+
+class ScaleLock:
+    """
+    缩放比例锁定表：记录每个模板在当前设备上匹配成功时的缩放比例。
+
+    同一模拟器上模板的最佳缩放比例不会变化，锁定后只需要搜索该比例及其相邻的两个比例。
+    数据按 "设备名:分辨率配置" 分组保存在 JSON 文件中，截图尺寸变化时对应的记录自动失效。
+
+    update 在匹配线程中调用，只标记有未保存的变化；文件由后台线程每隔 flush_interval 秒写入，
+    进程退出时再写入一次，匹配线程不会因磁盘写入而阻塞。
+    """
+
+    def __init__(self, path=scale_lock_path, profile_key=None, fallback_margin=scale_lock_fallback_margin,
+                 flush_interval=scale_lock_flush_interval):
+        self.path = path
+        self.profile_key = profile_key or f"{device_name}:{device_vm_size}"
+        self.fallback_margin = fallback_margin
+        self.flush_interval = flush_interval
+        self._data = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # 同一进程内的多个线程依次写入临时文件和替换
+        self._stop = threading.Event()
+        self._flusher = None
+        self._flusher_pid = None
+        self.load()
+        atexit.register(self.close)
+
+    @staticmethod
+    def _key(template_path):
+        return os.path.basename(template_path)
+
+    def load(self):
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._data = json.load(f)
+            except (OSError, ValueError) as e:
+                log.warning("scale_lock", f"读取缩放比例锁定文件失败: {e}")
+                self._data = {}
+
+    def save(self):
+        if not self.path:
+            return
+        # 多个进程（多台设备）共用同一个文件，写入前合并文件中其他设备的记录。
+        # 临时文件名只按进程区分，同一进程的线程必须串行执行读取、写入和替换
+        with self._save_lock:
+            on_disk = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        on_disk = json.load(f)
+                except (OSError, ValueError):
+                    on_disk = {}
+            with self._lock:
+                on_disk[self.profile_key] = self._data.get(self.profile_key, {})
+                self._data = on_disk
+                self._dirty = False
+                content = json.dumps(self._data, ensure_ascii=False, indent=2)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp_path, self.path)
+
+    def flush(self):
+        """
+        有未保存的变化时写入文件，写入失败时保留标记，下次再试
+        """
+        if not self._dirty:
+            return
+        try:
+            self.save()
+        except OSError as e:
+            with self._lock:
+                self._dirty = True
+            log.warning("scale_lock", f"保存缩放比例锁定文件失败: {e}")
+
+    def _start_flusher(self):
+        """
+        启动后台写入线程（持有 _lock 时调用）；fork 出的子进程中父进程的线程不存在，第一次变化时重新启动
+        """
+        if self._flusher is not None and self._flusher_pid == os.getpid():
+            return
+        self._flusher_pid = os.getpid()
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._run, name="scale-lock-flush", daemon=True)
+        self._flusher.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        """
+        停止后台写入线程并写入剩余的变化
+        """
+        if self._flusher is not None and self._flusher_pid == os.getpid():
+            self._stop.set()
+            self._flusher.join()
+            self._flusher = None
+            self._flusher_pid = None
+        self.flush()
+
+    def get(self, template_path, frame_size):
+        """
+        获取模板锁定的缩放比例
+
+        Args:
+            template_path (str): 模板图像路径
+            frame_size (tuple): 截图尺寸 (高, 宽)
+
+        Returns:
+            float: 锁定的缩放比例，没有记录或截图尺寸不一致时返回 None
+        """
+        with self._lock:
+            entry = self._data.get(self.profile_key, {}).get(self._key(template_path))
+        if entry is None or tuple(entry.get("frame_size", ())) != tuple(frame_size):
+            return None
+        return entry["scale"]
+
+    def update(self, template_path, frame_size, scale, score):
+        """
+        记录模板的缩放比例，只有比例或截图尺寸变化时才需要写入文件（由后台线程写入）
+        """
+        key = self._key(template_path)
+        with self._lock:
+            profile = self._data.setdefault(self.profile_key, {})
+            entry = profile.get(key)
+            changed = (entry is None or entry.get("scale") != scale
+                       or tuple(entry.get("frame_size", ())) != tuple(frame_size))
+            profile[key] = {"scale": scale, "score": round(float(score), 4), "frame_size": list(frame_size)}
+            self._dirty = self._dirty or changed
+            if changed and self.flush_interval > 0:
+                self._start_flusher()
+        if changed and self.flush_interval <= 0:
+            self.flush()
+
+    def clear(self):
+        with self._lock:
+            self._data.pop(self.profile_key, None)
+        self.save()
+
+    def __len__(self):
+        return len(self._data.get(self.profile_key, {}))
+
+if __name__ == "__main__":
+    # 使用当前截图校准 modle/ 下所有模板: python -m utils.scale_lock [截图路径]
+    import glob
+    import sys
+    from utils.image_utils import calibrate_scales
+
+    screenshot = sys.argv[1] if len(sys.argv) > 1 else "screen.png"
+    lock = ScaleLock()
+    results = calibrate_scales(screenshot, sorted(glob.glob("modle/*.png")), lock)
+    for template_path, (scale, score) in results.items():
+        status = f"缩放比例 {scale:.3f}，置信度 {score:.2f}" if scale is not None else f"未匹配（置信度 {score:.2f}）"
+        print(f"{os.path.basename(template_path)}: {status}")
+    print(f"已保存到 {lock.path}")
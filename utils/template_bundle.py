@@ -0,0 +1,158 @@
+# utils/template_bundle.py
+import glob
+import hashlib
+import json
+import os
+import struct
+import numpy as np
+from config.settings import DEVICE_PROFILES, template_bundle_path, TEMPLATE_BUNDLE_SCALES
+
+MAGIC = b"CRTB0001"
+ALIGNMENT = 64
+
+def _file_sha1(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def _profile_factors():
+    """各设备分辨率下金字塔搜索自动选择的降采样倍数（与 image_utils._auto_pyramid_factor 一致）"""
+    return sorted({4 if min(profile["size"]) >= 1000 else 2 for profile in DEVICE_PROFILES.values()})
+
+def build_bundle(template_dir="modle", output_path=template_bundle_path, scales=TEMPLATE_BUNDLE_SCALES):
+    """
+    把模板目录编译为一个二进制文件：每个模板模糊后的原图、各尺度的缩放结果，
+    以及每种设备分辨率的金字塔搜索所需的降采样版本，全部按与 TemplateRegistry 相同的方式生成。
+    每组金字塔同时保存 color、gray 和 edge 三种匹配模式的版本（hybrid 使用 gray 和 color）。
+
+    文件结构：MAGIC(8字节) + 索引长度(uint64) + JSON 索引 + 按 64 字节对齐的图像数据。
+
+    Args:
+        template_dir (str): 模板目录
+        output_path (str): 输出文件
+        scales (list): 需要预先生成的 (最小缩放, 最大缩放, 尺度数量)
+
+    Returns:
+        int: 写入的金字塔数量
+    """
+    from .template_registry import TemplateRegistry, MATCH_MODES
+
+    chunks = []
+    offset = 0
+
+    def add(image):
+        nonlocal offset
+        data = np.ascontiguousarray(image).tobytes()
+        start = offset
+        chunks.append(data)
+        offset += len(data)
+        padding = (-offset) % ALIGNMENT
+        if padding:
+            chunks.append(b"\0" * padding)
+            offset += padding
+        return [start, list(image.shape)]
+
+    templates, entries = {}, []
+    for path in sorted(glob.glob(os.path.join(template_dir, "*.png"))):
+        path = os.path.relpath(path).replace(os.sep, "/")
+        stat = os.stat(path)
+        templates[path] = {"mtime_ns": stat.st_mtime_ns, "sha1": _file_sha1(path)}
+        for min_scale, max_scale, num_scales in scales:
+            full = TemplateRegistry._build(os.path.abspath(path), stat.st_mtime_ns, min_scale, max_scale, num_scales)
+            for mode in MATCH_MODES:
+                if mode == "hybrid":
+                    continue
+                converted = full if mode == "color" else TemplateRegistry._convert(full, mode)
+                image = add(converted.image)
+                for factor in [1] + _profile_factors():
+                    # 与 TemplateRegistry 相同：先降采样彩色金字塔，再转换
+                    pyramid = full if factor == 1 else TemplateRegistry._downsample(full, factor)
+                    if mode != "color":
+                        pyramid = converted if factor == 1 else TemplateRegistry._convert(pyramid, mode)
+                    entries.append({
+                        "path": path,
+                        "key": [float(min_scale), float(max_scale), int(num_scales), factor, mode],
+                        "image": image,
+                        "levels": [[scale] + add(level) for scale, level in pyramid.levels],
+                    })
+
+    index = json.dumps({"version": 2, "templates": templates, "entries": entries}).encode("utf-8")
+    header_size = len(MAGIC) + 8 + len(index)
+    header_padding = (-header_size) % ALIGNMENT
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(index)) + index + b"\0" * header_padding)
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(tmp_path, output_path)
+    return len(entries)
+
+class TemplateBundle:
+    """
+    通过 np.memmap 只读映射的模板包。
+
+    图像数据不复制到进程内存中，多个进程映射同一文件时共享操作系统的页缓存。
+    模板文件在编译后被修改过（修改时间和内容都不同）时，该模板不再从包中读取。
+    """
+
+    def __init__(self, path=template_bundle_path):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"不是模板包文件: {path}")
+            (index_size,) = struct.unpack("<Q", f.read(8))
+            index = json.loads(f.read(index_size).decode("utf-8"))
+        header_size = len(MAGIC) + 8 + index_size
+        data_offset = header_size + (-header_size) % ALIGNMENT
+        # 转为普通 ndarray 视图，映射由 base 引用保持
+        self.data = np.memmap(path, dtype=np.uint8, mode="r", offset=data_offset).view(np.ndarray)
+        self.templates = index["templates"]
+        self._entries = {}
+        for entry in index["entries"]:
+            # 版本 1 的模板包只有 color 模式，键中没有模式
+            key = tuple(entry["key"]) if len(entry["key"]) == 5 else tuple(entry["key"]) + ("color",)
+            key = (os.path.abspath(entry["path"]),) + key
+            self._entries[key] = entry
+        self._valid = {}  # {绝对路径: 验证通过时的 mtime_ns}
+
+    def _array(self, location):
+        start, shape = location
+        return self.data[start:start + int(np.prod(shape))].reshape(shape)
+
+    def is_current(self, path, mtime_ns):
+        """
+        模板文件是否与编译时相同：修改时间相同，或内容的 sha1 相同（如重新检出后修改时间变化）
+        """
+        if self._valid.get(path) == mtime_ns:
+            return True
+        info = self.templates.get(os.path.relpath(path).replace(os.sep, "/"))
+        if info is None:
+            return False
+        if info["mtime_ns"] != mtime_ns and info["sha1"] != _file_sha1(path):
+            return False
+        self._valid[path] = mtime_ns
+        return True
+
+    def get(self, path, mtime_ns, min_scale, max_scale, num_scales, downsample, mode="color"):
+        """
+        返回包中对应的 TemplatePyramid，不存在或模板已修改时返回 None
+        """
+        from .template_registry import TemplatePyramid
+
+        entry = self._entries.get((path, float(min_scale), float(max_scale), int(num_scales), int(downsample), mode))
+        if entry is None or not self.is_current(path, mtime_ns):
+            return None
+        levels = [(scale, self._array((start, shape))) for scale, start, shape in entry["levels"]]
+        return TemplatePyramid(path, mtime_ns, self._array(entry["image"]), levels)
+
+    def __len__(self):
+        return len(self._entries)
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    started = time.perf_counter()
+    count = build_bundle(*sys.argv[1:3])
+    output = sys.argv[2] if len(sys.argv) > 2 else template_bundle_path
+    print(f"已编译 {count} 组模板金字塔到 {output}（{os.path.getsize(output) / 1024:.0f} KB），"
+          f"用时 {time.perf_counter() - started:.2f} 秒")
@@ -0,0 +1,153 @@
+# utils/template_registry.py
+import os
+import threading
+from collections import OrderedDict, namedtuple
+import cv2
+import numpy as np
+from config.settings import template_bundle_path, canny_thresholds
+from .event_log import log
+
+# 预处理后的模板：模糊后的原图以及各尺度下缩放好的模板 [(scale, image), ...]
+TemplatePyramid = namedtuple("TemplatePyramid", ["path", "mtime", "image", "levels"])
+
+# 匹配所用的图像类型，hybrid 的搜索阶段使用 gray
+MATCH_MODES = ("color", "gray", "edge", "hybrid")
+
+def convert_image(image, mode):
+    """
+    把模糊后的 BGR 图像转换为匹配模式所用的图像：color 原样返回，gray 为灰度图，edge 为灰度图的 Canny 边缘。
+    模板和截图使用同一个函数转换，保证两者一致。
+    """
+    if mode == "color":
+        return image
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if mode == "gray":
+        return gray
+    if mode == "edge":
+        return cv2.Canny(gray, *canny_thresholds)
+    raise ValueError(f"未知的匹配模式: {mode}")
+
+class TemplateRegistry:
+    """
+    模板注册表：每个模板只读取、模糊、缩放一次，结果放在有上限的LRU缓存中。
+    缓存键为 (模板路径, 最小缩放, 最大缩放, 尺度数量, 降采样倍数, 匹配模式)，模板文件的修改时间变化时重新加载。
+    gray 和 edge 模式的金字塔由同一尺度的彩色金字塔逐层转换得到。
+    存在模板包（bundle_path）时，包中已有的金字塔（包括 gray 和 edge）直接使用内存映射的数据，
+    不再读取、缩放和转换 PNG。
+    """
+
+    def __init__(self, max_entries=128, bundle_path=None):
+        self.max_entries = max_entries
+        self.bundle_path = bundle_path
+        self._bundle = None
+        self._bundle_loaded = False
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bundle_hits = 0
+
+    def get(self, template_path, min_scale, max_scale, num_scales=20, downsample=1, mode="color"):
+        """
+        获取模板的多尺度金字塔
+
+        Args:
+            template_path (str): 模板图像路径
+            min_scale (float): 最小缩放比例
+            max_scale (float): 最大缩放比例
+            num_scales (int): 尺度数量
+            downsample (int): 降采样倍数，大于1时返回用于粗匹配的缩小版本，levels 中的 scale 仍为原尺度
+            mode (str): 匹配模式 "color"、"gray" 或 "edge"
+
+        Returns:
+            TemplatePyramid: 预处理后的模板
+        """
+        path = os.path.abspath(template_path)
+        mtime = os.stat(path).st_mtime_ns
+        key = (path, float(min_scale), float(max_scale), int(num_scales), int(downsample), mode)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.mtime == mtime:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        # 加载在锁外进行，避免阻塞其他模板的读取
+        bundle = self.bundle()
+        entry = (bundle.get(path, mtime, min_scale, max_scale, num_scales, downsample, mode)
+                 if bundle is not None else None)
+        if entry is not None:
+            self.bundle_hits += 1
+        elif mode != "color":
+            entry = self._convert(self.get(path, min_scale, max_scale, num_scales, downsample), mode)
+        elif downsample > 1:
+            full = self.get(path, min_scale, max_scale, num_scales)
+            entry = self._downsample(full, downsample)
+        else:
+            entry = self._build(path, mtime, min_scale, max_scale, num_scales)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    @staticmethod
+    def _build(path, mtime, min_scale, max_scale, num_scales):
+        template = cv2.imread(path)
+        if template is None:
+            raise FileNotFoundError(f"无法读取模板图像: {path}")
+
+        # 高斯去噪
+        template = cv2.GaussianBlur(template, (3, 3), 0)
+
+        h, w = template.shape[:2]
+        levels = []
+        for scale in np.linspace(min_scale, max_scale, num_scales):
+            size = (int(w * scale), int(h * scale))
+            if size[0] < 1 or size[1] < 1:
+                continue
+            levels.append((float(scale), cv2.resize(template, size)))
+        return TemplatePyramid(path, mtime, template, levels)
+
+    @staticmethod
+    def _downsample(pyramid, factor):
+        levels = []
+        for scale, image in pyramid.levels:
+            h, w = image.shape[:2]
+            size = (w // factor, h // factor)
+            if size[0] < 1 or size[1] < 1:
+                continue
+            levels.append((scale, cv2.resize(image, size, interpolation=cv2.INTER_AREA)))
+        return TemplatePyramid(pyramid.path, pyramid.mtime, pyramid.image, levels)
+
+    @staticmethod
+    def _convert(pyramid, mode):
+        levels = [(scale, convert_image(image, mode)) for scale, image in pyramid.levels]
+        return TemplatePyramid(pyramid.path, pyramid.mtime, convert_image(pyramid.image, mode), levels)
+
+    def bundle(self):
+        """
+        第一次使用时打开模板包，文件不存在或无法读取时返回 None
+        """
+        if not self._bundle_loaded:
+            self._bundle_loaded = True
+            if self.bundle_path and os.path.exists(self.bundle_path):
+                from .template_bundle import TemplateBundle
+                try:
+                    self._bundle = TemplateBundle(self.bundle_path)
+                except (OSError, ValueError) as e:
+                    log.warning("registry", f"读取模板包失败，改为从图片加载: {e}")
+        return self._bundle
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+# 进程内共享的默认注册表
+template_registry = TemplateRegistry(bundle_path=template_bundle_path)
@@ -0,0 +1,51 @@
+# utils/wait.py
+from collections import namedtuple
+from .clock import clock
+
+# 等待结果：ok 为条件是否满足，elapsed 为实际等待时间（秒），polls 为检查次数，value 为条件最后一次的返回值
+WaitResult = namedtuple("WaitResult", ["ok", "elapsed", "polls", "value"])
+
+def exponential_schedule(initial=0.2, factor=1.5, maximum=2.0):
+    """
+    指数退避的检查间隔：initial, initial*factor, ...，不超过 maximum
+    """
+    interval = initial
+    while True:
+        yield interval
+        interval = min(maximum, interval * factor)
+
+def fixed_schedule(interval):
+    """
+    固定间隔的检查
+    """
+    while True:
+        yield interval
+
+def wait_until(condition, timeout, poll_schedule=None, initial_delay=0):
+    """
+    反复检查 condition，直到其返回真值或超时
+
+    Args:
+        condition (callable): 无参数的检查函数，返回真值表示条件满足
+        timeout (float): 最长等待时间（秒）
+        poll_schedule (iterable): 两次检查之间的间隔序列，默认为 exponential_schedule()
+        initial_delay (float): 第一次检查前先等待的时间（秒），条件通常不会更早满足时可以减少无效的检查
+
+    Returns:
+        WaitResult: 等待结果
+    """
+    start = clock.time()
+    schedule = iter(poll_schedule if poll_schedule is not None else exponential_schedule())
+    polls = 0
+    if initial_delay > 0:
+        clock.sleep(min(initial_delay, timeout))
+    while True:
+        value = condition()
+        polls += 1
+        elapsed = clock.time() - start
+        if value:
+            return WaitResult(True, elapsed, polls, value)
+        remaining = timeout - elapsed
+        if remaining <= 0:
+            return WaitResult(False, elapsed, polls, value)
+        clock.sleep(min(next(schedule), remaining))